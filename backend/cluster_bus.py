@@ -0,0 +1,363 @@
+"""
+Cluster Bus - UISI Shuttle
+==========================
+
+Dengan beberapa worker (python main.py <ip> <port> --workers 4), setiap
+worker punya client WebSocket / SSE & state in-memory sendiri. Bus ini
+me-relay event antar worker supaya GPS fix yang masuk ke worker A juga
+sampai ke client yang connect ke worker B.
+
+Backend (BROADCAST_BACKEND):
+- local  : satu proses, tidak ada relay (default)
+- unix   : Unix datagram socket per worker di BUS_SOCKET_DIR, tanpa broker
+- redis  : Redis pub/sub (butuh: pip install redis), bisa lintas host
+- memory : stand-in Redis in-process, untuk test & development
+
+Event = dict JSON. Setiap bus punya node_id, event dari diri sendiri
+tidak pernah di-handle ulang.
+
+LeaderLock: file lock (flock) supaya job background singleton (arsip,
+simplifikasi, dispatcher) hanya jalan di satu worker.
+"""
+
+import abc
+import asyncio
+import json
+import os
+import secrets
+import socket
+import time
+from typing import Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: tidak ada flock, selalu leader
+    fcntl = None
+
+# Batas ukuran satu event (byte), event yang lebih besar di-drop (pengirim
+# harus memecah event besar, lihat relay_fixes di main.py)
+MAX_EVENT_BYTES = 60000
+# Daftar peer unix socket di-scan ulang paling sering tiap interval ini (detik)
+PEER_REFRESH_SECONDS = 1.0
+# Antrian event yang belum terkirim, event lama dibuang kalau penuh
+SEND_QUEUE_SIZE = 10000
+
+
+class Bus(abc.ABC):
+    """Base class: antrian kirim (urutan terjaga) + filter event sendiri"""
+
+    relays = True
+
+    def __init__(self):
+        self.node_id = secrets.token_hex(6)
+        self.handler: Optional[Callable[[dict], None]] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._sender: Optional[asyncio.Task] = None
+        self.dropped = 0
+
+    async def start(self, handler: Callable[[dict], None]):
+        self.handler = handler
+        self.loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        self._sender = asyncio.create_task(self._send_loop())
+
+    async def stop(self):
+        if self._sender:
+            self._sender.cancel()
+            try:
+                await self._sender
+            except asyncio.CancelledError:
+                pass
+            self._sender = None
+        self.loop = None
+
+    def publish(self, event: dict):
+        """Kirim event ke worker lain. Aman dipanggil dari thread mana pun"""
+        if self.loop is None:
+            return
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+        if current is self.loop:
+            self._enqueue(event)
+        else:
+            self.loop.call_soon_threadsafe(self._enqueue, event)
+
+    def _enqueue(self, event: dict):
+        if self._queue is None:
+            return
+        if self._queue.full():
+            dropped = self._queue.get_nowait()
+            self.dropped += 1
+            print(f"⚠️  Cluster bus queue full, dropped {dropped.get('kind')} event")
+        self._queue.put_nowait(dict(event, origin=self.node_id))
+
+    async def _send_loop(self):
+        while True:
+            event = await self._queue.get()
+            data = json.dumps(event, separators=(",", ":")).encode()
+            if len(data) > MAX_EVENT_BYTES:
+                self.dropped += 1
+                print(
+                    f"⚠️  Cluster bus dropped {event.get('kind')} event "
+                    f"({len(data)} bytes > {MAX_EVENT_BYTES})"
+                )
+                continue
+            try:
+                await self._send(data)
+            except Exception as e:
+                self.dropped += 1
+                print(f"❌ Cluster bus send error: {e}")
+
+    @abc.abstractmethod
+    async def _send(self, data: bytes):
+        """Kirim satu event (sudah di-encode) ke worker lain"""
+
+    def _receive(self, data: bytes):
+        try:
+            event = json.loads(data)
+        except ValueError:
+            return
+        if not isinstance(event, dict) or event.get("origin") == self.node_id:
+            return
+        try:
+            self.handler(event)
+        except Exception as e:
+            print(f"❌ Cluster bus handler error: {e}")
+
+
+class LocalBus(Bus):
+    """Satu proses: tidak ada yang perlu di-relay"""
+
+    relays = False
+
+    def publish(self, event: dict):
+        pass
+
+    async def _send(self, data: bytes):
+        pass
+
+
+class UnixSocketBus(Bus):
+    """
+    Setiap worker bind satu Unix datagram socket di socket_dir, publish =
+    sendto ke semua socket lain di folder itu. Socket worker yang sudah
+    mati (ConnectionRefused) dihapus otomatis.
+    """
+
+    def __init__(self, socket_dir: str):
+        super().__init__()
+        self.socket_dir = socket_dir
+        self.path = os.path.join(socket_dir, f"worker-{os.getpid()}-{self.node_id}.sock")
+        self._sock: Optional[socket.socket] = None
+        self._peers: List[str] = []
+        self._peers_at = 0.0
+
+    async def start(self, handler: Callable[[dict], None]):
+        os.makedirs(self.socket_dir, exist_ok=True)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(self.path)
+        self._sock.setblocking(False)
+        asyncio.get_running_loop().add_reader(self._sock.fileno(), self._on_readable)
+        await super().start(handler)
+
+    async def stop(self):
+        await super().stop()
+        if self._sock:
+            asyncio.get_running_loop().remove_reader(self._sock.fileno())
+            self._sock.close()
+            self._sock = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _on_readable(self):
+        while True:
+            try:
+                data = self._sock.recv(MAX_EVENT_BYTES + 1)
+            except (BlockingIOError, InterruptedError):
+                return
+            self._receive(data)
+
+    def _peer_paths(self) -> List[str]:
+        now = time.monotonic()
+        if now - self._peers_at >= PEER_REFRESH_SECONDS:
+            self._peers = [
+                os.path.join(self.socket_dir, name)
+                for name in os.listdir(self.socket_dir)
+                if name.endswith(".sock")
+            ]
+            self._peers_at = now
+        return [path for path in self._peers if path != self.path]
+
+    async def _send(self, data: bytes):
+        for path in self._peer_paths():
+            try:
+                self._sock.sendto(data, path)
+            except ConnectionRefusedError:
+                # Worker sudah mati, socket-nya sisa
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                self._peers_at = 0.0
+            except FileNotFoundError:
+                self._peers_at = 0.0
+            except BlockingIOError:
+                # Buffer worker tujuan penuh (worker macet), event di-drop
+                self.dropped += 1
+
+
+class RedisBus(Bus):
+    """Redis pub/sub (redis.asyncio.Redis atau MemoryRedis)"""
+
+    def __init__(self, client, channel: str):
+        super().__init__()
+        self.client = client
+        self.channel = channel
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self, handler: Callable[[dict], None]):
+        self._pubsub = self.client.pubsub()
+        await self._pubsub.subscribe(self.channel)
+        self._listener = asyncio.create_task(self._listen())
+        await super().start(handler)
+
+    async def stop(self):
+        await super().stop()
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+        if self._pubsub is not None:
+            await self._pubsub.unsubscribe(self.channel)
+            close = getattr(self._pubsub, "aclose", None) or self._pubsub.close
+            await close()
+
+    async def _listen(self):
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    if message.get("type") == "message":
+                        data = message["data"]
+                        self._receive(data.encode() if isinstance(data, str) else data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Cluster bus receive error: {e}")
+                await asyncio.sleep(1)
+
+    async def _send(self, data: bytes):
+        await self.client.publish(self.channel, data)
+
+
+class MemoryRedis:
+    """
+    Stand-in in-process untuk redis.asyncio.Redis (publish & pubsub saja)
+
+    Semua instance yang memakai hub yang sama saling terhubung, jadi test
+    bisa mensimulasikan beberapa worker dalam satu proses tanpa server Redis
+    """
+
+    default_hub: Dict[str, List[asyncio.Queue]] = {}
+
+    def __init__(self, hub: Optional[Dict[str, List[asyncio.Queue]]] = None):
+        self.hub = MemoryRedis.default_hub if hub is None else hub
+
+    async def publish(self, channel: str, data) -> int:
+        subscribers = self.hub.get(channel, [])
+        for subscriber in subscribers:
+            subscriber.put_nowait({"type": "message", "channel": channel, "data": data})
+        return len(subscribers)
+
+    def pubsub(self) -> "MemoryPubSub":
+        return MemoryPubSub(self.hub)
+
+
+class MemoryPubSub:
+    def __init__(self, hub: Dict[str, List[asyncio.Queue]]):
+        self.hub = hub
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.channels: List[str] = []
+
+    async def subscribe(self, *channels: str):
+        for channel in channels:
+            self.hub.setdefault(channel, []).append(self.queue)
+            self.channels.append(channel)
+
+    async def unsubscribe(self, *channels: str):
+        for channel in channels or list(self.channels):
+            if self.queue in self.hub.get(channel, []):
+                self.hub[channel].remove(self.queue)
+            if channel in self.channels:
+                self.channels.remove(channel)
+
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+
+    async def aclose(self):
+        await self.unsubscribe()
+
+
+def create_bus(backend: str, socket_dir: str, redis_url: str, channel: str) -> Bus:
+    """Buat bus sesuai BROADCAST_BACKEND"""
+    if backend == "local":
+        return LocalBus()
+    if backend == "unix":
+        return UnixSocketBus(socket_dir)
+    if backend == "memory":
+        return RedisBus(MemoryRedis(), channel)
+    if backend == "redis":
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError:
+            raise RuntimeError(
+                "BROADCAST_BACKEND=redis butuh package redis: pip install redis"
+            )
+        return RedisBus(redis_asyncio.from_url(redis_url), channel)
+    raise ValueError(f"BROADCAST_BACKEND tidak dikenal: {backend}")
+
+
+class LeaderLock:
+    """
+    Lock file non-blocking: hanya satu proses yang bisa pegang. Dilepas
+    otomatis oleh OS kalau proses mati, jadi worker lain bisa ambil alih.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        if fcntl is None:
+            self._fd = -1
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        if self._fd >= 0:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+        self._fd = None
@@ -0,0 +1,117 @@
+"""
+Dispatcher - UISI Shuttle
+=========================
+
+Bagian dispatcher otomatis yang tidak butuh database / state server:
+
+- hungarian()    : assignment biaya minimum request <-> shuttle
+- assign_pairs() : hungarian() untuk matrix berapa pun bentuknya
+                   (request lebih banyak dari shuttle di-transpose dulu)
+- ShuttleGrid    : grid index posisi shuttle, kandidat per titik jemput
+
+Biaya (ETA ke titik jemput) & pemilihan kandidat ada di main.py.
+"""
+
+import math
+from typing import Dict, List
+
+# Biaya pasangan request <-> shuttle yang tidak boleh dipilih
+UNASSIGNABLE = 1e9
+
+
+def hungarian(cost: List[List[float]]) -> List[int]:
+    """
+    Assignment biaya minimum (Hungarian / Kuhn-Munkres, O(n^2 m))
+    cost: matrix n baris x m kolom, n <= m
+    Returns: kolom untuk setiap baris
+    """
+    n = len(cost)
+    m = len(cost[0]) if n else 0
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    match = [0] * (m + 1)  # match[kolom] = baris (1-based), 0 = kosong
+    way = [0] * (m + 1)
+
+    for row in range(1, n + 1):
+        match[0] = row
+        col0 = 0
+        min_value = [math.inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[col0] = True
+            row0 = match[col0]
+            delta = math.inf
+            col1 = 0
+            for col in range(1, m + 1):
+                if used[col]:
+                    continue
+                current = cost[row0 - 1][col - 1] - u[row0] - v[col]
+                if current < min_value[col]:
+                    min_value[col] = current
+                    way[col] = col0
+                if min_value[col] < delta:
+                    delta = min_value[col]
+                    col1 = col
+            for col in range(m + 1):
+                if used[col]:
+                    u[match[col]] += delta
+                    v[col] -= delta
+                else:
+                    min_value[col] -= delta
+            col0 = col1
+            if match[col0] == 0:
+                break
+        while col0:
+            col1 = way[col0]
+            match[col0] = match[col1]
+            col0 = col1
+
+    assignment = [-1] * n
+    for col in range(1, m + 1):
+        if match[col]:
+            assignment[match[col] - 1] = col - 1
+    return assignment
+
+
+class ShuttleGrid:
+    """Grid index posisi shuttle, cell seukuran radius pencarian"""
+
+    def __init__(self, cell_km: float):
+        self.cell_deg = cell_km / 111.0
+        self._cells: Dict[tuple, List[dict]] = {}
+
+    def _cell(self, lat: float, lon: float) -> tuple:
+        return (int(math.floor(lat / self.cell_deg)), int(math.floor(lon / self.cell_deg)))
+
+    def add(self, candidate: dict):
+        cell = self._cell(candidate["latitude"], candidate["longitude"])
+        self._cells.setdefault(cell, []).append(candidate)
+
+    def nearby(self, lat: float, lon: float) -> List[dict]:
+        row, col = self._cell(lat, lon)
+        return [
+            candidate
+            for d_row in (-1, 0, 1)
+            for d_col in (-1, 0, 1)
+            for candidate in self._cells.get((row + d_row, col + d_col), ())
+        ]
+
+
+def assign_pairs(cost: List[List[float]]) -> List[tuple]:
+    """
+    Assignment biaya minimum untuk matrix request x shuttle
+    Returns: [(baris, kolom), ...] tanpa pasangan UNASSIGNABLE
+    """
+    if not cost:
+        return []
+    # Hungarian butuh baris <= kolom: kalau request lebih banyak, transpose
+    if len(cost) <= len(cost[0]):
+        pairs = list(enumerate(hungarian(cost)))
+    else:
+        transposed = [list(column) for column in zip(*cost)]
+        pairs = sorted((row, col) for col, row in enumerate(hungarian(transposed)))
+    return [
+        (row, col)
+        for row, col in pairs
+        if col >= 0 and cost[row][col] < UNASSIGNABLE
+    ]
@@ -0,0 +1,215 @@
+"""
+Location History Archive - UISI Shuttle
+=======================================
+
+location_history bertambah 1 baris / 5 detik / shuttle. Supaya tabel
+utama tetap kecil, baris lama dipindah ke file SQLite per bulan:
+
+    backend/archive/location_history_2025_11.db
+
+- archive_batch()   : pindahkan baris lebih lama dari cutoff (per batch)
+- attach_history()  : ATTACH arsip yang dibutuhkan, returns SQL subquery
+                      yang menggabungkan tabel utama + arsip (UNION ALL)
+- attached_partitions() : sama, tapi returns nama schema per partisi
+                      (ArchiveRangeError kalau lebih dari MAX_ATTACHED bulan)
+- history_tables()  : iterasi semua partisi (arsip lama dulu), untuk job
+                      offline seperti scripts/train_travel_times.py
+
+Id baris tetap sama di arsip (PRIMARY KEY), jadi memindahkan ulang baris
+yang sama (misal setelah crash) tidak membuat duplikat.
+"""
+
+import os
+import re
+import sqlite3
+from contextlib import contextmanager
+from typing import List, Optional
+
+ARCHIVE_DIR = os.getenv(
+    "ARCHIVE_DIR", os.path.join(os.path.dirname(__file__), "archive")
+)
+# SQLite default maksimal 10 database ter-ATTACH per koneksi
+MAX_ATTACHED = 9
+
+ARCHIVE_COLUMNS = "id, shuttle_id, latitude, longitude, speed, heading, accuracy, timestamp"
+
+ARCHIVE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS {schema}.location_history (
+        id INTEGER PRIMARY KEY,
+        shuttle_id INTEGER,
+        latitude REAL NOT NULL,
+        longitude REAL NOT NULL,
+        speed REAL,
+        heading REAL,
+        accuracy REAL,
+        timestamp TIMESTAMP
+    )
+"""
+ARCHIVE_INDEX = """
+    CREATE INDEX IF NOT EXISTS {schema}.idx_archive_shuttle_time
+    ON location_history(shuttle_id, timestamp)
+"""
+
+MONTH_PATTERN = re.compile(r"^location_history_(\d{4})_(\d{2})\.db$")
+
+
+class ArchiveRangeError(ValueError):
+    """Rentang waktu butuh lebih dari MAX_ATTACHED arsip sekaligus"""
+
+
+def archive_path(month: str) -> str:
+    """"2025-11" -> backend/archive/location_history_2025_11.db"""
+    return os.path.join(ARCHIVE_DIR, f"location_history_{month.replace('-', '_')}.db")
+
+
+def list_archive_months() -> List[str]:
+    """Semua bulan yang punya file arsip, urut dari yang paling lama"""
+    if not os.path.isdir(ARCHIVE_DIR):
+        return []
+    months = []
+    for filename in os.listdir(ARCHIVE_DIR):
+        match = MONTH_PATTERN.match(filename)
+        if match:
+            months.append(f"{match.group(1)}-{match.group(2)}")
+    return sorted(months)
+
+
+def months_between(start: str, end: str) -> List[str]:
+    """Bulan arsip yang overlap dengan rentang timestamp [start, end]"""
+    return [month for month in list_archive_months() if start[:7] <= month <= end[:7]]
+
+
+def schema_name(month: str) -> str:
+    return f"archive_{month.replace('-', '_')}"
+
+
+def attach(conn: sqlite3.Connection, month: str, create: bool = False) -> Optional[str]:
+    """ATTACH file arsip satu bulan, returns nama schema (None kalau tidak ada)"""
+    path = archive_path(month)
+    if not create and not os.path.exists(path):
+        return None
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    schema = schema_name(month)
+    conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+    if create:
+        conn.execute(ARCHIVE_SCHEMA.format(schema=schema))
+        conn.execute(ARCHIVE_INDEX.format(schema=schema))
+    return schema
+
+
+def detach(conn: sqlite3.Connection, schema: str):
+    conn.execute(f"DETACH DATABASE {schema}")
+
+
+def archive_batch(conn: sqlite3.Connection, cutoff: str, batch_size: int) -> int:
+    """
+    Pindahkan maksimal batch_size baris (timestamp < cutoff) dari tabel
+    utama ke arsip bulanannya, satu transaksi per bulan.
+    Posisi terakhir tiap shuttle tidak pernah dipindah.
+    Returns: jumlah baris yang dipindah
+    """
+    if conn.in_transaction:
+        conn.commit()
+
+    rows = conn.execute(
+        """
+        SELECT id, substr(timestamp, 1, 7) AS month
+        FROM location_history
+        WHERE timestamp < ?
+          AND id NOT IN (
+              SELECT MAX(id) FROM location_history GROUP BY shuttle_id
+          )
+        ORDER BY id
+        LIMIT ?
+    """,
+        (cutoff, batch_size),
+    ).fetchall()
+
+    by_month = {}
+    for row_id, month in rows:
+        by_month.setdefault(month, []).append(row_id)
+
+    moved = 0
+    for month, ids in sorted(by_month.items()):
+        schema = attach(conn, month, create=True)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS archive_ids (id INTEGER PRIMARY KEY)")
+            conn.execute("DELETE FROM archive_ids")
+            conn.executemany("INSERT INTO archive_ids (id) VALUES (?)", [(i,) for i in ids])
+            conn.execute(f"""
+                INSERT OR IGNORE INTO {schema}.location_history ({ARCHIVE_COLUMNS})
+                SELECT {ARCHIVE_COLUMNS} FROM main.location_history
+                WHERE id IN (SELECT id FROM archive_ids)
+            """)
+            conn.execute(
+                "DELETE FROM main.location_history WHERE id IN (SELECT id FROM archive_ids)"
+            )
+            conn.commit()
+            moved += len(ids)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            detach(conn, schema)
+    return moved
+
+
+@contextmanager
+def attached_partitions(conn: sqlite3.Connection, start: str, end: str):
+    """
+    ATTACH arsip yang overlap dengan [start, end], yield list nama schema
+    partisi (selalu diawali "main"). Arsip di-DETACH lagi setelah selesai.
+    Raises ArchiveRangeError kalau butuh lebih dari MAX_ATTACHED arsip
+    (hasilnya akan bolong diam-diam); pakai history_tables() untuk job
+    yang memang membaca semua bulan
+    """
+    months = months_between(start, end)
+    if len(months) > MAX_ATTACHED:
+        raise ArchiveRangeError(
+            f"Range {start[:7]}..{end[:7]} covers {len(months)} archive months "
+            f"(max {MAX_ATTACHED} per query)"
+        )
+    schemas = []
+    try:
+        for month in months:
+            schema = attach(conn, month)
+            if schema:
+                schemas.append(schema)
+        yield ["main"] + schemas
+    finally:
+        if conn.in_transaction:
+            conn.commit()
+        for schema in schemas:
+            detach(conn, schema)
+
+
+@contextmanager
+def attach_history(conn: sqlite3.Connection, start: str, end: str):
+    """
+    Seperti attached_partitions, tapi yield subquery
+    "(SELECT ... FROM main UNION ALL SELECT ... FROM arsip)" untuk dipakai
+    di FROM
+    """
+    with attached_partitions(conn, start, end) as schemas:
+        yield "(" + " UNION ALL ".join(
+            f"SELECT {ARCHIVE_COLUMNS} FROM {schema}.location_history" for schema in schemas
+        ) + ")"
+
+
+def history_tables(conn: sqlite3.Connection):
+    """
+    Generator nama tabel semua partisi location_history: arsip bulan
+    paling lama dulu, terakhir tabel utama. Satu arsip ter-ATTACH per waktu.
+    """
+    for month in list_archive_months():
+        schema = attach(conn, month)
+        if not schema:
+            continue
+        try:
+            yield f"{schema}.location_history"
+        finally:
+            if conn.in_transaction:
+                conn.commit()
+            detach(conn, schema)
+    yield "main.location_history"
@@ -0,0 +1,300 @@
+"""
+Road Network - UISI Shuttle
+===========================
+
+Graph jalan kampus dari extract OpenStreetMap (.osm XML) untuk ETA
+berdasarkan jarak jalan (bukan garis lurus):
+
+- load_osm()            : parse node + way yang bisa dilewati shuttle
+- set_stops()           : Dijkstra (graph dibalik) dari setiap stop, jadi
+                          jarak "node mana pun -> stop" tinggal lookup tabel,
+                          plus matrix jarak stop-ke-stop
+- snap()                : posisi di-snap ke edge terdekat (grid index)
+- distance_to_stop()    : sisa edge sampai ujungnya + tabel[ujung edge]
+- distances_to_stops()  : sama, ke semua stop sekaligus (snap sekali)
+
+Dipakai oleh main.py (route_distance, StopEtaCache, route planner).
+"""
+
+import heapq
+import math
+import os
+from typing import Dict, List, Optional
+from xml.etree import ElementTree
+
+from travel_times import distance_m
+
+ROAD_GRID_CELL_DEG = 0.001  # ~110 meter per cell
+
+# Jenis jalan OSM yang bisa dilewati shuttle
+DRIVABLE_HIGHWAYS = {
+    "motorway", "trunk", "primary", "secondary", "tertiary", "unclassified",
+    "residential", "service", "living_street", "road",
+    "motorway_link", "trunk_link", "primary_link", "secondary_link",
+    "tertiary_link",
+}
+
+
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    return distance_m(lat1, lon1, lat2, lon2) / 1000
+
+
+def local_xy(lat: float, lon: float, ref_lat: float) -> tuple:
+    """Proyeksi equirectangular lokal dalam km (cukup akurat untuk area kampus)"""
+    return (
+        lon * 111.320 * math.cos(math.radians(ref_lat)),
+        lat * 110.574,
+    )
+
+
+class RoadStopTable:
+    """
+    Tabel jarak ke setiap stop (hasil RoadNetwork.set_stops). Tidak pernah
+    diubah setelah dibuat: refresh membuat tabel baru lalu di-swap dengan
+    satu assignment, jadi pembaca tidak pernah lihat stop baru + matrix lama
+    """
+
+    def __init__(
+        self,
+        locations: List[dict],
+        stops: Dict[tuple, tuple],
+        snaps: List[tuple],
+        dist_to_stop: List[List[float]],
+        matrix: Dict[str, Dict[str, float]],
+    ):
+        self.locations = locations
+        # (lat, lon) stop -> (index stop, node, offset_km)
+        self.stops = stops
+        self.snaps = snaps  # (nama, node, offset_km) per stop
+        self.dist_to_stop = dist_to_stop  # urutan sama dengan locations
+        self.matrix = matrix
+
+
+class RoadNetwork:
+    """Graph jalan kampus + tabel jarak ke setiap stop"""
+
+    def __init__(self, snap_max_m: float = 150.0):
+        # Posisi yang lebih jauh dari ini ke jalan terdekat tidak di-snap (meter)
+        self.snap_max_m = snap_max_m
+        self.loaded = False
+        self.node_coords: List[tuple] = []
+        self.edges: List[tuple] = []  # (u, v, panjang_km), directed
+        self._reverse_adj: List[List[tuple]] = []
+        self._grid: Dict[tuple, List[int]] = {}
+        self._ref_lat = 0.0
+        self._stop_table = RoadStopTable([], {}, [], [], {})
+
+    @property
+    def stop_matrix(self) -> Dict[str, Dict[str, float]]:
+        return self._stop_table.matrix
+
+    @property
+    def stop_locations(self) -> List[dict]:
+        return self._stop_table.locations
+
+    # ---------- build ----------
+
+    def load_osm(self, path: str) -> bool:
+        """Parse extract OSM XML, returns False kalau file tidak ada"""
+        if not os.path.exists(path):
+            return False
+
+        raw_nodes: Dict[str, tuple] = {}
+        ways = []
+        for _, element in ElementTree.iterparse(path, events=("end",)):
+            if element.tag == "node":
+                raw_nodes[element.get("id")] = (
+                    float(element.get("lat")),
+                    float(element.get("lon")),
+                )
+                element.clear()
+            elif element.tag == "way":
+                tags = {
+                    tag.get("k"): tag.get("v") for tag in element.iter("tag")
+                }
+                if tags.get("highway") in DRIVABLE_HIGHWAYS:
+                    refs = [nd.get("ref") for nd in element.iter("nd")]
+                    ways.append((refs, tags.get("oneway", "no")))
+                element.clear()
+
+        index: Dict[str, int] = {}
+        node_coords: List[tuple] = []
+        edges: List[tuple] = []
+        for refs, oneway in ways:
+            refs = [ref for ref in refs if ref in raw_nodes]
+            if oneway == "-1":
+                refs.reverse()
+            for a, b in zip(refs, refs[1:]):
+                for ref in (a, b):
+                    if ref not in index:
+                        index[ref] = len(node_coords)
+                        node_coords.append(raw_nodes[ref])
+                u, v = index[a], index[b]
+                length = distance_km(*node_coords[u], *node_coords[v])
+                edges.append((u, v, length))
+                if oneway not in ("yes", "true", "1", "-1"):
+                    edges.append((v, u, length))
+
+        self._build(node_coords, edges)
+        return self.loaded
+
+    def _build(self, node_coords: List[tuple], edges: List[tuple]):
+        reverse_adj: List[List[tuple]] = [[] for _ in node_coords]
+        for u, v, length in edges:
+            reverse_adj[v].append((u, length))
+
+        ref_lat = (
+            sum(lat for lat, _ in node_coords) / len(node_coords) if node_coords else 0.0
+        )
+        grid: Dict[tuple, List[int]] = {}
+        for edge_index, (u, v, _) in enumerate(edges):
+            (lat1, lon1), (lat2, lon2) = node_coords[u], node_coords[v]
+            for row in range(
+                int(math.floor(min(lat1, lat2) / ROAD_GRID_CELL_DEG)),
+                int(math.floor(max(lat1, lat2) / ROAD_GRID_CELL_DEG)) + 1,
+            ):
+                for col in range(
+                    int(math.floor(min(lon1, lon2) / ROAD_GRID_CELL_DEG)),
+                    int(math.floor(max(lon1, lon2) / ROAD_GRID_CELL_DEG)) + 1,
+                ):
+                    grid.setdefault((row, col), []).append(edge_index)
+
+        self.node_coords = node_coords
+        self.edges = edges
+        self._reverse_adj = reverse_adj
+        self._grid = grid
+        self._ref_lat = ref_lat
+        self.loaded = bool(edges)
+
+    def _nearest_node(self, lat: float, lon: float) -> tuple:
+        best = (math.inf, -1)
+        for node, (node_lat, node_lon) in enumerate(self.node_coords):
+            distance = distance_km(lat, lon, node_lat, node_lon)
+            if distance < best[0]:
+                best = (distance, node)
+        return best[1], best[0]
+
+    def _dijkstra_reverse(self, source: int) -> List[float]:
+        """Jarak terpendek dari setiap node KE source (pakai graph terbalik)"""
+        distances = [math.inf] * len(self.node_coords)
+        distances[source] = 0.0
+        heap = [(0.0, source)]
+        while heap:
+            distance, node = heapq.heappop(heap)
+            if distance > distances[node]:
+                continue
+            for previous, length in self._reverse_adj[node]:
+                candidate = distance + length
+                if candidate < distances[previous]:
+                    distances[previous] = candidate
+                    heapq.heappush(heap, (candidate, previous))
+        return distances
+
+    def set_stops(self, locations: List[dict]):
+        """Precompute tabel jarak ke setiap stop + matrix stop-ke-stop"""
+        if not self.loaded:
+            return
+
+        stops: Dict[tuple, tuple] = {}
+        dist_to_stop: List[List[float]] = []
+        snapped = []
+        for location in locations:
+            node, offset = self._nearest_node(location["latitude"], location["longitude"])
+            key = (location["latitude"], location["longitude"])
+            stops[key] = (len(dist_to_stop), node, offset)
+            dist_to_stop.append(self._dijkstra_reverse(node))
+            snapped.append((location["name"], node, offset))
+
+        stop_matrix: Dict[str, Dict[str, float]] = {}
+        for from_name, from_node, from_offset in snapped:
+            stop_matrix[from_name] = {}
+            for (to_name, _, to_offset), distances in zip(snapped, dist_to_stop):
+                stop_matrix[from_name][to_name] = (
+                    from_offset + distances[from_node] + to_offset
+                )
+
+        # Dipanggil dari thread reader, query jalan di event loop: swap sekali
+        self._stop_table = RoadStopTable(
+            locations, stops, snapped, dist_to_stop, stop_matrix
+        )
+
+    # ---------- query ----------
+
+    def snap(self, lat: float, lon: float) -> List[tuple]:
+        """
+        Edge terdekat dari posisi (dalam snap_max_m)
+        Returns list (jarak_ke_jalan_km, edge_index, fraksi_sepanjang_edge)
+        untuk edge terdekat & arah sebaliknya (jalan dua arah)
+        """
+        row = int(math.floor(lat / ROAD_GRID_CELL_DEG))
+        col = int(math.floor(lon / ROAD_GRID_CELL_DEG))
+        reach = int(math.ceil(self.snap_max_m / 1000 / 0.11)) + 1
+        px, py = local_xy(lat, lon, self._ref_lat)
+
+        candidates = []
+        seen = set()
+        for d_row in range(-reach, reach + 1):
+            for d_col in range(-reach, reach + 1):
+                for edge_index in self._grid.get((row + d_row, col + d_col), ()):
+                    if edge_index in seen:
+                        continue
+                    seen.add(edge_index)
+                    u, v, _ = self.edges[edge_index]
+                    ax, ay = local_xy(*self.node_coords[u], self._ref_lat)
+                    bx, by = local_xy(*self.node_coords[v], self._ref_lat)
+                    dx, dy = bx - ax, by - ay
+                    length_sq = dx * dx + dy * dy
+                    t = 0.0
+                    if length_sq > 0:
+                        t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length_sq))
+                    off_road = math.hypot(px - (ax + t * dx), py - (ay + t * dy))
+                    if off_road * 1000 <= self.snap_max_m:
+                        candidates.append((off_road, edge_index, t))
+
+        if not candidates:
+            return []
+        nearest = min(candidate[0] for candidate in candidates)
+        # Semua edge yang sama dekatnya (edge & kebalikannya di jalan dua arah)
+        return [c for c in candidates if c[0] <= nearest + 1e-6]
+
+    def distance_to_stop(
+        self, lat: float, lon: float, stop_lat: float, stop_lon: float
+    ) -> Optional[float]:
+        """Jarak jalan (km) dari posisi ke stop, None kalau tidak bisa dihitung"""
+        table = self._stop_table
+        stop = table.stops.get((stop_lat, stop_lon))
+        if stop is None:
+            return None
+        stop_index, _, stop_offset = stop
+        distances = table.dist_to_stop[stop_index]
+
+        best = math.inf
+        for off_road, edge_index, t in self.snap(lat, lon):
+            _, v, length = self.edges[edge_index]
+            best = min(best, off_road + (1 - t) * length + distances[v])
+        if math.isinf(best):
+            return None
+        return best + stop_offset
+
+    def distances_to_stops(
+        self, lat: float, lon: float, locations: List[dict]
+    ) -> Optional[List[float]]:
+        """
+        Jarak jalan (km) ke semua stop sekaligus (snap sekali), urut
+        locations. inf untuk stop yang tidak terjangkau, None kalau posisi
+        tidak bisa di-snap atau tabel stop belum di-build untuk locations
+        """
+        table = self._stop_table
+        if table.locations is not locations:
+            return None
+        candidates = self.snap(lat, lon)
+        if not candidates:
+            return None
+        result = []
+        for (_, _, stop_offset), distances in zip(table.snaps, table.dist_to_stop):
+            best = math.inf
+            for off_road, edge_index, t in candidates:
+                _, v, length = self.edges[edge_index]
+                best = min(best, off_road + (1 - t) * length + distances[v])
+            result.append(best + stop_offset)
+        return result
@@ -0,0 +1,86 @@
+"""
+Route Planner - UISI Shuttle
+============================
+
+Solver pickup-and-delivery kecil untuk menggabungkan beberapa request
+jadi satu rute multi-stop (dipakai plan_itinerary di main.py):
+
+- DFS + branch and bound di atas fungsi jarak antar stop
+- Dropoff selalu setelah pickup-nya
+- Request hanya boleh digabung kalau perjalanan penumpangnya tidak
+  memutar lebih dari batas detour
+
+Cukup cepat untuk beberapa request sekaligus (PLANNER_MAX_REQUESTS).
+"""
+
+import math
+from typing import Callable, Dict, List, Optional
+
+
+def solve_pickup_delivery(
+    requests: List[tuple],
+    distance: Callable[[str, str], float],
+    start_distances: Optional[Dict[str, float]] = None,
+    max_detour: float = 1.5,
+    slack_km: float = 0.3,
+) -> Optional[tuple]:
+    """
+    Urutan stop terpendek untuk sekumpulan request
+    requests: [(request_id, pickup, dropoff), ...] (nama pendek stop)
+    distance: jarak antar dua stop (km)
+    start_distances: jarak posisi shuttle ke setiap pickup (km),
+        None = mulai dari pickup pertama
+    max_detour, slack_km: batas perjalanan penumpang =
+        max(langsung x max_detour, langsung + slack_km)
+    Returns: (total_km, [(stop, action, request_id), ...]) atau None kalau
+    tidak ada urutan yang memenuhi batas detour
+    """
+    limits = [
+        max(
+            distance(pickup, dropoff) * max_detour,
+            distance(pickup, dropoff) + slack_km,
+        )
+        for _, pickup, dropoff in requests
+    ]
+    start_distances = start_distances or {}
+
+    best = [math.inf, None]
+    picked_at: Dict[int, float] = {}
+    path: List[tuple] = []
+
+    def search(current: Optional[str], travelled: float, remaining: int):
+        if travelled >= best[0]:
+            return
+        if remaining == 0:
+            best[0], best[1] = travelled, list(path)
+            return
+        for index, (request_id, pickup, dropoff) in enumerate(requests):
+            if index not in picked_at:
+                stop, action = pickup, "pickup"
+            elif picked_at[index] >= 0:
+                stop, action = dropoff, "dropoff"
+            else:
+                continue  # sudah di-drop
+
+            if current is None:
+                leg = start_distances.get(stop, 0.0)
+            else:
+                leg = distance(current, stop) if current != stop else 0.0
+            arrival = travelled + leg
+
+            path.append((stop, action, request_id))
+            if action == "pickup":
+                picked_at[index] = arrival
+                search(stop, arrival, remaining - 1)
+                del picked_at[index]
+            elif arrival - picked_at[index] <= limits[index]:
+                boarded = picked_at[index]
+                picked_at[index] = -1.0
+                search(stop, arrival, remaining - 1)
+                picked_at[index] = boarded
+            path.pop()
+
+    search(None, 0.0, len(requests) * 2)
+    if best[1] is None:
+        return None
+    return best[0], best[1]
@@ -7,10 +7,16 @@ INSTRUKSI:
 2. Script ini akan:
    - Create database SQLite
    - Create semua tables
+   - Jalankan migration schema (index, dll)
    - Insert 8 lokasi kampus UISI
    - Insert shuttle info
 3. Setelah selesai, jalankan main.py
 
+UPGRADE DATABASE LAMA:
+Jalankan lagi script ini di database yang sudah ada. Data tidak di-reset,
+hanya migration yang belum pernah jalan yang akan di-apply
+(versi schema disimpan di PRAGMA user_version).
+
 CARA JALANKAN:
 python setup_database.py
 
@@ -170,6 +176,210 @@ def create_tables(cursor):
     """)
     print("  ✅ Table: active_routes")
 
+# ==================== MIGRATIONS ====================
+# Versi schema disimpan di PRAGMA user_version.
+# Tambah migration baru di AKHIR list dengan versi berikutnya,
+# JANGAN ubah migration yang sudah pernah di-release.
+
+MIGRATIONS = [
+    (
+        1,
+        "Index untuk query tracking & routing",
+        [
+            # Posisi terakhir / history per shuttle
+            """CREATE INDEX IF NOT EXISTS idx_location_history_shuttle_time
+               ON location_history (shuttle_id, timestamp)""",
+            # Trip per shuttle (statistik jarak)
+            """CREATE INDEX IF NOT EXISTS idx_trips_shuttle_status
+               ON trips (shuttle_id, status)""",
+            """CREATE INDEX IF NOT EXISTS idx_trips_shuttle_start
+               ON trips (shuttle_id, start_time)""",
+            # Trip yang sedang jalan (partial index, selalu kecil)
+            """CREATE INDEX IF NOT EXISTS idx_trips_ongoing
+               ON trips (shuttle_id, start_time) WHERE status = 'ongoing'""",
+            # Daftar request per status
+            """CREATE INDEX IF NOT EXISTS idx_route_requests_status_time
+               ON route_requests (status, request_time)""",
+            # Rute aktif per shuttle (partial index)
+            """CREATE INDEX IF NOT EXISTS idx_active_routes_active
+               ON active_routes (shuttle_id, started_at) WHERE status = 'active'""",
+        ],
+    ),
+    (
+        2,
+        "State write-behind location_history",
+        [
+            # Sequence terakhir dari log write-behind yang sudah masuk database
+            """CREATE TABLE IF NOT EXISTS write_behind_state (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                last_seq INTEGER NOT NULL DEFAULT 0
+            )""",
+            "INSERT OR IGNORE INTO write_behind_state (id, last_seq) VALUES (1, 0)",
+        ],
+    ),
+    (
+        3,
+        "Versi data untuk invalidasi cache lokasi",
+        [
+            # Counter yang naik setiap tabel berubah, dibaca server untuk
+            # tahu kapan cache in-memory harus di-build ulang
+            """CREATE TABLE IF NOT EXISTS cache_versions (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            )""",
+            "INSERT OR IGNORE INTO cache_versions (name, version) VALUES ('routes', 0)",
+            """CREATE TRIGGER IF NOT EXISTS trg_routes_insert AFTER INSERT ON routes
+               BEGIN
+                   UPDATE cache_versions SET version = version + 1 WHERE name = 'routes';
+               END""",
+            """CREATE TRIGGER IF NOT EXISTS trg_routes_update AFTER UPDATE ON routes
+               BEGIN
+                   UPDATE cache_versions SET version = version + 1 WHERE name = 'routes';
+               END""",
+            """CREATE TRIGGER IF NOT EXISTS trg_routes_delete AFTER DELETE ON routes
+               BEGIN
+                   UPDATE cache_versions SET version = version + 1 WHERE name = 'routes';
+               END""",
+        ],
+    ),
+    (
+        4,
+        "Model waktu tempuh antar stop (scripts/train_travel_times.py)",
+        [
+            # weekday -1 / hour -1 = tidak dipakai; total_seconds / samples = rata-rata
+            """CREATE TABLE IF NOT EXISTS segment_travel_times (
+                from_stop TEXT NOT NULL,
+                to_stop TEXT NOT NULL,
+                weekday INTEGER NOT NULL,
+                hour INTEGER NOT NULL,
+                samples INTEGER NOT NULL DEFAULT 0,
+                total_seconds REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (from_stop, to_stop, weekday, hour)
+            ) WITHOUT ROWID""",
+            # Posisi training terakhir per shuttle (supaya incremental)
+            """CREATE TABLE IF NOT EXISTS travel_time_state (
+                shuttle_id INTEGER PRIMARY KEY,
+                last_history_id INTEGER NOT NULL DEFAULT 0,
+                trip_id INTEGER,
+                stop TEXT,
+                departed_at REAL,
+                last_timestamp REAL
+            )""",
+            "INSERT OR IGNORE INTO cache_versions (name, version) VALUES ('travel_times', 0)",
+        ],
+    ),
+    (
+        5,
+        "Rute aktif terhubung ke request-nya (multi-shuttle)",
+        [
+            "ALTER TABLE active_routes ADD COLUMN request_id INTEGER REFERENCES route_requests(id)",
+            """CREATE INDEX IF NOT EXISTS idx_active_routes_request
+               ON active_routes(request_id)""",
+        ],
+    ),
+    (
+        6,
+        "Urutan stop untuk rute multi-stop (gabungan beberapa request)",
+        [
+            # action: 'pickup' / 'dropoff', status: 'pending' / 'done' / 'skipped'
+            """CREATE TABLE IF NOT EXISTS active_route_stops (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                route_id INTEGER NOT NULL REFERENCES active_routes(id),
+                seq INTEGER NOT NULL,
+                location TEXT NOT NULL,
+                action TEXT NOT NULL,
+                request_id INTEGER REFERENCES route_requests(id),
+                status TEXT DEFAULT 'pending',
+                arrived_at TIMESTAMP
+            )""",
+            """CREATE INDEX IF NOT EXISTS idx_active_route_stops_route
+               ON active_route_stops(route_id, seq)""",
+        ],
+    ),
+    (
+        7,
+        "Tanda trip yang GPS-nya sudah disederhanakan (Douglas-Peucker)",
+        [
+            "ALTER TABLE trips ADD COLUMN simplified_at TIMESTAMP",
+            """CREATE INDEX IF NOT EXISTS idx_trips_unsimplified
+               ON trips(end_time)
+               WHERE status = 'completed' AND simplified_at IS NULL""",
+        ],
+    ),
+    (
+        8,
+        "Rekap jarak harian per shuttle",
+        [
+            # Jarak trip per hari mulai trip, di-update setiap GPS fix
+            # (menggantikan SUM(distance) ... WHERE DATE(start_time) = ?)
+            """CREATE TABLE IF NOT EXISTS daily_distance (
+                shuttle_id INTEGER NOT NULL,
+                day TEXT NOT NULL,
+                distance REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (shuttle_id, day)
+            ) WITHOUT ROWID""",
+            """INSERT OR IGNORE INTO daily_distance (shuttle_id, day, distance)
+               SELECT shuttle_id, substr(start_time, 1, 10), SUM(distance)
+               FROM trips
+               GROUP BY shuttle_id, substr(start_time, 1, 10)""",
+        ],
+    ),
+    (
+        9,
+        "Versi route_requests untuk ETag (sama di semua worker)",
+        [
+            "INSERT OR IGNORE INTO cache_versions (name, version) VALUES ('route_requests', 0)",
+            """CREATE TRIGGER IF NOT EXISTS trg_route_requests_insert AFTER INSERT ON route_requests
+               BEGIN
+                   UPDATE cache_versions SET version = version + 1 WHERE name = 'route_requests';
+               END""",
+            """CREATE TRIGGER IF NOT EXISTS trg_route_requests_update AFTER UPDATE ON route_requests
+               BEGIN
+                   UPDATE cache_versions SET version = version + 1 WHERE name = 'route_requests';
+               END""",
+            """CREATE TRIGGER IF NOT EXISTS trg_route_requests_delete AFTER DELETE ON route_requests
+               BEGIN
+                   UPDATE cache_versions SET version = version + 1 WHERE name = 'route_requests';
+               END""",
+        ],
+    ),
+]
+
+
+def get_schema_version(conn):
+    """Versi schema database saat ini (PRAGMA user_version)"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def run_migrations(conn):
+    """
+    Apply semua migration yang belum jalan, satu transaksi per migration
+
+    Aman dijalankan berkali-kali dan di database yang sudah berisi data.
+    Returns: versi schema setelah migration
+    """
+    if conn.in_transaction:
+        conn.commit()
+
+    version = get_schema_version(conn)
+    for target, description, statements in MIGRATIONS:
+        if target <= version:
+            continue
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {int(target)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        version = target
+        print(f"  ✅ Migration {target}: {description}")
+
+    return version
+
+
 def insert_shuttle_info(cursor):
     """Insert info shuttle UISI"""
     
@@ -272,6 +482,12 @@ def main():
         
         # Create tables
         create_tables(cursor)
+        conn.commit()
+        
+        # Upgrade schema (index, dll)
+        print("\n🔧 Running migrations...")
+        version = run_migrations(conn)
+        print(f"  ℹ️  Schema version: {version}")
         
         # Insert shuttle info
         insert_shuttle_info(cursor)
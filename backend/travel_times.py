@@ -0,0 +1,107 @@
+"""
+Travel Time Model - UISI Shuttle
+================================
+
+Logika bersama untuk model waktu tempuh antar stop:
+- scripts/train_travel_times.py : mining location_history + trips (offline)
+- main.py                       : tracking stop terakhir shuttle (live)
+
+Cara kerja:
+- Shuttle dianggap "di stop" kalau posisinya dalam STOP_RADIUS_M
+- Segment = waktu dari meninggalkan stop A sampai tiba di stop B
+- Hasil disimpan di tabel segment_travel_times per (hari, jam) dalam bentuk
+  jumlah sample + total detik, jadi training berikutnya tinggal menambah
+"""
+
+import math
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+# Radius shuttle dianggap berada di stop (meter)
+STOP_RADIUS_M = 40
+# Segment lebih lama dari ini dibuang (parkir, istirahat, dll)
+MAX_SEGMENT_SECONDS = 30 * 60
+# GPS hilang lebih lama dari ini -> posisi stop terakhir tidak dipercaya
+MAX_FIX_GAP_SECONDS = 5 * 60
+# Bucket dengan sample lebih sedikit dari ini tidak dipakai
+MIN_SAMPLES = 3
+
+
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Jarak haversine dalam meter"""
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    a = (
+        math.sin(math.radians(lat2 - lat1) / 2) ** 2
+        + math.cos(lat1_rad) * math.cos(lat2_rad)
+        * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    )
+    return 6371000 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def stop_name(location_name: str) -> str:
+    """"Ged 1 A - Gedung 1 A - Gedung Kuliah" -> "Ged 1 A" """
+    return location_name.split(" - ")[0]
+
+
+def time_bucket(timestamp: float) -> Tuple[int, int]:
+    """(weekday 0=Senin, jam) dari epoch detik, waktu lokal"""
+    moment = datetime.fromtimestamp(timestamp)
+    return moment.weekday(), moment.hour
+
+
+class StopVisitTracker:
+    """
+    State satu shuttle: stop terakhir & kapan meninggalkannya
+
+    observe() dipanggil untuk setiap GPS fix (urut waktu), returns
+    (from_stop, to_stop, departed_at, seconds) saat shuttle tiba di stop lain
+    """
+
+    def __init__(self, stops: List[tuple]):
+        self.stops = stops  # [(nama, lat, lon), ...]
+        self.stop: Optional[str] = None
+        self.departed_at: Optional[float] = None
+        self.last_timestamp: Optional[float] = None
+
+    def reset(self):
+        self.stop = None
+        self.departed_at = None
+
+    def nearest_stop(self, lat: float, lon: float) -> Optional[str]:
+        best_name, best_distance = None, STOP_RADIUS_M
+        for name, stop_lat, stop_lon in self.stops:
+            distance = distance_m(lat, lon, stop_lat, stop_lon)
+            if distance <= best_distance:
+                best_name, best_distance = name, distance
+        return best_name
+
+    def observe(self, lat: float, lon: float, timestamp: float) -> Optional[tuple]:
+        if (
+            self.last_timestamp is not None
+            and timestamp - self.last_timestamp > MAX_FIX_GAP_SECONDS
+        ):
+            self.reset()
+        self.last_timestamp = timestamp
+
+        here = self.nearest_stop(lat, lon)
+        if here is None:
+            # Baru meninggalkan stop
+            if self.stop is not None and self.departed_at is None:
+                self.departed_at = timestamp
+            return None
+
+        segment = None
+        if here != self.stop and self.stop is not None and self.departed_at is not None:
+            seconds = timestamp - self.departed_at
+            if 0 < seconds <= MAX_SEGMENT_SECONDS:
+                segment = (self.stop, here, self.departed_at, seconds)
+        self.stop = here
+        self.departed_at = None
+        return segment
+
+    def state(self) -> tuple:
+        return self.stop, self.departed_at, self.last_timestamp
+
+    def restore(self, stop: Optional[str], departed_at: Optional[float], last_timestamp: Optional[float]):
+        self.stop, self.departed_at, self.last_timestamp = stop, departed_at, last_timestamp
@@ -0,0 +1,187 @@
+"""
+Location Write-Behind Buffer - UISI Shuttle
+===========================================
+
+Mode opsional (LOCATION_WRITE_BEHIND=1): GPS fix di-ACK setelah masuk
+buffer memory + append log, lalu background task yang menyimpan ke
+SQLite dalam batch (setiap flush_size fix atau flush_interval detik).
+
+Crash safety: setiap fix punya seq. Log di-rotate sebelum flush dan baru
+dihapus setelah commit; seq terakhir yang sudah masuk disimpan oleh
+callback store dalam transaksi yang sama. Saat startup, replay()
+memasukkan fix di log dengan seq > last_seq ke database.
+
+Akses database lewat callback supaya modul ini tidak tergantung main.py:
+
+- store(entries) -> last_id : simpan batch (seq, row, km, record) +
+                              last_seq dalam satu transaksi
+- load_last_seq() -> int    : seq terakhir yang sudah tersimpan
+- run_write(fn, *args)      : coroutine yang menjalankan fn di thread
+                              writer (db_write di main.py)
+"""
+
+import asyncio
+import json
+import os
+from typing import Awaitable, Callable, List, Optional
+
+StoreBatch = Callable[[List[tuple]], int]
+
+
+class LocationWriteBuffer:
+    """Buffer memory + append log untuk mode write-behind location_history"""
+
+    def __init__(
+        self,
+        log_path: str,
+        store: StoreBatch,
+        load_last_seq: Callable[[], int],
+        run_write: Callable[..., Awaitable],
+        flush_size: int = 200,
+        flush_interval: float = 2.0,
+        fsync: bool = False,
+    ):
+        self.log_path = log_path
+        self.flushing_path = log_path + ".flushing"
+        self.store = store
+        self.load_last_seq = load_last_seq
+        self.run_write = run_write
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        # Log di-flush ke OS setiap append (aman kalau proses crash);
+        # fsync juga aman kalau listrik mati (lebih lambat)
+        self.fsync = fsync
+        self._entries: List[tuple] = []
+        self._seq = 0
+        self._fd: Optional[int] = None
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    # ---------- startup (sync, jalan di thread writer) ----------
+
+    def _read_log(self, path: str) -> List[dict]:
+        if not os.path.exists(path):
+            return []
+        entries = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # Baris terakhir bisa terpotong kalau crash saat append
+                    break
+        return entries
+
+    def replay(self):
+        """Masukkan fix di log yang belum tersimpan ke database"""
+        last_seq = self.load_last_seq()
+
+        logged = self._read_log(self.flushing_path) + self._read_log(self.log_path)
+        pending = [
+            (entry["seq"], tuple(entry["row"]), entry["km"], None)
+            for entry in logged
+            if entry["seq"] > last_seq
+        ]
+        if pending:
+            self.store(pending)
+            print(f"📝 Replayed {len(pending)} buffered location(s)")
+
+        self._seq = max([last_seq] + [entry["seq"] for entry in logged])
+        for path in (self.flushing_path, self.log_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    # ---------- runtime (event loop) ----------
+
+    def _open_log(self):
+        self._fd = os.open(
+            self.log_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644
+        )
+
+    def append(self, rows: List[tuple], row_increments: List[float], records: List):
+        """Tambah fix ke buffer + log. Setelah return, fix dianggap tersimpan"""
+        if self._fd is None:
+            self._open_log()
+
+        entries = []
+        lines = []
+        for row, distance_increment, record in zip(rows, row_increments, records):
+            self._seq += 1
+            entries.append((self._seq, row, distance_increment, record))
+            lines.append(
+                json.dumps({"seq": self._seq, "row": row, "km": distance_increment})
+            )
+
+        os.write(self._fd, ("\n".join(lines) + "\n").encode("utf-8"))
+        if self.fsync:
+            os.fsync(self._fd)
+
+        self._entries.extend(entries)
+        if len(self._entries) >= self.flush_size:
+            self._wakeup.set()
+
+    async def flush(self):
+        """Simpan semua isi buffer ke SQLite dalam satu transaksi"""
+        async with self._flush_lock:
+            if not self._entries:
+                return
+            entries, self._entries = self._entries, []
+
+            # Rotate log: append baru masuk file baru, file lama dihapus
+            # setelah commit. (.flushing sisa flush gagal digabung dulu)
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            if not os.path.exists(self.flushing_path):
+                os.replace(self.log_path, self.flushing_path)
+            elif os.path.exists(self.log_path):
+                with open(self.flushing_path, "ab") as dst, open(self.log_path, "rb") as src:
+                    dst.write(src.read())
+                os.remove(self.log_path)
+
+            try:
+                last_id = await self.run_write(self.store, entries)
+            except Exception:
+                # Coba lagi di flush berikutnya, log .flushing tetap disimpan
+                self._entries = entries + self._entries
+                raise
+
+            os.remove(self.flushing_path)
+
+            first_id = last_id - len(entries) + 1
+            for index, entry in enumerate(entries):
+                if entry[3] is not None:
+                    entry[3]["id"] = first_id + index
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop background task & drain buffer ke database"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=self.flush_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"❌ Location flush error: {e}")
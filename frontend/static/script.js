@@ -28,6 +28,20 @@
         let routePolyline;
         let ws;
         let reconnectInterval;
+        // Fallback kalau WebSocket diblok proxy: Server-Sent Events, baru polling
+        let eventSource = null;
+        let wsFailures = 0;
+        const WS_FAILURES_BEFORE_SSE = 2;
+        const SHUTTLE_ID = 1;
+        // Pakai format binary ringkas untuk location_update (lihat main.py)
+        const USE_COMPACT_PROTOCOL = true;
+        // ETA semua stop di-refresh paling sering sekali per interval ini
+        const STOP_ETA_INTERVAL_MS = 5000;
+        let lastStopEtaFetch = 0;
+        // Tunggu snapshot WebSocket selama ini sebelum fallback ke REST
+        const SNAPSHOT_TIMEOUT_MS = 3000;
+        let snapshotReceived = false;
+        let locationsLoaded = false;
 
         // ============================================
         // INITIALIZE MAP
@@ -92,7 +106,7 @@
                 const response = await fetch(`${API_BASE_URL}/api/shuttle/distance`);
                 if (response.ok) {
                     const data = await response.json();
-                    document.getElementById('todayDistance').textContent = data.today_distance.toFixed(1);
+                    updateDistance(data);
                 }
             } catch (error) {
                 console.error('Error fetching distance:', error);
@@ -116,20 +130,26 @@
                 const response = await fetch(`${API_BASE_URL}/api/route/active`);
                 if (response.ok) {
                     const data = await response.json();
-                    if (data.active) {
-                        document.getElementById('activeRouteCard').style.display = 'block';
-                        document.getElementById('activeFrom').textContent = data.from;
-                        document.getElementById('activeTo').textContent = data.to;
-                        document.getElementById('activeEta').textContent = data.eta_minutes || '-';
-                    } else {
-                        document.getElementById('activeRouteCard').style.display = 'none';
-                    }
+                    updateActiveRoute(data);
                 }
             } catch (error) {
                 console.error('Error fetching active route:', error);
             }
         }
 
+        async function fetchStopEtas() {
+            lastStopEtaFetch = Date.now();
+            try {
+                const response = await fetch(`${API_BASE_URL}/api/shuttle/eta?shuttle_id=${SHUTTLE_ID}`);
+                if (response.ok) {
+                    const data = await response.json();
+                    updateStopEtas(data.stops);
+                }
+            } catch (error) {
+                console.error('Error fetching stop ETA:', error);
+            }
+        }
+
         // ============================================
         // UPDATE UI
         // ============================================
@@ -151,9 +171,67 @@
             statusBadge.innerHTML = '<div class="pulse"></div><span>Shuttle Aktif</span>';
             
             document.getElementById('shuttleStatusText').innerHTML = '<i class="fas fa-circle"></i> Aktif';
+            
+            // ETA semua stop ikut berubah kalau posisi berubah
+            if (Date.now() - lastStopEtaFetch >= STOP_ETA_INTERVAL_MS) {
+                fetchStopEtas();
+            }
+        }
+
+        function updateDistance(data) {
+            document.getElementById('todayDistance').textContent = data.today_distance.toFixed(1);
+        }
+
+        function updateActiveRoute(data) {
+            if (data.active) {
+                document.getElementById('activeRouteCard').style.display = 'block';
+                document.getElementById('activeFrom').textContent = data.from;
+                document.getElementById('activeTo').textContent = data.to;
+                document.getElementById('activeEta').textContent = data.eta_minutes || '-';
+            } else {
+                document.getElementById('activeRouteCard').style.display = 'none';
+            }
+        }
+
+        function showWaitingForGps() {
+            document.getElementById('shuttleStatus').innerHTML = 
+                '<div class="pulse"></div><span>Menunggu GPS...</span>';
+        }
+
+        // Snapshot dari server saat WebSocket connect (pengganti REST awal)
+        function applySnapshot(data) {
+            snapshotReceived = true;
+            if (!locationsLoaded) {
+                displayLocations(data.locations);
+            }
+
+            const shuttle = data.shuttles.find((s) => s.shuttle_id === SHUTTLE_ID);
+            if (!shuttle) {
+                showWaitingForGps();
+                return;
+            }
+            if (shuttle.location) {
+                updateShuttlePosition(shuttle.location);
+            } else {
+                showWaitingForGps();
+            }
+            updateDistance(shuttle.distance);
+            updateActiveRoute(shuttle.active_route);
+        }
+
+        function updateStopEtas(stops) {
+            stops.forEach((stop) => {
+                const item = document.querySelector(`.route-item[data-location="${CSS.escape(stop.location_name)}"]`);
+                if (!item) {
+                    return;
+                }
+                const eta = stop.eta_minutes < 1 ? 'Tiba < 1 menit' : `${stop.eta_minutes} menit`;
+                item.querySelector('.route-eta').textContent = `${eta} • ${stop.distance_km.toFixed(1)} km`;
+            });
         }
 
         function displayLocations(locations) {
+            locationsLoaded = true;
             const routeList = document.getElementById('routeList');
             routeList.innerHTML = '';
             
@@ -161,6 +239,7 @@
                 const name = loc.location_name.split(' - ')[0];
                 const item = document.createElement('div');
                 item.className = 'route-item';
+                item.dataset.location = loc.location_name;
                 item.innerHTML = `
                     <div class="route-marker">${index + 1}</div>
                     <div class="route-info">
@@ -178,14 +257,87 @@
             });
         }
 
+        // ============================================
+        // COMPACT BINARY PROTOCOL DECODER
+        // ============================================
+        const FRAME_KEY = 1;
+        const FRAME_DELTA = 2;
+        const FRAME_ACK = 3;
+        const FRAME_HISTORY = 64;
+        // shuttle_id -> Map(seq -> {lat, lng, ms}) posisi absolut per frame
+        const compactFrames = new Map();
+
+        function decodeCompactFrame(buffer) {
+            const view = new DataView(buffer);
+            const type = view.getUint8(0);
+            const shuttleId = view.getUint16(2, true);
+            const seq = view.getUint16(4, true);
+            let state, speed, heading;
+
+            if (!compactFrames.has(shuttleId)) {
+                compactFrames.set(shuttleId, new Map());
+            }
+            const frames = compactFrames.get(shuttleId);
+
+            if (type === FRAME_KEY) {
+                state = {
+                    lat: view.getInt32(6, true),
+                    lng: view.getInt32(10, true),
+                    ms: view.getUint32(18, true) * 1000 + view.getUint16(22, true)
+                };
+                speed = view.getUint16(14, true);
+                heading = view.getUint16(16, true);
+            } else if (type === FRAME_DELTA) {
+                const base = frames.get(view.getUint16(6, true));
+                if (!base) {
+                    return null;  // Base tidak dikenal, tunggu KEY frame
+                }
+                state = {
+                    lat: base.lat + view.getInt16(8, true),
+                    lng: base.lng + view.getInt16(10, true),
+                    ms: base.ms + view.getUint16(16, true) * 100
+                };
+                speed = view.getUint16(12, true);
+                heading = view.getUint16(14, true);
+            } else {
+                return null;
+            }
+
+            frames.set(seq, state);
+            if (frames.size > FRAME_HISTORY) {
+                frames.delete(frames.keys().next().value);
+            }
+
+            // ACK supaya server boleh kirim delta terhadap frame ini
+            const ack = new DataView(new ArrayBuffer(5));
+            ack.setUint8(0, FRAME_ACK);
+            ack.setUint16(1, shuttleId, true);
+            ack.setUint16(3, seq, true);
+            ws.send(ack.buffer);
+
+            return {
+                shuttle_id: shuttleId,
+                latitude: state.lat / 1e6,
+                longitude: state.lng / 1e6,
+                speed: speed / 10,
+                heading: heading / 100,
+                timestamp: new Date(state.ms).toISOString()
+            };
+        }
+
         // ============================================
         // WEBSOCKET
         // ============================================
         function connectWebSocket() {
-            const wsUrl = API_BASE_URL.replace('http', 'ws') + '/ws/tracking';
+            let wsUrl = API_BASE_URL.replace('http', 'ws') + '/ws/tracking';
+            if (USE_COMPACT_PROTOCOL) {
+                wsUrl += '?encoding=binary';
+            }
             
             try {
                 ws = new WebSocket(wsUrl);
+                ws.binaryType = 'arraybuffer';
+                compactFrames.clear();
                 
                 ws.onopen = () => {
                     console.log('✅ WebSocket connected');
@@ -193,20 +345,32 @@
                         '<i class="fas fa-check-circle"></i><span>Connected to server - Real-time updates active</span>';
                     document.getElementById('connectionAlert').className = 'alert alert-info';
                     
+                    // Hanya terima update shuttle ini & perubahan rute aktif
+                    ws.send(JSON.stringify({
+                        action: 'subscribe',
+                        topics: [`shuttle:${SHUTTLE_ID}`, 'routes']
+                    }));
+                    
                     if (reconnectInterval) {
                         clearInterval(reconnectInterval);
                         reconnectInterval = null;
                     }
+                    
+                    // WebSocket jalan lagi, SSE tidak dibutuhkan
+                    wsFailures = 0;
+                    closeEventStream();
                 };
                 
                 ws.onmessage = (event) => {
-                    const message = JSON.parse(event.data);
-                    
-                    if (message.type === 'location_update') {
-                        updateShuttlePosition(message.data);
-                    } else if (message.type === 'new_route_request') {
-                        fetchActiveRoute();
+                    if (event.data instanceof ArrayBuffer) {
+                        const data = decodeCompactFrame(event.data);
+                        if (data) {
+                            updateShuttlePosition(data);
+                        }
+                        return;
                     }
+
+                    handleMessage(JSON.parse(event.data));
                 };
                 
                 ws.onerror = (error) => {
@@ -215,9 +379,15 @@
                 
                 ws.onclose = () => {
                     console.log('❌ WebSocket disconnected');
-                    document.getElementById('connectionAlert').innerHTML = 
-                        '<i class="fas fa-exclamation-triangle"></i><span>Disconnected from server - Reconnecting...</span>';
-                    document.getElementById('connectionAlert').className = 'alert alert-warning';
+                    wsFailures++;
+                    if (wsFailures >= WS_FAILURES_BEFORE_SSE && !eventSource) {
+                        connectEventStream();
+                    }
+                    if (!eventSource || eventSource.readyState !== EventSource.OPEN) {
+                        document.getElementById('connectionAlert').innerHTML = 
+                            '<i class="fas fa-exclamation-triangle"></i><span>Disconnected from server - Reconnecting...</span>';
+                        document.getElementById('connectionAlert').className = 'alert alert-warning';
+                    }
                     
                     // Try to reconnect
                     if (!reconnectInterval) {
@@ -232,38 +402,102 @@
             }
         }
 
+        // Pesan JSON dari WebSocket maupun SSE
+        function handleMessage(message) {
+            if (message.type === 'snapshot') {
+                applySnapshot(message.data);
+            } else if (message.type === 'location_update') {
+                updateShuttlePosition(message.data);
+            } else if (message.data && message.data.shuttle_id !== SHUTTLE_ID) {
+                return;
+            } else if (message.type === 'distance_update') {
+                updateDistance(message.data);
+            } else if (message.type === 'active_route_update') {
+                updateActiveRoute(message.data);
+            }
+        }
+
         // ============================================
-        // INITIALIZE APP
+        // SERVER-SENT EVENTS (FALLBACK WEBSOCKET)
         // ============================================
-        async function init() {
-            console.log('🚀 Initializing UISI Shuttle Tracking...');
+        const STREAM_EVENTS = ['snapshot', 'location_update', 'distance_update', 'active_route_update'];
+
+        function connectEventStream() {
+            const topics = `shuttle:${SHUTTLE_ID},routes`;
+            eventSource = new EventSource(`${API_BASE_URL}/api/tracking/stream?topics=${encodeURIComponent(topics)}`);
             
-            // Initialize map
-            initMap();
+            eventSource.onopen = () => {
+                console.log('✅ Event stream connected');
+                document.getElementById('connectionAlert').innerHTML = 
+                    '<i class="fas fa-check-circle"></i><span>Connected to server - Real-time updates active (SSE)</span>';
+                document.getElementById('connectionAlert').className = 'alert alert-info';
+            };
+            
+            STREAM_EVENTS.forEach((type) => {
+                eventSource.addEventListener(type, (event) => {
+                    handleMessage(JSON.parse(event.data));
+                });
+            });
             
-            // Fetch initial data
-            await fetchLocations();
+            eventSource.onerror = () => {
+                // Browser reconnect sendiri, kecuali stream sudah CLOSED
+                if (eventSource && eventSource.readyState === EventSource.CLOSED) {
+                    console.log('❌ Event stream closed, fallback ke polling');
+                    eventSource = null;
+                }
+            };
+        }
+
+        function closeEventStream() {
+            if (eventSource) {
+                eventSource.close();
+                eventSource = null;
+            }
+        }
+
+        function isRealtimeConnected() {
+            return (ws && ws.readyState === WebSocket.OPEN) ||
+                (eventSource !== null && eventSource.readyState === EventSource.OPEN);
+        }
+
+        // Fallback REST kalau WebSocket & SSE tidak tersedia
+        async function pollFallback() {
+            if (!locationsLoaded) {
+                await fetchLocations();
+            }
             await fetchDistance();
             await fetchActiveRoute();
             
-            // Try to fetch current location
             const hasLocation = await fetchCurrentLocation();
             if (!hasLocation) {
-                document.getElementById('shuttleStatus').innerHTML = 
-                    '<div class="pulse"></div><span>Menunggu GPS...</span>';
+                showWaitingForGps();
             }
+        }
+
+        // ============================================
+        // INITIALIZE APP
+        // ============================================
+        async function init() {
+            console.log('🚀 Initializing UISI Shuttle Tracking...');
             
-            // Connect WebSocket for real-time updates
+            // Initialize map
+            initMap();
+            
+            // Connect WebSocket: data awal datang sebagai pesan snapshot,
+            // update berikutnya di-push server (tanpa polling)
             connectWebSocket();
             
-            // Update data periodically (fallback jika WebSocket fail)
+            // Snapshot tidak datang (WebSocket gagal) -> ambil lewat REST
+            setTimeout(async () => {
+                if (!snapshotReceived) {
+                    await pollFallback();
+                }
+            }, SNAPSHOT_TIMEOUT_MS);
+            
+            // Polling hanya selama WebSocket & SSE tidak connect
             setInterval(async () => {
-                await fetchDistance();
-                await fetchActiveRoute();
-                
-                // If WebSocket not connected, poll location
-                if (ws.readyState !== WebSocket.OPEN) {
-                    await fetchCurrentLocation();
+                if (!isRealtimeConnected()) {
+                    await pollFallback();
                 }
             }, 10000); // Every 10 seconds
             
@@ -278,5 +512,6 @@
             if (ws) {
                 ws.close();
             }
+            closeEventStream();
         });
 
@@ -22,11 +22,15 @@ FITUR UTAMA:
 
 ENDPOINTS:
 - POST /api/location - Submit GPS dari driver
+- POST /api/location/batch - Submit GPS yang di-buffer (bulk)
 - GET /api/shuttle/current - Posisi shuttle saat ini
+- GET /api/shuttle/eta - ETA ke semua stop
+- GET /api/fleet - Snapshot semua shuttle
 - POST /api/route/request - Request rute baru
 - GET /api/route/requests - Lihat semua request
 - POST /api/route/accept/{id} - Accept request
 - GET /api/route/active - Rute yang sedang aktif
+- GET /api/tracking/stream - Real-time updates via SSE (fallback WebSocket)
 - Dan masih banyak lagi (lihat /docs untuk lengkapnya)
 
 Author: [Your Name]
@@ -34,23 +38,56 @@ Date: November 2025
 Version: 2.0.0
 """
 
+import asyncio
+import hashlib
 import json
 import math
 import os
+import queue
+import re
+import secrets
 import sqlite3
+import struct
 import sys
+import threading
+import time
 from contextlib import asynccontextmanager, contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from collections import deque
 from datetime import datetime, timedelta
-from typing import List, Optional
+from functools import partial
+from typing import Dict, List, Optional, Set
 
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+import numpy as np
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
 # Get the project root directory
 PROJECT_ROOT = os.path.dirname(__file__)
+
+# Migration schema ada di backend/setup_database.py
+sys.path.append(os.path.join(PROJECT_ROOT, "backend"))
+from setup_database import run_migrations  # noqa: E402
+from cluster_bus import LeaderLock, create_bus  # noqa: E402
+from location_archive import (  # noqa: E402
+    ArchiveRangeError,
+    archive_batch,
+    attach_history,
+    attached_partitions,
+)
+from dispatcher import UNASSIGNABLE, ShuttleGrid, assign_pairs  # noqa: E402
+from road_network import RoadNetwork, local_xy  # noqa: E402
+from route_planner import solve_pickup_delivery  # noqa: E402
+from write_behind import LocationWriteBuffer  # noqa: E402
+from travel_times import (  # noqa: E402
+    MIN_SAMPLES,
+    StopVisitTracker,
+    time_bucket,
+)
 DATABASE = os.path.join(PROJECT_ROOT, "backend", "shuttle.db")
 
 # ==================== MODELS ====================
@@ -82,16 +119,98 @@ class RouteRequest(BaseModel):
 
 DATABASE = os.path.join(PROJECT_ROOT, "backend", "shuttle.db")
 
+# Tuning connection pool & SQLite pragmas (bisa di-override lewat env)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(64 * 1024 * 1024)))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_STATEMENT_CACHE = int(os.getenv("DB_STATEMENT_CACHE", "256"))
+
+
+class ConnectionPool:
+    """
+    Pool koneksi SQLite yang dipakai ulang antar request
+
+    - Journal mode WAL: reader tidak nge-block writer (dan sebaliknya)
+    - synchronous=NORMAL: aman di WAL, commit tanpa fsync tiap transaksi
+    - cached_statements: prepared statement di-reuse per koneksi
+    - Koneksi di-buat lazy, maksimal DB_POOL_SIZE yang idle disimpan
+    """
+
+    def __init__(self, database: str, max_idle: int = DB_POOL_SIZE):
+        self.database = database
+        self.max_idle = max_idle
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._journal_mode_set = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.database,
+            timeout=DB_BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            cached_statements=DB_STATEMENT_CACHE,
+        )
+        conn.row_factory = sqlite3.Row
+        with self._lock:
+            if not self._journal_mode_set:
+                # journal_mode persisten di file database, cukup sekali
+                conn.execute("PRAGMA journal_mode = WAL")
+                self._journal_mode_set = True
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def release(self, conn: sqlite3.Connection):
+        # Jangan kembalikan koneksi dengan transaksi yang masih terbuka
+        if conn.in_transaction:
+            conn.rollback()
+        if self._idle.qsize() >= self.max_idle:
+            conn.close()
+            return
+        self._idle.put_nowait(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+db_pool = ConnectionPool(DATABASE)
+
+# Koneksi yang sedang dipakai oleh request/task saat ini. Nested get_db()
+# (misal find_location_coords di dalam get_active_route) memakai koneksi yang
+# sama, jadi satu request cukup satu koneksi.
+_current_conn: ContextVar[Optional[sqlite3.Connection]] = ContextVar(
+    "current_conn", default=None
+)
+
 
 @contextmanager
 def get_db():
-    """Context manager untuk database connection"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+    """Context manager untuk database connection (diambil dari pool)"""
+    shared = _current_conn.get()
+    if shared is not None:
+        yield shared
+        return
+
+    conn = db_pool.acquire()
+    token = _current_conn.set(conn)
     try:
         yield conn
     finally:
-        conn.close()
+        _current_conn.reset(token)
+        db_pool.release(conn)
 
 
 # ==================== UTILITY FUNCTIONS ====================
@@ -118,22 +237,11 @@ def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
 
 
 def find_location_coords(location_name: str) -> tuple:
-    """Cari koordinat lokasi berdasarkan nama"""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            SELECT latitude, longitude FROM routes
-            WHERE location_name LIKE ?
-            LIMIT 1
-        """,
-            (f"%{location_name}%",),
-        )
-
-        result = cursor.fetchone()
-        if result:
-            return (result["latitude"], result["longitude"])
-        return None
+    """Cari koordinat lokasi berdasarkan nama (dari gazetteer, tanpa SQL)"""
+    location = gazetteer.lookup(location_name)
+    if location:
+        return (location["latitude"], location["longitude"])
+    return None
 
 
 def calculate_eta(
@@ -142,31 +250,57 @@ def calculate_eta(
     dest_lat: float,
     dest_lon: float,
     avg_speed: float,
+    shuttle_id: Optional[int] = None,
+) -> int:
+    """
+    Hitung ETA dalam menit (jarak jalan kalau road network tersedia)
+    Kalau shuttle_id diisi & ada waktu tempuh historis untuk segment-nya,
+    pakai model historis
+    """
+    distance = route_distance(current_lat, current_lon, dest_lat, dest_lon)
+    return eta_for_distance(distance, dest_lat, dest_lon, avg_speed, shuttle_id)
+
+
+def eta_for_distance(
+    distance: float,
+    dest_lat: float,
+    dest_lon: float,
+    avg_speed: float,
+    shuttle_id: Optional[int] = None,
 ) -> int:
-    """Hitung ETA dalam menit"""
-    distance = haversine_distance(current_lat, current_lon, dest_lat, dest_lon)
+    """
+    ETA (menit) dari jarak yang sudah dihitung. Dipakai calculate_eta &
+    StopEtaCache supaya ETA satu stop sama di semua endpoint
+    """
+    if shuttle_id is not None:
+        learned = travel_model.remaining_seconds(shuttle_id, distance, dest_lat, dest_lon)
+        if learned is not None:
+            return int(learned / 60)
     if avg_speed <= 0:
-        avg_speed = 25  # Default speed untuk shuttle kampus
+        avg_speed = DEFAULT_SPEED_KMH
     eta_hours = distance / avg_speed
     eta_minutes = int(eta_hours * 60)
     return eta_minutes
 
 
-def get_average_speed(shuttle_id: int = 1, minutes: int = 5) -> float:
-    """Get average speed dalam N menit terakhir"""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        time_threshold = (datetime.now() - timedelta(minutes=minutes)).isoformat()
-        cursor.execute(
-            """
-            SELECT AVG(speed) as avg_speed
-            FROM location_history
-            WHERE shuttle_id = ? AND timestamp > ? AND speed > 0
-        """,
-            (shuttle_id, time_threshold),
-        )
-        result = cursor.fetchone()
-        return result["avg_speed"] if result["avg_speed"] else 25.0
+def parse_timestamp(value: Optional[str]) -> float:
+    """
+    Konversi timestamp ISO 8601 ke epoch detik
+    - Dengan timezone (Z / +07:00): dikonversi sesuai offset-nya
+    - Tanpa timezone: dianggap waktu lokal server
+    - Kosong / tidak valid: pakai waktu sekarang
+    """
+    if value:
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            pass
+    return time.time()
+
+
+def get_average_speed(shuttle_id: int = 1) -> float:
+    """Get average speed dalam SPEED_WINDOW_MINUTES terakhir (tanpa SQL)"""
+    return speed_estimator.average(shuttle_id)
 
 
 @asynccontextmanager
@@ -177,11 +311,43 @@ async def lifespan(app: FastAPI):
         print("   Run: python setup_database.py")
     else:
         print("✅ Database found")
+        try:
+            count = await db_write(warm_caches)
+            print(f"📍 Position cache warmed: {count} shuttle(s)")
+            if road_network.loaded:
+                print(
+                    f"🛣️  Road network loaded: {len(road_network.node_coords)} nodes, "
+                    f"{len(road_network.stop_matrix)} stops"
+                )
+        except sqlite3.OperationalError as e:
+            print(f"⚠️  WARNING: Database belum di-setup ({e})")
+            print("   Run: python setup_database.py")
     print("🚀 Server started...")
     print("🚀 UISI Shuttle Tracking Server started")
     print("📍 API Docs: http://localhost:8000/docs")
     print("🌐 Frontend: http://localhost:8000/")
+    broadcast_scheduler.start()
+    await cluster_bus.start(handle_cluster_event)
+    if cluster_bus.relays:
+        print(f"🔗 Cluster bus: {BROADCAST_BACKEND} (worker {os.getpid()})")
+    gazetteer_task = asyncio.create_task(watch_gazetteer())
+    travel_time_task = asyncio.create_task(watch_travel_times())
+    leader_task = asyncio.create_task(leader_loop())
+    if LOCATION_WRITE_BEHIND:
+        location_buffer.start()
+        print("📝 Write-behind location buffer enabled")
     yield
+    gazetteer_task.cancel()
+    travel_time_task.cancel()
+    leader_task.cancel()
+    try:
+        await leader_task
+    except asyncio.CancelledError:
+        pass
+    await broadcast_scheduler.stop()
+    await location_buffer.stop()
+    await cluster_bus.stop()
+    db_pool.close_all()
     print("👋 Server shutting down...")
 
 
@@ -212,36 +378,2677 @@ if os.path.exists("frontend/static"):
 
 
 # WebSocket manager untuk real-time updates
+#
+# Topic yang bisa di-subscribe client:
+# - "shuttle:<id>" : location_update untuk shuttle tertentu
+# - "requests"     : new_route_request (untuk driver/admin)
+# - "routes"       : perubahan rute aktif (accepted / completed)
+# Client baru otomatis subscribe ke semua topic ("*") sampai dia kirim
+# {"action": "subscribe", "topics": [...]} pertama kali.
+ALL_TOPICS = "*"
+FIXED_TOPICS = {"requests", "routes"}
+
+
+def shuttle_topic(shuttle_id: int) -> str:
+    """Nama topic untuk update posisi satu shuttle"""
+    return f"shuttle:{shuttle_id}"
+
+
+def is_valid_topic(topic: str) -> bool:
+    if topic in FIXED_TOPICS or topic == ALL_TOPICS:
+        return True
+    prefix, _, shuttle_id = topic.partition(":")
+    return prefix == "shuttle" and shuttle_id.isdigit()
+
+
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "32"))
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "10"))
+# Komentar keepalive SSE supaya proxy tidak menutup stream yang idle (detik)
+SSE_KEEPALIVE = float(os.getenv("SSE_KEEPALIVE", "15"))
+
+
+# ==================== COMPACT BINARY PROTOCOL ====================
+#
+# Opt-in: connect ke /ws/tracking?encoding=binary. Default tetap JSON.
+# Hanya location_update yang dikirim binary, pesan lain tetap JSON text.
+# Semua angka little-endian:
+#
+# KEY frame (24 byte) - posisi absolut
+#   u8 type=1 | u8 flags | u16 shuttle_id | u16 seq
+#   i32 lat (microdegree) | i32 lng (microdegree)
+#   u16 speed (0.1 km/h) | u16 heading (0.01 derajat)
+#   u32 timestamp (epoch detik) | u16 milidetik
+#
+# DELTA frame (18 byte) - selisih terhadap frame yang sudah di-ACK client
+#   u8 type=2 | u8 flags | u16 shuttle_id | u16 seq | u16 base_seq
+#   i16 dlat (microdegree) | i16 dlng (microdegree)
+#   u16 speed (0.1 km/h) | u16 heading (0.01 derajat)
+#   u16 dt (0.1 detik sejak timestamp base)
+#
+# ACK dari client (binary, 5 byte): u8 type=3 | u16 shuttle_id | u16 seq
+# Delta hanya dipakai kalau client sudah ACK frame sebelumnya dan selisihnya
+# muat di i16/u16, selain itu server kirim KEY frame.
+
+FRAME_KEY = 1
+FRAME_DELTA = 2
+FRAME_ACK = 3
+KEY_FRAME = struct.Struct("<BBHHiiHHIH")
+DELTA_FRAME = struct.Struct("<BBHHHhhHHH")
+ACK_FRAME = struct.Struct("<BHH")
+COMPACT_HISTORY = 32  # jumlah frame terkirim yang diingat per shuttle
+
+
+class CompactEncoder:
+    """State delta-encoding untuk satu client binary"""
+
+    def __init__(self):
+        self._seq: Dict[int, int] = {}
+        # seq -> (lat_e6, lng_e6, timestamp_ms) sesuai yang direkonstruksi client
+        self._sent: Dict[int, Dict[int, tuple]] = {}
+        self._acked: Dict[int, tuple] = {}
+
+    def ack(self, shuttle_id: int, seq: int):
+        state = self._sent.get(shuttle_id, {}).get(seq)
+        if state is not None:
+            self._acked[shuttle_id] = (seq, state)
+
+    def encode(self, data: dict) -> bytes:
+        shuttle_id = data["shuttle_id"] & 0xFFFF
+        seq = (self._seq.get(shuttle_id, 0) + 1) & 0xFFFF
+        self._seq[shuttle_id] = seq
+
+        lat = round(data["latitude"] * 1e6)
+        lng = round(data["longitude"] * 1e6)
+        speed = min(max(round(data["speed"] * 10), 0), 0xFFFF)
+        heading = round((data["heading"] % 360) * 100) % 36000
+        timestamp_ms = int(parse_timestamp(data["timestamp"]) * 1000)
+
+        frame = None
+        base = self._acked.get(shuttle_id)
+        if base is not None:
+            base_seq, (base_lat, base_lng, base_ms) = base
+            dlat, dlng = lat - base_lat, lng - base_lng
+            dt = (timestamp_ms - base_ms) // 100
+            if -32768 <= dlat <= 32767 and -32768 <= dlng <= 32767 and 0 <= dt <= 0xFFFF:
+                frame = DELTA_FRAME.pack(
+                    FRAME_DELTA, 0, shuttle_id, seq, base_seq,
+                    dlat, dlng, speed, heading, dt,
+                )
+                # Simpan persis seperti yang akan direkonstruksi client
+                lat, lng, timestamp_ms = base_lat + dlat, base_lng + dlng, base_ms + dt * 100
+
+        if frame is None:
+            seconds, millis = divmod(timestamp_ms, 1000)
+            frame = KEY_FRAME.pack(
+                FRAME_KEY, 0, shuttle_id, seq,
+                lat, lng, speed, heading, seconds & 0xFFFFFFFF, millis,
+            )
+
+        sent = self._sent.setdefault(shuttle_id, {})
+        sent[seq] = (lat, lng, timestamp_ms)
+        if len(sent) > COMPACT_HISTORY:
+            del sent[next(iter(sent))]
+        return frame
+
+
+class ClientConnection:
+    """
+    Satu client WebSocket dengan send queue & writer task sendiri
+
+    Broadcast cukup taruh pesan di queue (tidak pernah await network),
+    writer task yang kirim ke socket. Client lambat tidak menahan client lain.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        manager: "ConnectionManager",
+        encoding: str = "json",
+    ):
+        self.websocket = websocket
+        self.manager = manager
+        self.queue: deque = deque()
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.topics = {ALL_TOPICS}
+        self.encoder = CompactEncoder() if encoding == "binary" else None
+
+    @property
+    def key(self):
+        """Key di ConnectionManager.active_connections"""
+        return self.websocket
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    def stop(self):
+        if self.task and self.task is not asyncio.current_task():
+            self.task.cancel()
+
+    async def close(self):
+        try:
+            await asyncio.wait_for(self.websocket.close(code=1011), timeout=1)
+        except Exception:
+            pass
+
+    def enqueue(self, message_type: str, text: str, data: Optional[dict] = None) -> bool:
+        """
+        Masukkan pesan ke queue. Kalau queue penuh, location_update paling
+        lama dibuang supaya client selalu dapat posisi terbaru.
+        Returns False kalau tetap penuh (client terlalu lambat)
+        """
+        if len(self.queue) >= WS_SEND_QUEUE_SIZE:
+            for index, (queued_type, _, _) in enumerate(self.queue):
+                if queued_type == "location_update":
+                    del self.queue[index]
+                    break
+            else:
+                return False
+
+        self.queue.append((message_type, text, data))
+        self.wakeup.set()
+        return True
+
+    async def _send(self, message_type: str, text: str, data: Optional[dict]):
+        if self.encoder and message_type == "location_update" and data:
+            # Di-encode saat kirim: frame yang di-drop tidak pernah di-encode
+            await self.websocket.send_bytes(self.encoder.encode(data))
+        else:
+            await self.websocket.send_text(text)
+
+    async def run(self):
+        """Writer task: kirim isi queue ke socket satu per satu"""
+        try:
+            while True:
+                while not self.queue:
+                    self.wakeup.clear()
+                    await self.wakeup.wait()
+                message_type, text, data = self.queue.popleft()
+                await asyncio.wait_for(
+                    self._send(message_type, text, data), timeout=WS_SEND_TIMEOUT
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Broadcast error: {e}")
+            self.manager.evict(self)
+
+
+class EventStreamClient(ClientConnection):
+    """
+    Client Server-Sent Events (fallback kalau WebSocket diblok proxy)
+
+    Pakai queue & fan-out yang sama dengan client WebSocket, bedanya isi
+    queue dibaca oleh generator StreamingResponse (events()), bukan writer task
+    """
+
+    def __init__(self, manager: "ConnectionManager", topics: Set[str]):
+        super().__init__(None, manager)
+        self.topics = topics or {ALL_TOPICS}
+        self.closed = False
+
+    @property
+    def key(self):
+        return self
+
+    def start(self):
+        pass
+
+    def stop(self):
+        self.closed = True
+        self.wakeup.set()
+
+    async def close(self):
+        self.stop()
+
+    async def events(self):
+        """Generator body text/event-stream"""
+        try:
+            # Browser reconnect otomatis setelah 3 detik kalau stream putus
+            yield "retry: 3000\n\n"
+            while not self.closed:
+                if not self.queue:
+                    self.wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self.wakeup.wait(), timeout=SSE_KEEPALIVE)
+                    except asyncio.TimeoutError:
+                        yield ": keepalive\n\n"
+                    continue
+                message_type, text, _ = self.queue.popleft()
+                yield f"event: {message_type}\ndata: {text}\n\n"
+        finally:
+            self.manager.remove(self)
+
+
 class ConnectionManager:
-    """Manage WebSocket connections untuk broadcast real-time"""
+    """Manage WebSocket & SSE connections untuk broadcast real-time"""
+
+    def __init__(self):
+        self.active_connections: Dict[object, ClientConnection] = {}
+        # Index topic -> client, broadcast hanya menyentuh yang subscribe
+        self.subscribers: Dict[str, Set[ClientConnection]] = {}
+
+    def register(self, client: ClientConnection):
+        self.active_connections[client.key] = client
+        self._index(client, client.topics)
+        client.start()
+
+    def remove(self, key) -> Optional[ClientConnection]:
+        client = self.active_connections.pop(key, None)
+        if client:
+            self._unindex(client, client.topics)
+            client.stop()
+        return client
+
+    async def connect(self, websocket: WebSocket, encoding: str = "json"):
+        await websocket.accept()
+        self.register(ClientConnection(websocket, self, encoding))
+        print(f"✅ WebSocket connected. Total: {len(self.active_connections)}")
+
+    def disconnect(self, websocket: WebSocket):
+        self.remove(websocket)
+        print(f"❌ WebSocket disconnected. Total: {len(self.active_connections)}")
+
+    def open_event_stream(self, topics: Set[str]) -> EventStreamClient:
+        client = EventStreamClient(self, topics)
+        self.register(client)
+        print(f"✅ SSE client connected. Total: {len(self.active_connections)}")
+        return client
+
+    def evict(self, client: ClientConnection):
+        """Buang client yang mati / terlalu lambat tanpa nge-block broadcast"""
+        if self.active_connections.pop(client.key, None) is None:
+            return
+        self._unindex(client, client.topics)
+        client.stop()
+        asyncio.create_task(client.close())
+        print(f"❌ Client evicted. Total: {len(self.active_connections)}")
+
+    def _index(self, client: ClientConnection, topics):
+        for topic in topics:
+            self.subscribers.setdefault(topic, set()).add(client)
+
+    def _unindex(self, client: ClientConnection, topics):
+        for topic in topics:
+            clients = self.subscribers.get(topic)
+            if clients is None:
+                continue
+            clients.discard(client)
+            if not clients:
+                del self.subscribers[topic]
+
+    def subscribe(self, websocket: WebSocket, topics: List[str]) -> List[str]:
+        """Tambah subscription. Subscribe pertama mengganti default "*" """
+        client = self.active_connections.get(websocket)
+        if client is None:
+            return []
+        topics = {topic for topic in topics if is_valid_topic(topic)}
+        if ALL_TOPICS in client.topics and ALL_TOPICS not in topics:
+            self._unindex(client, {ALL_TOPICS})
+            client.topics.discard(ALL_TOPICS)
+        self._index(client, topics - client.topics)
+        client.topics |= topics
+        return sorted(client.topics)
+
+    def unsubscribe(self, websocket: WebSocket, topics: List[str]) -> List[str]:
+        client = self.active_connections.get(websocket)
+        if client is None:
+            return []
+        topics = set(topics) & client.topics
+        self._unindex(client, topics)
+        client.topics -= topics
+        return sorted(client.topics)
+
+    def handle_ack(self, websocket: WebSocket, frame: bytes):
+        """ACK binary dari client: frame ini boleh jadi base delta berikutnya"""
+        client = self.active_connections.get(websocket)
+        if client is None or client.encoder is None or len(frame) != ACK_FRAME.size:
+            return
+        frame_type, shuttle_id, seq = ACK_FRAME.unpack(frame)
+        if frame_type == FRAME_ACK:
+            client.encoder.ack(shuttle_id, seq)
+
+    async def handle_message(self, websocket: WebSocket, text: str):
+        """Proses pesan kontrol dari client (subscribe / unsubscribe)"""
+        try:
+            message = json.loads(text)
+        except ValueError:
+            return
+        if not isinstance(message, dict):
+            return
+
+        action = message.get("action")
+        topics = message.get("topics") or []
+        if not isinstance(topics, list):
+            return
+        topics = [str(topic) for topic in topics]
+
+        if action == "subscribe":
+            current = self.subscribe(websocket, topics)
+        elif action == "unsubscribe":
+            current = self.unsubscribe(websocket, topics)
+        else:
+            return
+
+        client = self.active_connections.get(websocket)
+        if client:
+            reply = {"type": "subscriptions", "topics": current}
+            client.enqueue("subscriptions", json.dumps(reply, separators=(",", ":")))
+
+    def send(self, key, message: dict):
+        """Kirim pesan ke satu client saja (misal snapshot saat connect)"""
+        client = self.active_connections.get(key)
+        if client is None:
+            return
+        text = json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+        if not client.enqueue(message["type"], text, message.get("data")):
+            self.evict(client)
+
+    async def broadcast(self, message: dict, topic: str = ALL_TOPICS):
+        """Broadcast message ke semua client (semua worker) yang subscribe ke topic"""
+        self.broadcast_local(message, topic)
+        relay_event("broadcast", topic=topic, message=message)
+
+    def broadcast_local(self, message: dict, topic: str = ALL_TOPICS):
+        """Broadcast ke client yang connect ke proses ini saja"""
+        targets = set(self.subscribers.get(ALL_TOPICS, ()))
+        if topic != ALL_TOPICS:
+            targets |= self.subscribers.get(topic, set())
+        if not targets:
+            return
+
+        # Serialize sekali, dipakai semua client
+        text = json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+        for client in targets:
+            if not client.enqueue(message["type"], text, message.get("data")):
+                self.evict(client)
+
+
+manager = ConnectionManager()
+
+
+# ==================== BROADCAST SCHEDULER ====================
+
+# Maksimal satu location_update per shuttle per tick (detik). 0 = langsung kirim
+BROADCAST_INTERVAL = float(os.getenv("BROADCAST_INTERVAL", "1.0"))
+# Update di-skip kalau shuttle belum bergerak / belok lebih dari threshold
+BROADCAST_MIN_DISTANCE_M = float(os.getenv("BROADCAST_MIN_DISTANCE_M", "5"))
+BROADCAST_MIN_HEADING_DEG = float(os.getenv("BROADCAST_MIN_HEADING_DEG", "15"))
+# ...tapi tetap dikirim minimal sekali per KEEPALIVE detik
+BROADCAST_KEEPALIVE = float(os.getenv("BROADCAST_KEEPALIVE", "15"))
+
+
+class LocationBroadcastScheduler:
+    """
+    Coalesce location_update per shuttle sebelum di-broadcast
+
+    - submit_location cukup taruh pesan terbaru per shuttle (O(1))
+    - Setiap tick, pesan terbaru tiap shuttle di-broadcast sekali
+    - Update yang jaraknya < BROADCAST_MIN_DISTANCE_M dan beloknya
+      < BROADCAST_MIN_HEADING_DEG dari update terakhir yang dikirim di-skip
+    - State shuttle (distance_update, active_route_update) juga di-coalesce
+      per tick dan hanya dikirim kalau isinya berubah
+    """
+
+    def __init__(self, interval: float = BROADCAST_INTERVAL):
+        self.interval = interval
+        self._pending: Dict[int, dict] = {}
+        self._last_sent: Dict[int, tuple] = {}
+        self._state_pending: Set[int] = set()
+        self._last_state: Dict[tuple, dict] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def publish(self, message: dict):
+        """Jadwalkan location_update, yang lama untuk shuttle sama diganti"""
+        shuttle_id = message["data"]["shuttle_id"]
+        if self._task is None:
+            # Scheduler tidak jalan (BROADCAST_INTERVAL=0): kirim langsung
+            await manager.broadcast(message, shuttle_topic(shuttle_id))
+            return
+        self._pending[shuttle_id] = message
+
+    async def publish_state(self, shuttle_id: int):
+        """Jadwalkan distance_update & active_route_update untuk shuttle"""
+        if self._task is None:
+            await self._send_state(shuttle_id)
+            return
+        self._state_pending.add(shuttle_id)
+
+    async def _send_state(self, shuttle_id: int):
+        for message_type, topic, data in shuttle_state_messages(shuttle_id):
+            key = (message_type, shuttle_id)
+            if self._last_state.get(key) == data:
+                continue
+            self._last_state[key] = data
+            await manager.broadcast({"type": message_type, "data": data}, topic)
+
+    def _should_send(self, shuttle_id: int, data: dict, now: float) -> bool:
+        last = self._last_sent.get(shuttle_id)
+        if last is None:
+            return True
+        last_data, sent_at = last
+        if now - sent_at >= BROADCAST_KEEPALIVE:
+            return True
+
+        moved_m = 1000 * haversine_distance(
+            last_data["latitude"],
+            last_data["longitude"],
+            data["latitude"],
+            data["longitude"],
+        )
+        if moved_m >= BROADCAST_MIN_DISTANCE_M:
+            return True
+
+        turned = abs(data["heading"] - last_data["heading"]) % 360
+        return min(turned, 360 - turned) >= BROADCAST_MIN_HEADING_DEG
+
+    async def flush(self):
+        pending, self._pending = self._pending, {}
+        now = time.monotonic()
+        for shuttle_id, message in pending.items():
+            if not self._should_send(shuttle_id, message["data"], now):
+                continue
+            self._last_sent[shuttle_id] = (message["data"], now)
+            await manager.broadcast(message, shuttle_topic(shuttle_id))
+
+        state_pending, self._state_pending = self._state_pending, set()
+        for shuttle_id in sorted(state_pending):
+            await self._send_state(shuttle_id)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"❌ Broadcast scheduler error: {e}")
+
+
+broadcast_scheduler = LocationBroadcastScheduler()
+
+
+# ==================== FLEET ====================
+#
+# State in-memory per shuttle (satu shard per shuttle): posisi terakhir,
+# trip ongoing, rute aktif & sample speed. Setiap shuttle punya lock sendiri,
+# jadi GPS fix shuttle A tidak menunggu request untuk shuttle B.
+
+
+class ShuttleState:
+    """State satu shuttle, semua akses lewat self.lock"""
+
+    def __init__(self, shuttle_id: int, name: Optional[str] = None):
+        self.shuttle_id = shuttle_id
+        self.name = name or f"Shuttle {shuttle_id}"
+        self.status = "inactive"
+        self.total_distance = 0.0
+        self.position: Optional[dict] = None  # record location_history terakhir
+        self.trip: Optional[dict] = None  # trip ongoing: id, start_time, distance
+        self.active_route: Optional[dict] = None  # baris active_routes
+        self.speed_samples: deque = deque()  # (timestamp, speed)
+        self.speed_sum = 0.0
+        self.daily_distance: Dict[str, float] = {}  # hari mulai trip -> km
+        self.distance_stats: Optional[tuple] = None  # (hari, stats) untuk /api/shuttle/distance
+        self.lock = threading.Lock()
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "shuttle_id": self.shuttle_id,
+                "name": self.name,
+                "status": self.status,
+                "total_distance": round(self.total_distance, 2),
+                "position": dict(self.position) if self.position else None,
+                "trip": dict(self.trip) if self.trip else None,
+                "active_route": dict(self.active_route) if self.active_route else None,
+            }
+
+
+class FleetRegistry:
+    """
+    Registry semua shuttle (dari tabel shuttles + shuttle yang kirim GPS)
+
+    - Di-warm dari database saat startup
+    - Lock registry hanya dipakai saat shuttle baru ditambahkan
+    """
+
+    def __init__(self):
+        self._shuttles: Dict[int, ShuttleState] = {}
+        self._lock = threading.Lock()
+
+    def get(self, shuttle_id: int) -> Optional[ShuttleState]:
+        return self._shuttles.get(shuttle_id)
+
+    def ensure(self, shuttle_id: int) -> ShuttleState:
+        state = self._shuttles.get(shuttle_id)
+        if state is None:
+            with self._lock:
+                state = self._shuttles.setdefault(shuttle_id, ShuttleState(shuttle_id))
+        return state
+
+    def states(self) -> List[ShuttleState]:
+        return sorted(self._shuttles.values(), key=lambda state: state.shuttle_id)
+
+    def add_distance(self, shuttle_id: int, distance_increment: float):
+        """Sama seperti add_distance() di database, untuk state in-memory"""
+        state = self.ensure(shuttle_id)
+        with state.lock:
+            state.status = "active"
+            state.total_distance += distance_increment
+            if state.trip:
+                state.trip["distance"] += distance_increment
+                day = state.trip["start_time"][:10]
+                state.daily_distance[day] = (
+                    state.daily_distance.get(day, 0.0) + distance_increment
+                )
+            state.distance_stats = None
+
+    def set_trip(self, shuttle_id: int, trip: Optional[dict], relay: bool = True):
+        state = self.ensure(shuttle_id)
+        with state.lock:
+            state.trip = trip
+            if trip is None:
+                state.status = "inactive"
+            state.distance_stats = None
+        if relay:
+            relay_event("trip", shuttle_id=shuttle_id, trip=trip)
+
+    def distance_stats(self, shuttle_id: int) -> dict:
+        """
+        Statistik jarak untuk /api/shuttle/distance, di-cache sampai ada
+        GPS fix / trip start / trip end berikutnya (atau ganti hari)
+        """
+        today = datetime.now().date().isoformat()
+        state = self.get(shuttle_id)
+        if state is None:
+            return {
+                "today_distance": 0.0,
+                "current_trip_distance": 0.0,
+                "total_distance": 0.0,
+            }
+        with state.lock:
+            if state.distance_stats is None or state.distance_stats[0] != today:
+                # Hari lama tidak akan dibaca lagi
+                state.daily_distance = {
+                    day: km for day, km in state.daily_distance.items()
+                    if day >= today or (state.trip and day == state.trip["start_time"][:10])
+                }
+                state.distance_stats = (today, {
+                    "today_distance": round(state.daily_distance.get(today, 0.0), 2),
+                    "current_trip_distance": round(
+                        state.trip["distance"] if state.trip else 0.0, 2
+                    ),
+                    "total_distance": round(state.total_distance, 2),
+                })
+            return dict(state.distance_stats[1])
+
+    def set_active_route(
+        self, shuttle_id: int, route: Optional[dict], relay: bool = True
+    ):
+        state = self.ensure(shuttle_id)
+        with state.lock:
+            state.active_route = route
+        if relay:
+            relay_event("active_route", shuttle_id=shuttle_id, route=route)
+
+    def active_route(self, shuttle_id: int) -> Optional[dict]:
+        state = self.get(shuttle_id)
+        if state is None:
+            return None
+        with state.lock:
+            return dict(state.active_route) if state.active_route else None
+
+    def snapshot(self) -> List[dict]:
+        return [state.snapshot() for state in self.states()]
+
+    def warm(self, conn: sqlite3.Connection):
+        """Load shuttle, trip ongoing & rute aktif dari database"""
+        for row in conn.execute("SELECT id, name, status, total_distance FROM shuttles"):
+            state = self.ensure(row["id"])
+            with state.lock:
+                state.name = row["name"]
+                state.status = row["status"] or "inactive"
+                state.total_distance = row["total_distance"] or 0.0
+
+        # ORDER BY ascending: baris terbaru per shuttle menimpa yang lama
+        for row in conn.execute("""
+            SELECT id, shuttle_id, start_time, distance FROM trips
+            WHERE status = 'ongoing'
+            ORDER BY start_time, id
+        """):
+            trip = dict(row)
+            self.set_trip(trip.pop("shuttle_id"), trip, relay=False)
+
+        # Rekap jarak hari ini (+ hari mulai trip yang masih ongoing)
+        for row in conn.execute("""
+            SELECT d.shuttle_id, d.day, d.distance FROM daily_distance d
+            WHERE d.day = DATE('now', 'localtime')
+               OR d.day IN (
+                   SELECT substr(start_time, 1, 10) FROM trips
+                   WHERE status = 'ongoing' AND shuttle_id = d.shuttle_id
+               )
+        """):
+            state = self.ensure(row["shuttle_id"])
+            with state.lock:
+                state.daily_distance[row["day"]] = row["distance"]
+
+        for row in conn.execute("""
+            SELECT * FROM active_routes
+            WHERE status = 'active'
+            ORDER BY started_at, id
+        """):
+            self.set_active_route(row["shuttle_id"], dict(row), relay=False)
+
+        # Urutan stop untuk rute multi-stop
+        for state in self.states():
+            route = state.active_route
+            if not route:
+                continue
+            stops = conn.execute(
+                "SELECT * FROM active_route_stops WHERE route_id = ? ORDER BY seq",
+                (route["id"],),
+            ).fetchall()
+            if stops:
+                route["stops"] = [dict(stop) for stop in stops]
+
+
+fleet = FleetRegistry()
+
+
+# ==================== POSITION CACHE ====================
+
+
+class PositionCache:
+    """
+    Posisi terakhir tiap shuttle (sumber data utama, bukan sekadar cache)
+
+    - Disimpan di ShuttleState masing-masing shuttle (lihat FLEET)
+    - Di-warm dari database saat startup (lifespan)
+    - Di-update oleh submit_location setiap ada GPS fix baru
+    - Endpoint read (/api/shuttle/current, /api/route/active) baca dari sini
+      tanpa query SQL
+    """
+
+    def get(self, shuttle_id: int) -> Optional[dict]:
+        state = fleet.get(shuttle_id)
+        if state is None:
+            return None
+        with state.lock:
+            return dict(state.position) if state.position else None
+
+    def update(self, record: dict):
+        state = fleet.ensure(record["shuttle_id"])
+        with state.lock:
+            state.position = record
+
+    def rollback(self, shuttle_id: int, record: dict, previous: Optional[dict]):
+        """Batalkan update(record) kalau belum ditimpa fix yang lebih baru"""
+        state = fleet.ensure(shuttle_id)
+        with state.lock:
+            if state.position is record:
+                state.position = previous
+
+    def shuttle_ids(self) -> List[int]:
+        return [state.shuttle_id for state in fleet.states() if state.position]
+
+    def warm(self, conn: sqlite3.Connection):
+        """Load posisi terakhir semua shuttle dari location_history"""
+        rows = conn.execute("""
+            SELECT id, shuttle_id, latitude, longitude, speed, heading,
+                   accuracy, timestamp
+            FROM (
+                SELECT *, ROW_NUMBER() OVER (
+                    PARTITION BY shuttle_id ORDER BY timestamp DESC, id DESC
+                ) AS rn
+                FROM location_history
+            )
+            WHERE rn = 1
+        """).fetchall()
+        for row in rows:
+            self.update(dict(row))
+        return len(rows)
+
+
+position_cache = PositionCache()
+
+
+# ==================== LOCATION GAZETTEER ====================
+
+# Seberapa sering server cek apakah tabel routes berubah (detik)
+GAZETTEER_CHECK_INTERVAL = float(os.getenv("GAZETTEER_CHECK_INTERVAL", "5"))
+
+
+def normalize_location_name(name: str) -> str:
+    """Lowercase, buang tanda baca, rapikan spasi: "Ged. 1-A" -> "ged 1 a" """
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", name.casefold()).split())
+
+
+class LocationIndex:
+    """
+    Index lokasi kampus in-memory, di-build dari tabel routes
+
+    Lookup nama:
+    1. Exact match nama lengkap / nama pendek / alias tanpa spasi
+       ("Ged 1 A", "ged 1 a", "GED1A")
+    2. Prefix trie, hanya kalau prefix-nya menunjuk ke SATU lokasi
+       ("wira" -> Wiragraha, tapi "Ged 1" ambigu -> None)
+
+    Di-build ulang kalau cache_versions['routes'] berubah (trigger di
+    tabel routes, termasuk dari scripts/update_coordinates.py)
+    """
+
+    def __init__(self):
+        self.locations: List[dict] = []
+        self.version: Optional[int] = None
+        self._exact: Dict[str, dict] = {}
+        self._trie: dict = {}
+
+    @staticmethod
+    def _keys(location: dict) -> List[str]:
+        short = normalize_location_name(location["name"])
+        return [
+            normalize_location_name(location["location_name"]),
+            short,
+            short.replace(" ", ""),
+        ]
+
+    def build(self, conn: sqlite3.Connection):
+        version = conn.execute(
+            "SELECT version FROM cache_versions WHERE name = 'routes'"
+        ).fetchone()[0]
+        rows = conn.execute("""
+            SELECT location_name, latitude, longitude, MIN(point_order) AS point_order
+            FROM routes
+            GROUP BY location_name, latitude, longitude
+            ORDER BY point_order
+        """).fetchall()
+
+        locations = []
+        exact: Dict[str, dict] = {}
+        trie: dict = {}
+        for row in rows:
+            location = {
+                "name": row["location_name"].split(" - ")[0],
+                "location_name": row["location_name"],
+                "latitude": row["latitude"],
+                "longitude": row["longitude"],
+            }
+            locations.append(location)
+            for key in self._keys(location):
+                # Nama bentrok: lokasi dengan point_order terkecil yang menang
+                exact.setdefault(key, location)
+                node = trie
+                for char in key:
+                    node = node.setdefault(char, {})
+                    node.setdefault("", []).append(location)
+
+        # Swap sekaligus supaya lookup yang sedang jalan tidak lihat index setengah jadi
+        self._exact, self._trie, self.locations = exact, trie, locations
+        self.version = version
+
+    def lookup(self, name: str) -> Optional[dict]:
+        key = normalize_location_name(name)
+        if not key:
+            return None
+        location = self._exact.get(key) or self._exact.get(key.replace(" ", ""))
+        if location:
+            return location
+
+        node = self._trie
+        for char in key:
+            node = node.get(char)
+            if node is None:
+                return None
+        candidates = {id(location): location for location in node[""]}
+        if len(candidates) == 1:
+            return next(iter(candidates.values()))
+        return None
+
+    def current_version(self, conn: sqlite3.Connection) -> int:
+        return conn.execute(
+            "SELECT version FROM cache_versions WHERE name = 'routes'"
+        ).fetchone()[0]
+
+
+gazetteer = LocationIndex()
+
+
+def refresh_gazetteer() -> bool:
+    """Build ulang gazetteer kalau tabel routes berubah. Returns True kalau di-build"""
+    with get_db() as conn:
+        if gazetteer.version == gazetteer.current_version(conn):
+            return False
+        gazetteer.build(conn)
+    road_network.set_stops(gazetteer.locations)
+    travel_model.set_stops(gazetteer.locations)
+    return True
+
+
+async def watch_gazetteer():
+    """
+    Background task: cek versi routes setiap GAZETTEER_CHECK_INTERVAL detik.
+    Sekalian sinkronkan versi route_requests, kalau event dari worker lain
+    sempat di-drop oleh cluster bus
+    """
+    while True:
+        await asyncio.sleep(GAZETTEER_CHECK_INTERVAL)
+        try:
+            if await db_read(refresh_gazetteer):
+                print("📍 Location index rebuilt (routes changed)")
+            await db_read(refresh_route_requests_version)
+        except Exception as e:
+            print(f"❌ Location index refresh error: {e}")
+
+
+# ==================== ROAD NETWORK ====================
+#
+# ETA berdasarkan jarak jalan kampus (bukan garis lurus), opsional.
+# Taruh extract OpenStreetMap (.osm XML) area kampus di ROAD_GRAPH_FILE,
+# contoh export dari https://www.openstreetmap.org/export (pilih area UISI).
+# Kalau file tidak ada, ETA tetap pakai haversine seperti sebelumnya.
+#
+# Graph, snapping & tabel jarak ke stop ada di backend/road_network.py.
+
+ROAD_GRAPH_FILE = os.getenv(
+    "ROAD_GRAPH_FILE", os.path.join(PROJECT_ROOT, "backend", "campus_roads.osm")
+)
+# Posisi yang lebih jauh dari ini ke jalan terdekat tidak di-snap (meter)
+ROAD_SNAP_MAX_M = float(os.getenv("ROAD_SNAP_MAX_M", "150"))
+
+road_network = RoadNetwork(snap_max_m=ROAD_SNAP_MAX_M)
+
+
+def route_distance(
+    current_lat: float, current_lon: float, dest_lat: float, dest_lon: float
+) -> float:
+    """Jarak tempuh (km): lewat road network kalau ada, fallback haversine"""
+    if road_network.loaded:
+        distance = road_network.distance_to_stop(
+            current_lat, current_lon, dest_lat, dest_lon
+        )
+        if distance is not None:
+            return distance
+    return haversine_distance(current_lat, current_lon, dest_lat, dest_lon)
+
+
+# ==================== SPEED ESTIMATOR ====================
+
+SPEED_WINDOW_MINUTES = float(os.getenv("SPEED_WINDOW_MINUTES", "5"))
+SPEED_MAX_SAMPLES = int(os.getenv("SPEED_MAX_SAMPLES", "720"))
+DEFAULT_SPEED_KMH = 25.0  # Default speed untuk shuttle kampus
+
+
+class SpeedEstimator:
+    """
+    Rata-rata speed bergulir per shuttle (ring buffer + running sum)
+
+    - Sample disimpan di ShuttleState masing-masing shuttle (lihat FLEET)
+    - add(): O(1) amortized, dipanggil setiap GPS fix masuk
+    - average(): buang sample di luar window lalu sum / count
+    - Hanya speed > 0 yang dihitung (sama seperti query AVG lama)
+    """
+
+    def __init__(
+        self,
+        window_minutes: float = SPEED_WINDOW_MINUTES,
+        max_samples: int = SPEED_MAX_SAMPLES,
+    ):
+        self.window_seconds = window_minutes * 60
+        self.max_samples = max_samples
+
+    def _evict(self, state: ShuttleState, now: float):
+        samples = state.speed_samples
+        threshold = now - self.window_seconds
+        while samples and (
+            samples[0][0] <= threshold or len(samples) > self.max_samples
+        ):
+            _, speed = samples.popleft()
+            state.speed_sum -= speed
+
+    def add(self, shuttle_id: int, speed: float, timestamp: float):
+        if speed <= 0 or timestamp <= time.time() - self.window_seconds:
+            return
+        state = fleet.ensure(shuttle_id)
+        with state.lock:
+            state.speed_samples.append((timestamp, speed))
+            state.speed_sum += speed
+            self._evict(state, time.time())
+
+    def average(self, shuttle_id: int, default: float = DEFAULT_SPEED_KMH) -> float:
+        state = fleet.get(shuttle_id)
+        if state is None:
+            return default
+        with state.lock:
+            self._evict(state, time.time())
+            count = len(state.speed_samples)
+            if count == 0:
+                return default
+            return state.speed_sum / count
+
+    def warm(self, conn: sqlite3.Connection, shuttle_ids: List[int]):
+        """Isi ulang window dari fix terbaru di database (saat startup)"""
+        for shuttle_id in shuttle_ids:
+            rows = conn.execute(
+                """
+                SELECT speed, timestamp FROM location_history
+                WHERE shuttle_id = ?
+                ORDER BY timestamp DESC LIMIT ?
+            """,
+                (shuttle_id, self.max_samples),
+            ).fetchall()
+            for row in reversed(rows):
+                self.add(shuttle_id, row["speed"] or 0.0, parse_timestamp(row["timestamp"]))
+
+
+speed_estimator = SpeedEstimator()
+
+
+# ==================== TRAVEL TIME MODEL ====================
+#
+# Waktu tempuh antar stop hasil scripts/train_travel_times.py. Saat ETA
+# dihitung, shuttle yang baru meninggalkan stop A menuju B pakai rata-rata
+# historis A -> B di hari & jam yang sama (dikali sisa jarak), bukan
+# jarak / kecepatan rata-rata.
+
+TRAVEL_TIME_CHECK_INTERVAL = float(os.getenv("TRAVEL_TIME_CHECK_INTERVAL", "60"))
+
+
+class TravelTimeModel:
+    """Lookup waktu tempuh historis + stop terakhir tiap shuttle (live)"""
+
+    def __init__(self):
+        self.version: Optional[int] = None
+        # (from, to) -> {(weekday, hour): detik}; weekday -1 = semua hari,
+        # (-1, -1) = semua jam
+        self._segments: Dict[tuple, Dict[tuple, float]] = {}
+        self._stops: List[tuple] = []
+        self._trackers: Dict[int, StopVisitTracker] = {}
+        self._lock = threading.Lock()
+
+    def load(self, conn: sqlite3.Connection):
+        version = self.current_version(conn)
+        totals: Dict[tuple, Dict[tuple, list]] = {}
+        for row in conn.execute(
+            """
+            SELECT from_stop, to_stop, weekday, hour, samples, total_seconds
+            FROM segment_travel_times
+        """
+        ):
+            buckets = totals.setdefault((row["from_stop"], row["to_stop"]), {})
+            for key in (
+                (row["weekday"], row["hour"]),
+                (-1, row["hour"]),
+                (-1, -1),
+            ):
+                bucket = buckets.setdefault(key, [0, 0.0])
+                bucket[0] += row["samples"]
+                bucket[1] += row["total_seconds"]
+
+        segments = {
+            pair: {
+                key: seconds / samples
+                for key, (samples, seconds) in buckets.items()
+                if samples >= MIN_SAMPLES
+            }
+            for pair, buckets in totals.items()
+        }
+        self._segments, self.version = segments, version
+
+    def current_version(self, conn: sqlite3.Connection) -> int:
+        return conn.execute(
+            "SELECT version FROM cache_versions WHERE name = 'travel_times'"
+        ).fetchone()[0]
+
+    def set_stops(self, locations: List[dict]):
+        stops = [
+            (location["name"], location["latitude"], location["longitude"])
+            for location in locations
+        ]
+        with self._lock:
+            self._stops = stops
+            for tracker in self._trackers.values():
+                tracker.stops = stops
+
+    def observe(self, shuttle_id: int, lat: float, lon: float, timestamp: float):
+        """Update stop terakhir shuttle dari GPS fix baru"""
+        with self._lock:
+            tracker = self._trackers.get(shuttle_id)
+            if tracker is None:
+                tracker = self._trackers[shuttle_id] = StopVisitTracker(self._stops)
+            tracker.observe(lat, lon, timestamp)
+
+    def segment_seconds(self, from_stop: str, to_stop: str, timestamp: float) -> Optional[float]:
+        buckets = self._segments.get((from_stop, to_stop))
+        if not buckets:
+            return None
+        weekday, hour = time_bucket(timestamp)
+        for key in ((weekday, hour), (-1, hour), (-1, -1)):
+            if key in buckets:
+                return buckets[key]
+        return None
+
+    def remaining_seconds(
+        self, shuttle_id: int, distance: float, dest_lat: float, dest_lon: float
+    ) -> Optional[float]:
+        """
+        Sisa waktu tempuh (detik) dari model historis, None kalau stop
+        terakhir shuttle / segment-nya belum diketahui
+        """
+        with self._lock:
+            tracker = self._trackers.get(shuttle_id)
+            if tracker is None or tracker.stop is None:
+                return None
+            from_stop, departed_at = tracker.stop, tracker.departed_at
+            stops = self._stops
+
+        origin = next((stop for stop in stops if stop[0] == from_stop), None)
+        destination = next(
+            (stop for stop in stops if (stop[1], stop[2]) == (dest_lat, dest_lon)), None
+        )
+        if origin is None or destination is None or origin is destination:
+            return None
+
+        seconds = self.segment_seconds(
+            from_stop, destination[0], departed_at or time.time()
+        )
+        if seconds is None:
+            return None
+        segment_distance = route_distance(origin[1], origin[2], dest_lat, dest_lon)
+        if segment_distance <= 0:
+            return seconds
+        return seconds * min(1.0, distance / segment_distance)
+
+
+travel_model = TravelTimeModel()
+
+
+def refresh_travel_times() -> bool:
+    """Load ulang model kalau training baru selesai. Returns True kalau di-load"""
+    with get_db() as conn:
+        if travel_model.version == travel_model.current_version(conn):
+            return False
+        travel_model.load(conn)
+    return True
+
+
+async def watch_travel_times():
+    """Background task: cek versi model setiap TRAVEL_TIME_CHECK_INTERVAL detik"""
+    while True:
+        await asyncio.sleep(TRAVEL_TIME_CHECK_INTERVAL)
+        try:
+            if await db_read(refresh_travel_times):
+                print("⏱️  Travel time model reloaded")
+        except Exception as e:
+            print(f"❌ Travel time model refresh error: {e}")
+
+
+# ==================== STOP ETA ====================
+
+
+class StopEtaCache:
+    """
+    ETA & jarak dari posisi shuttle ke SEMUA stop dalam satu hitungan
+
+    - Koordinat stop disimpan sebagai array NumPy (di-build ulang kalau
+      gazetteer berubah), haversine dihitung vectorized sekaligus
+    - Kalau road network tersedia, jarak jalan dipakai untuk stop yang
+      terjangkau (fallback haversine per stop)
+    - Hasil di-cache per shuttle sampai GPS fix berikutnya masuk
+    """
+
+    def __init__(self):
+        self._locations: Optional[List[dict]] = None
+        self._lat_rad = np.empty(0)
+        self._lon_rad = np.empty(0)
+        self._results: Dict[int, tuple] = {}  # shuttle_id -> (key, result)
+        self._lock = threading.Lock()
+
+    def _coordinates(self, locations: List[dict]):
+        if locations is not self._locations:
+            self._lat_rad = np.radians([location["latitude"] for location in locations])
+            self._lon_rad = np.radians([location["longitude"] for location in locations])
+            self._locations = locations
+        return self._lat_rad, self._lon_rad
+
+    def distances(self, lat: float, lon: float, locations: List[dict]) -> np.ndarray:
+        """Jarak (km) dari satu posisi ke semua lokasi, urut locations"""
+        lat_rad, lon_rad = self._coordinates(locations)
+        current_lat = math.radians(lat)
+        a = (
+            np.sin((lat_rad - current_lat) / 2) ** 2
+            + math.cos(current_lat)
+            * np.cos(lat_rad)
+            * np.sin((lon_rad - math.radians(lon)) / 2) ** 2
+        )
+        distances = 2 * 6371 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+        if road_network.loaded:
+            road = road_network.distances_to_stops(lat, lon, locations)
+            if road is not None:
+                road = np.asarray(road)
+                distances = np.where(np.isfinite(road), road, distances)
+        return distances
+
+    def get(self, shuttle_id: int) -> Optional[dict]:
+        """ETA ke semua stop dari posisi terakhir shuttle, None kalau belum ada"""
+        current = position_cache.get(shuttle_id)
+        if not current:
+            return None
+        locations = gazetteer.locations
+        key = (
+            current["timestamp"],
+            current["latitude"],
+            current["longitude"],
+            id(locations),
+            id(road_network.stop_locations),
+            travel_model.version,
+        )
+
+        with self._lock:
+            cached = self._results.get(shuttle_id)
+            if cached and cached[0] == key:
+                return cached[1]
+
+            avg_speed = get_average_speed(shuttle_id)
+            if avg_speed <= 0:
+                avg_speed = DEFAULT_SPEED_KMH
+            distances = self.distances(current["latitude"], current["longitude"], locations)
+            # Jarak vectorized, ETA lewat model yang sama dengan calculate_eta
+            eta_minutes = [
+                eta_for_distance(
+                    float(distance),
+                    location["latitude"],
+                    location["longitude"],
+                    avg_speed,
+                    shuttle_id,
+                )
+                for location, distance in zip(locations, distances)
+            ]
+
+            result = {
+                "shuttle_id": shuttle_id,
+                "timestamp": current["timestamp"],
+                "current_location": {
+                    "lat": current["latitude"],
+                    "lng": current["longitude"],
+                },
+                "avg_speed": round(avg_speed, 1),
+                "stops": [
+                    {
+                        "name": location["name"],
+                        "location_name": location["location_name"],
+                        "distance_km": round(float(distance), 3),
+                        "eta_minutes": eta,
+                    }
+                    for location, distance, eta in zip(locations, distances, eta_minutes)
+                ],
+            }
+            self._results[shuttle_id] = (key, result)
+        return result
+
+
+stop_eta_cache = StopEtaCache()
+
+
+# ==================== LOCATION HELPERS ====================
+
+# Maksimal fix per request /api/location/batch: satu batch = satu transaksi
+# di thread writer, batch raksasa akan menahan semua write lain
+LOCATION_BATCH_MAX = int(os.getenv("LOCATION_BATCH_MAX", "1000"))
+
+INSERT_LOCATION_SQL = """
+    INSERT INTO location_history
+    (shuttle_id, latitude, longitude, speed, heading, accuracy, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def location_row(data: LocationData, timestamp: str) -> tuple:
+    """Susun parameter INSERT location_history dari satu GPS fix"""
+    return (
+        data.shuttle_id,
+        data.latitude,
+        data.longitude,
+        data.speed,
+        data.heading,
+        data.accuracy,
+        timestamp,
+    )
+
+
+def location_message(record: dict) -> dict:
+    """Pesan WebSocket location_update dari record position_cache"""
+    return {
+        "type": "location_update",
+        "data": {
+            "shuttle_id": record["shuttle_id"],
+            "latitude": record["latitude"],
+            "longitude": record["longitude"],
+            "speed": record["speed"],
+            "heading": record["heading"],
+            "timestamp": record["timestamp"],
+        },
+    }
+
+
+def location_record(row_id: Optional[int], data: LocationData, timestamp: str) -> dict:
+    """Baris location_history (sebagai dict) untuk disimpan di position_cache"""
+    return {
+        "id": row_id,
+        "shuttle_id": data.shuttle_id,
+        "latitude": data.latitude,
+        "longitude": data.longitude,
+        "speed": data.speed,
+        "heading": data.heading,
+        "accuracy": data.accuracy,
+        "timestamp": timestamp,
+    }
+
+
+def add_distance(cursor, shuttle_id: int, distance_increment: float):
+    """Tambah jarak tempuh ke shuttle, trip yang sedang ongoing & rekap harian"""
+    cursor.execute(
+        """
+        UPDATE shuttles
+        SET status = 'active',
+            total_distance = total_distance + ?
+        WHERE id = ?
+    """,
+        (distance_increment, shuttle_id),
+    )
+    cursor.execute(
+        """
+        UPDATE trips
+        SET distance = distance + ?
+        WHERE shuttle_id = ? AND status = 'ongoing'
+    """,
+        (distance_increment, shuttle_id),
+    )
+    # Dihitung ke hari mulai trip, sama seperti trips.distance
+    cursor.execute(
+        """
+        INSERT INTO daily_distance (shuttle_id, day, distance)
+        SELECT shuttle_id, substr(start_time, 1, 10), ?
+        FROM trips
+        WHERE shuttle_id = ? AND status = 'ongoing'
+        ON CONFLICT(shuttle_id, day) DO UPDATE SET
+            distance = distance + excluded.distance
+    """,
+        (distance_increment, shuttle_id),
+    )
+
+# ==================== DATA ACCESS ====================
+#
+# sqlite3 itu blocking, jadi semua query dijalankan di thread terpisah
+# supaya event loop (termasuk semua WebSocket) tidak ikut berhenti:
+# - db_read  : thread pool, beberapa read bisa jalan bersamaan (WAL)
+# - db_write : satu thread writer, write antri dan tidak rebutan lock
+
+DB_READ_WORKERS = int(os.getenv("DB_READ_WORKERS", "4"))
+
+db_read_executor = ThreadPoolExecutor(
+    max_workers=DB_READ_WORKERS, thread_name_prefix="db-read"
+)
+db_write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-write")
+
+
+async def db_read(fn, *args):
+    """Jalankan fungsi read database di thread pool reader"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_read_executor, partial(fn, *args))
+
+
+async def db_write(fn, *args):
+    """Jalankan fungsi write database di thread writer (serial)"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_write_executor, partial(fn, *args))
+
+
+class SharedVersion:
+    """
+    Versi resource di memory, diambil dari cache_versions setelah commit.
+    Hanya naik (max): event dari worker lain yang telat tidak menurunkannya
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def advance(self, version: int) -> bool:
+        with self._lock:
+            if version <= self.value:
+                return False
+            self.value = version
+            return True
+
+    def load(self, conn: sqlite3.Connection, relay: bool = True):
+        row = conn.execute(
+            "SELECT version FROM cache_versions WHERE name = ?", (self.name,)
+        ).fetchone()
+        if row and self.advance(row[0]) and relay:
+            relay_event("version", name=self.name, version=row[0])
+
+
+# ETag /api/route/requests tanpa query SQLite. Semua write ke route_requests
+# ada di file ini dan memanggil .load(conn) SETELAH commit, jadi ETag baru
+# tidak pernah dipakai untuk data lama
+route_requests_version = SharedVersion("route_requests")
+
+
+def refresh_route_requests_version():
+    with get_db() as conn:
+        route_requests_version.load(conn, relay=False)
+
+
+def store_locations(rows: List[tuple], increments: Dict[int, float]) -> int:
+    """
+    Simpan GPS fix + tambah jarak per shuttle dalam satu transaksi
+    Returns: id baris terakhir yang di-insert
+    """
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(INSERT_LOCATION_SQL, rows)
+        # Satu transaksi -> rowid berurutan, id baris ke-i bisa dihitung
+        last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+        for shuttle_id, distance_increment in increments.items():
+            add_distance(cursor, shuttle_id, distance_increment)
+        conn.commit()
+    return last_id
+
+
+def insert_route_request(request: RouteRequest, request_time: str) -> int:
+    """Simpan route request baru, returns id request"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            INSERT INTO route_requests
+            (from_location, to_location, requested_by, request_time, status, note)
+            VALUES (?, ?, ?, ?, 'pending', ?)
+        """,
+            (
+                request.from_location,
+                request.to_location,
+                request.requested_by,
+                request_time,
+                request.note,
+            ),
+        )
+        request_id = cursor.lastrowid
+        conn.commit()
+        route_requests_version.load(conn)
+    return request_id
+
+
+def fetch_route_requests(status: str, limit: int) -> List[dict]:
+    with get_db() as conn:
+        cursor = conn.cursor()
+
+        if status == "all":
+            cursor.execute(
+                """
+                SELECT * FROM route_requests
+                ORDER BY request_time DESC
+                LIMIT ?
+            """,
+                (limit,),
+            )
+        else:
+            cursor.execute(
+                """
+                SELECT * FROM route_requests
+                WHERE status = ?
+                ORDER BY request_time DESC
+                LIMIT ?
+            """,
+                (status, limit),
+            )
+
+        return [dict(row) for row in cursor.fetchall()]
+
+
+def activate_route_request(request_id: int, shuttle_id: int) -> dict:
+    """
+    Jadikan request sebagai rute aktif shuttle_id
+    Returns: baris active_routes yang baru
+    """
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")  # Lock database
+
+        # Get request details
+        cursor.execute(
+            """
+            SELECT * FROM route_requests WHERE id = ?
+        """,
+            (request_id,),
+        )
+        request = cursor.fetchone()
+
+        if not request:
+            raise HTTPException(status_code=404, detail="Request not found")
+        if request["status"] != "pending":
+            raise HTTPException(400, "Request already accepted")
+
+        # Rute multi-stop yang belum selesai tidak boleh ditimpa: request &
+        # stop-nya akan tertinggal (accepted / pending) tanpa rute aktif
+        cursor.execute(
+            """
+            SELECT 1 FROM active_route_stops s
+            JOIN active_routes r ON r.id = s.route_id
+            WHERE r.shuttle_id = ? AND r.status = 'active' AND s.status = 'pending'
+            LIMIT 1
+        """,
+            (shuttle_id,),
+        )
+        if cursor.fetchone():
+            raise HTTPException(409, "Shuttle has a multi-stop route in progress")
+
+        # Update request status
+        cursor.execute(
+            """
+            UPDATE route_requests
+            SET status = 'accepted', shuttle_id = ?
+            WHERE id = ?
+        """,
+            (shuttle_id, request_id),
+        )
+
+        # Clear old active routes
+        cursor.execute(
+            """
+            UPDATE active_routes
+            SET status = 'completed'
+            WHERE shuttle_id = ? AND status = 'active'
+        """,
+            (shuttle_id,),
+        )
+
+        # Set as active route
+        cursor.execute(
+            """
+            INSERT INTO active_routes
+            (shuttle_id, request_id, from_location, to_location, started_at)
+            VALUES (?, ?, ?, ?, ?)
+        """,
+            (
+                shuttle_id,
+                request_id,
+                request["from_location"],
+                request["to_location"],
+                datetime.now().isoformat(),
+            ),
+        )
+        route = cursor.execute(
+            "SELECT * FROM active_routes WHERE id = ?", (cursor.lastrowid,)
+        ).fetchone()
+
+        conn.commit()
+        route_requests_version.load(conn)
+
+    route = dict(route)
+    fleet.set_active_route(shuttle_id, route)
+    return route
+
+
+def complete_route(shuttle_id: int):
+    with get_db() as conn:
+        cursor = conn.cursor()
+
+        # Update corresponding request (termasuk semua request rute multi-stop)
+        cursor.execute(
+            """
+            UPDATE route_requests
+            SET status = 'completed'
+            WHERE id IN (
+                SELECT request_id FROM active_routes
+                WHERE shuttle_id = ? AND status = 'active'
+                UNION
+                SELECT s.request_id FROM active_route_stops s
+                JOIN active_routes r ON r.id = s.route_id
+                WHERE r.shuttle_id = ? AND r.status = 'active'
+            )
+        """,
+            (shuttle_id, shuttle_id),
+        )
+        cursor.execute(
+            """
+            UPDATE active_route_stops
+            SET status = 'skipped'
+            WHERE status = 'pending' AND route_id IN (
+                SELECT id FROM active_routes
+                WHERE shuttle_id = ? AND status = 'active'
+            )
+        """,
+            (shuttle_id,),
+        )
+
+        cursor.execute(
+            """
+            UPDATE active_routes
+            SET status = 'completed'
+            WHERE shuttle_id = ? AND status = 'active'
+        """,
+            (shuttle_id,),
+        )
+
+        conn.commit()
+        route_requests_version.load(conn)
+    fleet.set_active_route(shuttle_id, None)
+
+
+def insert_trip(shuttle_id: int):
+    start_time = datetime.now().isoformat()
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            INSERT INTO trips (shuttle_id, start_time, status)
+            VALUES (?, ?, 'ongoing')
+        """,
+            (shuttle_id, start_time),
+        )
+        trip_id = cursor.lastrowid
+        cursor.execute(
+            """
+            INSERT OR IGNORE INTO daily_distance (shuttle_id, day, distance)
+            VALUES (?, ?, 0)
+        """,
+            (shuttle_id, start_time[:10]),
+        )
+        conn.commit()
+    fleet.set_trip(
+        shuttle_id, {"id": trip_id, "start_time": start_time, "distance": 0.0}
+    )
+
+
+def finish_trip(shuttle_id: int):
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            UPDATE trips
+            SET end_time = ?, status = 'completed'
+            WHERE shuttle_id = ? AND status = 'ongoing'
+        """,
+            (datetime.now().isoformat(), shuttle_id),
+        )
+
+        cursor.execute(
+            """
+            UPDATE shuttles SET status = 'inactive' WHERE id = ?
+        """,
+            (shuttle_id,),
+        )
+        conn.commit()
+    fleet.set_trip(shuttle_id, None)
+
+
+def warm_caches() -> int:
+    """
+    Migration, replay log write-behind yang belum masuk database,
+    lalu isi gazetteer, road network, model waktu tempuh, fleet,
+    position_cache & speed_estimator (saat startup)
+
+    Multi-worker: migration & replay sudah dijalankan sekali oleh main()
+    (prepare_database) sebelum worker dibuat, jadi di sini dilewati
+    """
+    with get_db() as conn:
+        if WORKERS <= 1:
+            run_migrations(conn)
+            location_buffer.replay()
+        gazetteer.build(conn)
+        if road_network.load_osm(ROAD_GRAPH_FILE):
+            road_network.set_stops(gazetteer.locations)
+        travel_model.set_stops(gazetteer.locations)
+        travel_model.load(conn)
+        fleet.warm(conn)
+        route_requests_version.load(conn, relay=False)
+        count = position_cache.warm(conn)
+        speed_estimator.warm(conn, position_cache.shuttle_ids())
+    return count
+
+
+# ==================== WRITE-BEHIND BUFFER ====================
+#
+# Opsional (LOCATION_WRITE_BEHIND=1): GPS fix di-ACK setelah masuk buffer
+# memory + append log, lalu disimpan ke SQLite dalam batch (setiap
+# LOCATION_FLUSH_SIZE fix atau LOCATION_FLUSH_INTERVAL detik).
+# Buffer & crash recovery ada di backend/write_behind.py; di sini hanya
+# config + penyimpanan batch (seq terakhir masuk write_behind_state dalam
+# transaksi yang sama). LOCATION_LOG_FSYNC=1 = fsync log setiap fix.
+
+LOCATION_WRITE_BEHIND = os.getenv("LOCATION_WRITE_BEHIND", "0") == "1"
+LOCATION_FLUSH_SIZE = int(os.getenv("LOCATION_FLUSH_SIZE", "200"))
+LOCATION_FLUSH_INTERVAL = float(os.getenv("LOCATION_FLUSH_INTERVAL", "2.0"))
+LOCATION_LOG_FSYNC = os.getenv("LOCATION_LOG_FSYNC", "0") == "1"
+LOCATION_LOG_FILE = os.getenv(
+    "LOCATION_LOG_FILE", os.path.join(PROJECT_ROOT, "backend", "location_buffer.log")
+)
+
+
+def store_buffered_locations(entries: List[tuple]) -> int:
+    """
+    Simpan satu batch dari buffer write-behind + catat seq terakhirnya
+    entries: list (seq, row, distance_increment, record)
+    Returns: id baris terakhir yang di-insert
+    """
+    increments: Dict[int, float] = {}
+    for _, row, distance_increment, _ in entries:
+        increments[row[0]] = increments.get(row[0], 0.0) + distance_increment
+
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(INSERT_LOCATION_SQL, [entry[1] for entry in entries])
+        last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+        for shuttle_id, distance_increment in increments.items():
+            add_distance(cursor, shuttle_id, distance_increment)
+        cursor.execute(
+            "UPDATE write_behind_state SET last_seq = ? WHERE id = 1",
+            (entries[-1][0],),
+        )
+        conn.commit()
+    return last_id
+
+
+def fetch_write_behind_seq() -> int:
+    """Seq terakhir dari buffer write-behind yang sudah tersimpan"""
+    with get_db() as conn:
+        return conn.execute(
+            "SELECT last_seq FROM write_behind_state WHERE id = 1"
+        ).fetchone()[0]
+
+
+location_buffer = LocationWriteBuffer(
+    LOCATION_LOG_FILE,
+    store=store_buffered_locations,
+    load_last_seq=fetch_write_behind_seq,
+    run_write=db_write,
+    flush_size=LOCATION_FLUSH_SIZE,
+    flush_interval=LOCATION_FLUSH_INTERVAL,
+    fsync=LOCATION_LOG_FSYNC,
+)
+
+
+async def ingest_fixes(fixes: List[LocationData]) -> dict:
+    """
+    Pipeline GPS fix (dipakai /api/location & /api/location/batch):
+    hitung jarak dari position_cache, update cache, simpan ke database lewat
+    thread writer (atau buffer write-behind), lalu jadwalkan broadcast
+    posisi terbaru tiap shuttle
+    Returns: {"increments": {shuttle_id: km}}
+    """
+    now = datetime.now().isoformat()
+    rows = []
+    row_increments = []
+    increments = {}
+    previous = {}
+    newest = {}
+
+    # Bagian ini tanpa await: fix yang datang bersamaan untuk shuttle yang
+    # sama tetap dihitung berurutan terhadap posisi terakhir
+    for fix in fixes:
+        shuttle_id = fix.shuttle_id
+        if shuttle_id not in increments:
+            previous[shuttle_id] = position_cache.get(shuttle_id)
+            increments[shuttle_id] = 0.0
+
+        last = newest[shuttle_id][1] if shuttle_id in newest else previous[shuttle_id]
+        distance_increment = 0.0
+        if last:
+            distance_increment = haversine_distance(
+                last["latitude"], last["longitude"], fix.latitude, fix.longitude
+            )
+        increments[shuttle_id] += distance_increment
+
+        timestamp = fix.timestamp if fix.timestamp else now
+        newest[shuttle_id] = (len(rows), location_record(None, fix, timestamp))
+        rows.append(location_row(fix, timestamp))
+        row_increments.append(distance_increment)
+
+    for _, record in newest.values():
+        position_cache.update(record)
+
+    try:
+        if LOCATION_WRITE_BEHIND:
+            # id baris diisi oleh flush setelah masuk database
+            records = [None] * len(rows)
+            for index, record in newest.values():
+                records[index] = record
+            location_buffer.append(rows, row_increments, records)
+        else:
+            last_id = await db_write(store_locations, rows, increments)
+            first_id = last_id - len(rows) + 1
+            for index, record in newest.values():
+                record["id"] = first_id + index
+    except Exception:
+        for shuttle_id, (_, record) in newest.items():
+            position_cache.rollback(shuttle_id, record, previous[shuttle_id])
+        raise
+
+    for shuttle_id, distance_increment in increments.items():
+        fleet.add_distance(shuttle_id, distance_increment)
+
+    samples = []
+    for fix, row in zip(fixes, rows):
+        fix_time = parse_timestamp(row[-1])
+        speed_estimator.add(fix.shuttle_id, fix.speed, fix_time)
+        travel_model.observe(fix.shuttle_id, fix.latitude, fix.longitude, fix_time)
+        samples.append((fix.shuttle_id, fix.speed, fix.latitude, fix.longitude, fix_time))
+
+    relay_fixes([record for _, record in newest.values()], increments, samples)
+
+    # Broadcast ke client (di-coalesce per tick oleh scheduler)
+    for _, record in newest.values():
+        await broadcast_scheduler.publish(location_message(record))
+    for shuttle_id in newest:
+        await broadcast_scheduler.publish_state(shuttle_id)
+
+    return {"increments": increments}
+
+
+# ==================== LOCATION ARCHIVE ====================
+#
+# Opsional (LOCATION_ARCHIVE=1): baris location_history yang lebih lama dari
+# ARCHIVE_HOT_DAYS dipindah ke file arsip per bulan (backend/archive/, lihat
+# backend/location_archive.py) oleh background job, supaya tabel utama tetap
+# kecil. Baris yang dipindah HILANG dari shuttle.db, jadi default mati.
+# /api/shuttle/history membaca tabel utama + arsip sekaligus.
+
+LOCATION_ARCHIVE = os.getenv("LOCATION_ARCHIVE", "0") == "1"
+ARCHIVE_HOT_DAYS = float(os.getenv("ARCHIVE_HOT_DAYS", "7"))
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", "3600"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "5000"))
+
+
+def archive_locations_batch() -> int:
+    """Pindahkan satu batch baris lama ke arsip, returns jumlah baris"""
+    cutoff = (datetime.now() - timedelta(days=ARCHIVE_HOT_DAYS)).isoformat()
+    with get_db() as conn:
+        return archive_batch(conn, cutoff, ARCHIVE_BATCH_SIZE)
+
+
+async def archive_loop():
+    """
+    Background task: compaction setiap ARCHIVE_INTERVAL detik
+    Satu batch per db_write, jadi GPS fix tetap bisa masuk di sela-selanya
+    """
+    while True:
+        try:
+            total = 0
+            while True:
+                moved = await db_write(archive_locations_batch)
+                total += moved
+                if moved < ARCHIVE_BATCH_SIZE:
+                    break
+            if total:
+                print(f"🗄️  Archived {total} old location(s)")
+        except Exception as e:
+            print(f"❌ Location archive error: {e}")
+        await asyncio.sleep(ARCHIVE_INTERVAL)
+
+
+def fetch_location_history(
+    shuttle_id: int, start: str, end: str, limit: int
+) -> List[dict]:
+    """GPS fix shuttle dalam rentang waktu, dari tabel utama + arsip"""
+    with get_db() as conn:
+        with attach_history(conn, start, end) as history:
+            rows = conn.execute(
+                f"""
+                SELECT * FROM {history}
+                WHERE shuttle_id = ? AND timestamp BETWEEN ? AND ?
+                ORDER BY timestamp, id
+                LIMIT ?
+            """,
+                (shuttle_id, start, end, limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+
+# ==================== TRAJECTORY SIMPLIFICATION ====================
+#
+# Opsional (TRAJECTORY_SIMPLIFY=1, titik yang dibuang HILANG permanen):
+# GPS trip yang sudah selesai lebih dari SIMPLIFY_AFTER_DAYS hari
+# disederhanakan dengan Douglas-Peucker: titik yang menyimpang kurang dari
+# SIMPLIFY_TOLERANCE_M meter dari garis lurus dibuang, bentuk rute tetap.
+# Berlaku juga untuk trip yang GPS-nya sudah di arsip bulanan.
+#
+# Supaya model waktu tempuh (scripts/train_travel_times.py) tidak rusak:
+# - Titik dalam STOP_RADIUS_M dari stop selalu dipertahankan (waktu tiba &
+#   berangkat dari stop tetap akurat)
+# - Trip hanya disederhanakan setelah semua GPS-nya sudah diproses training
+#   (id <= travel_time_state.last_history_id shuttle-nya)
+
+TRAJECTORY_SIMPLIFY = os.getenv("TRAJECTORY_SIMPLIFY", "0") == "1"
+SIMPLIFY_AFTER_DAYS = float(os.getenv("SIMPLIFY_AFTER_DAYS", "3"))
+SIMPLIFY_TOLERANCE_M = float(os.getenv("SIMPLIFY_TOLERANCE_M", "5"))
+SIMPLIFY_INTERVAL = float(os.getenv("SIMPLIFY_INTERVAL", "3600"))
+SIMPLIFY_BATCH_TRIPS = int(os.getenv("SIMPLIFY_BATCH_TRIPS", "20"))
+
+
+def douglas_peucker(points: List[tuple], tolerance: float) -> List[int]:
+    """
+    Index titik yang dipertahankan (titik pertama & terakhir selalu)
+    points: [(x, y), ...] dalam satuan yang sama dengan tolerance
+    """
+    count = len(points)
+    if count <= 2:
+        return list(range(count))
+
+    keep = [False] * count
+    keep[0] = keep[-1] = True
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        (ax, ay), (bx, by) = points[first], points[last]
+        dx, dy = bx - ax, by - ay
+        length = math.hypot(dx, dy)
+
+        farthest, index = 0.0, None
+        for i in range(first + 1, last):
+            px, py = points[i]
+            if length == 0:
+                distance = math.hypot(px - ax, py - ay)
+            else:
+                distance = abs(dy * (px - ax) - dx * (py - ay)) / length
+            if distance > farthest:
+                farthest, index = distance, i
+
+        if index is not None and farthest > tolerance:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+
+    return [i for i, kept in enumerate(keep) if kept]
+
+
+def simplify_trip(
+    conn: sqlite3.Connection, trip: sqlite3.Row, stops: StopVisitTracker
+) -> Optional[int]:
+    """
+    Sederhanakan GPS satu trip (tabel utama + arsip), returns titik yang
+    dibuang, None kalau trip belum selesai diproses training (dilewati)
+    """
+    start, end = trip["start_time"], trip["end_time"]
+    with attached_partitions(conn, start, end) as schemas:
+        points = []
+        for schema in schemas:
+            for row in conn.execute(
+                f"""
+                SELECT id, latitude, longitude, timestamp
+                FROM {schema}.location_history
+                WHERE shuttle_id = ? AND timestamp BETWEEN ? AND ?
+            """,
+                (trip["shuttle_id"], start, end),
+            ):
+                points.append((row["timestamp"], row["id"], schema, row["latitude"], row["longitude"]))
+        if any(row_id > trip["last_history_id"] for _, row_id, _, _, _ in points):
+            return None
+        points.sort()
+
+        # Titik di stop jadi jangkar: Douglas-Peucker per potongan di antaranya
+        anchors = [
+            index
+            for index, (_, _, _, lat, lon) in enumerate(points)
+            if index in (0, len(points) - 1) or stops.nearest_stop(lat, lon) is not None
+        ]
+        ref_lat = points[0][3] if points else 0.0
+        xy = [
+            tuple(km * 1000 for km in local_xy(lat, lon, ref_lat))
+            for _, _, _, lat, lon in points
+        ]
+        kept = set(anchors)
+        for first, last in zip(anchors, anchors[1:]):
+            if last - first > 1:
+                kept.update(
+                    first + index
+                    for index in douglas_peucker(xy[first:last + 1], SIMPLIFY_TOLERANCE_M)
+                )
+        dropped: Dict[str, List[tuple]] = {}
+        for index, (_, row_id, schema, _, _) in enumerate(points):
+            if index not in kept:
+                dropped.setdefault(schema, []).append((row_id,))
+
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for schema, ids in dropped.items():
+                conn.executemany(f"DELETE FROM {schema}.location_history WHERE id = ?", ids)
+            conn.execute(
+                "UPDATE trips SET simplified_at = ? WHERE id = ?",
+                (datetime.now().isoformat(), trip["id"]),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return len(points) - len(kept)
+
+
+def simplify_trips_batch() -> tuple:
+    """
+    Sederhanakan maksimal SIMPLIFY_BATCH_TRIPS trip lama. Shuttle yang
+    belum pernah di-training dilewati seluruhnya
+    Returns: (jumlah trip, jumlah titik yang dibuang)
+    """
+    cutoff = (datetime.now() - timedelta(days=SIMPLIFY_AFTER_DAYS)).isoformat()
+    stops = StopVisitTracker(
+        [
+            (location["name"], location["latitude"], location["longitude"])
+            for location in gazetteer.locations
+        ]
+    )
+    with get_db() as conn:
+        trips = conn.execute(
+            """
+            SELECT t.id, t.shuttle_id, t.start_time, t.end_time, s.last_history_id
+            FROM trips t
+            JOIN travel_time_state s ON s.shuttle_id = t.shuttle_id
+            WHERE t.status = 'completed' AND t.simplified_at IS NULL
+              AND t.end_time < ?
+            ORDER BY t.end_time
+            LIMIT ?
+        """,
+            (cutoff, SIMPLIFY_BATCH_TRIPS),
+        ).fetchall()
+
+        simplified = removed = 0
+        untrained = set()
+        for trip in trips:
+            # Trip berikutnya shuttle yang sama pasti juga belum di-training
+            if trip["shuttle_id"] in untrained:
+                continue
+            count = simplify_trip(conn, trip, stops)
+            if count is None:
+                untrained.add(trip["shuttle_id"])
+                continue
+            simplified += 1
+            removed += count
+    # Ada trip yang dilewati -> < SIMPLIFY_BATCH_TRIPS, simplify_loop berhenti
+    # sampai interval berikutnya
+    return simplified, removed
+
+
+async def simplify_loop():
+    """Background task: simplifikasi trip lama setiap SIMPLIFY_INTERVAL detik"""
+    while True:
+        try:
+            total_trips = total_removed = 0
+            while True:
+                trips, removed = await db_write(simplify_trips_batch)
+                total_trips += trips
+                total_removed += removed
+                if trips < SIMPLIFY_BATCH_TRIPS:
+                    break
+            if total_trips:
+                print(
+                    f"✂️  Simplified {total_trips} trip(s), "
+                    f"removed {total_removed} GPS point(s)"
+                )
+        except Exception as e:
+            print(f"❌ Trajectory simplification error: {e}")
+        await asyncio.sleep(SIMPLIFY_INTERVAL)
+
+
+# ==================== DISPATCHER ====================
+#
+# Dispatch otomatis request pending ke shuttle (opsional, AUTO_DISPATCH=1).
+# Setiap tick:
+# 1. Index grid posisi shuttle terakhir -> kandidat per request hanya
+#    shuttle dalam radius DISPATCH_RADIUS_KM dari titik jemput
+# 2. Skor = ETA ke titik jemput (menit), model yang sama dengan
+#    /api/route/active. Shuttle yang masih punya rute aktif tidak ikut:
+#    kalau ikut, solver bisa memberi request ke shuttle sibuk sementara
+#    shuttle kosong menganggur
+# 3. Assignment request <-> shuttle sekaligus pakai Hungarian algorithm
+#    (backend/dispatcher.py, total ETA minimum, bukan greedy satu per satu)
+# Request yang tidak kebagian shuttle tetap pending dan dihitung ulang tick
+# berikutnya (saat shuttle sibuk sudah selesai).
+
+AUTO_DISPATCH = os.getenv("AUTO_DISPATCH", "0") == "1"
+DISPATCH_INTERVAL = float(os.getenv("DISPATCH_INTERVAL", "10"))
+DISPATCH_RADIUS_KM = float(os.getenv("DISPATCH_RADIUS_KM", "3"))
+# Posisi lebih lama dari ini dianggap shuttle tidak sedang jalan (detik)
+DISPATCH_STALE_SECONDS = float(os.getenv("DISPATCH_STALE_SECONDS", "120"))
+DISPATCH_BATCH_SIZE = int(os.getenv("DISPATCH_BATCH_SIZE", "50"))
+
+
+def dispatch_candidates() -> List[dict]:
+    """Shuttle tanpa rute aktif yang posisinya masih baru"""
+    now = time.time()
+    candidates = []
+    for state in fleet.states():
+        with state.lock:
+            position = dict(state.position) if state.position else None
+            route = dict(state.active_route) if state.active_route else None
+        if route is not None:
+            continue
+        if not position or now - parse_timestamp(position["timestamp"]) > DISPATCH_STALE_SECONDS:
+            continue
+
+        speed = get_average_speed(state.shuttle_id)
+        candidates.append(
+            {
+                "shuttle_id": state.shuttle_id,
+                "latitude": position["latitude"],
+                "longitude": position["longitude"],
+                "speed": speed if speed > 0 else DEFAULT_SPEED_KMH,
+            }
+        )
+    return candidates
+
+
+def plan_dispatch(requests: List[dict]) -> List[tuple]:
+    """
+    Pasangkan request pending dengan shuttle (tanpa I/O)
+    Returns: [(request, candidate, skor_menit), ...]
+    """
+    candidates = dispatch_candidates()
+    if not candidates:
+        return []
+
+    grid = ShuttleGrid(DISPATCH_RADIUS_KM)
+    for candidate in candidates:
+        grid.add(candidate)
+    column = {id(candidate): index for index, candidate in enumerate(candidates)}
+
+    rows = []
+    cost = []
+    for request in requests:
+        pickup = find_location_coords(request["from_location"])
+        if not pickup:
+            continue
+        scores = [UNASSIGNABLE] * len(candidates)
+        for candidate in grid.nearby(*pickup):
+            # Model ETA yang sama dengan /api/route/active (historis kalau ada)
+            scores[column[id(candidate)]] = eta_for_distance(
+                route_distance(candidate["latitude"], candidate["longitude"], *pickup),
+                *pickup,
+                candidate["speed"],
+                candidate["shuttle_id"],
+            )
+        if min(scores) < UNASSIGNABLE:
+            rows.append(request)
+            cost.append(scores)
+    return [
+        (rows[row], candidates[col], cost[row][col])
+        for row, col in assign_pairs(cost)
+    ]
+
+
+def fetch_pending_requests(limit: int) -> List[dict]:
+    """Request pending paling lama dulu"""
+    with get_db() as conn:
+        cursor = conn.execute(
+            """
+            SELECT * FROM route_requests
+            WHERE status = 'pending'
+            ORDER BY request_time ASC
+            LIMIT ?
+        """,
+            (limit,),
+        )
+        return [dict(row) for row in cursor.fetchall()]
+
+
+async def announce_route_accepted(route: dict):
+    await manager.broadcast(
+        {
+            "type": "route_accepted",
+            "data": {
+                "request_id": route["request_id"],
+                "shuttle_id": route["shuttle_id"],
+                "from": route["from_location"],
+                "to": route["to_location"],
+            },
+        },
+        "routes",
+    )
+    await broadcast_scheduler.publish_state(route["shuttle_id"])
+
+
+dispatch_lock = asyncio.Lock()
+
+
+async def run_dispatch() -> List[dict]:
+    """Satu tick dispatcher. Returns assignment yang dijalankan"""
+    async with dispatch_lock:
+        requests = await db_read(fetch_pending_requests, DISPATCH_BATCH_SIZE)
+        if not requests:
+            return []
+
+        assigned = []
+        for request, candidate, minutes in plan_dispatch(requests):
+            try:
+                route = await db_write(
+                    activate_route_request, request["id"], candidate["shuttle_id"]
+                )
+            except HTTPException:
+                continue  # sudah di-accept manual oleh driver
+            await announce_route_accepted(route)
+            assigned.append(
+                {
+                    "request_id": request["id"],
+                    "shuttle_id": candidate["shuttle_id"],
+                    "pickup_eta_minutes": minutes,
+                }
+            )
+        return assigned
+
+
+async def dispatch_loop():
+    """Background task: jalankan dispatcher setiap DISPATCH_INTERVAL detik"""
+    while True:
+        await asyncio.sleep(DISPATCH_INTERVAL)
+        try:
+            for assignment in await run_dispatch():
+                print(
+                    f"🚐 Request {assignment['request_id']} -> shuttle "
+                    f"{assignment['shuttle_id']} ({assignment['pickup_eta_minutes']} min)"
+                )
+        except Exception as e:
+            print(f"❌ Dispatcher error: {e}")
+
+
+# ==================== ROUTE PLANNER ====================
+#
+# Gabungkan beberapa request pending jadi satu rute multi-stop:
+# - Solver pickup-and-delivery (backend/route_planner.py) di atas matrix
+#   jarak antar stop (road network kalau ada, fallback haversine)
+# - Request hanya digabung kalau perjalanan penumpangnya tidak memutar
+#   lebih dari PLANNER_MAX_DETOUR x jarak langsung
+# Urutan stop disimpan di tabel active_route_stops. Selama masih ada stop
+# pending, accept manual untuk shuttle itu ditolak (409).
+
+PLANNER_MAX_REQUESTS = int(os.getenv("PLANNER_MAX_REQUESTS", "4"))
+PLANNER_MAX_DETOUR = float(os.getenv("PLANNER_MAX_DETOUR", "1.5"))
+# Toleransi absolut untuk perjalanan pendek (km)
+PLANNER_DETOUR_SLACK_KM = float(os.getenv("PLANNER_DETOUR_SLACK_KM", "0.3"))
+
+
+def stop_distance(from_name: str, to_name: str) -> float:
+    """Jarak antar dua stop (km), dari matrix road network kalau ada"""
+    distance = road_network.stop_matrix.get(from_name, {}).get(to_name)
+    if distance is not None and math.isfinite(distance):
+        return distance
+    origin = gazetteer.lookup(from_name)
+    destination = gazetteer.lookup(to_name)
+    return haversine_distance(
+        origin["latitude"], origin["longitude"],
+        destination["latitude"], destination["longitude"],
+    )
+
+
+def plan_itinerary(shuttle_id: int, requests: List[dict]) -> Optional[dict]:
+    """
+    Pilih request pending yang cocok digabung (paling lama dulu) & urutannya
+    Returns: {"requests": [...], "stops": [...], "distance_km": ...} atau None
+    """
+    current = position_cache.get(shuttle_id)
+    start = (current["latitude"], current["longitude"]) if current else None
+
+    candidates = []
+    for request in requests:
+        pickup = gazetteer.lookup(request["from_location"])
+        dropoff = gazetteer.lookup(request["to_location"])
+        if pickup and dropoff and pickup is not dropoff:
+            candidates.append((request["id"], pickup["name"], dropoff["name"]))
+
+    start_distances = {}
+    for _, pickup, _ in candidates:
+        if start and pickup not in start_distances:
+            location = gazetteer.lookup(pickup)
+            start_distances[pickup] = route_distance(
+                start[0], start[1], location["latitude"], location["longitude"]
+            )
+
+    chosen: List[tuple] = []
+    plan = None
+    for candidate in candidates:
+        if len(chosen) >= PLANNER_MAX_REQUESTS:
+            break
+        trial = solve_pickup_delivery(
+            chosen + [candidate],
+            stop_distance,
+            start_distances,
+            PLANNER_MAX_DETOUR,
+            PLANNER_DETOUR_SLACK_KM,
+        )
+        if trial:
+            chosen.append(candidate)
+            plan = trial
+    if not plan:
+        return None
+
+    distance, stops = plan
+    return {
+        "shuttle_id": shuttle_id,
+        "requests": [request_id for request_id, _, _ in chosen],
+        "distance_km": round(distance, 3),
+        "stops": [
+            {"seq": seq, "location": stop, "action": action, "request_id": request_id}
+            for seq, (stop, action, request_id) in enumerate(stops, 1)
+        ],
+    }
+
+
+def activate_itinerary(plan: dict) -> dict:
+    """Simpan rencana multi-stop sebagai rute aktif, returns rute (+ stops)"""
+    shuttle_id = plan["shuttle_id"]
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+
+        cursor.execute(
+            "SELECT 1 FROM active_routes WHERE shuttle_id = ? AND status = 'active'",
+            (shuttle_id,),
+        )
+        if cursor.fetchone():
+            raise HTTPException(409, "Shuttle still has an active route")
+
+        placeholders = ",".join("?" * len(plan["requests"]))
+        cursor.execute(
+            f"""
+            UPDATE route_requests
+            SET status = 'accepted', shuttle_id = ?
+            WHERE id IN ({placeholders}) AND status = 'pending'
+        """,
+            (shuttle_id, *plan["requests"]),
+        )
+        if cursor.rowcount != len(plan["requests"]):
+            raise HTTPException(409, "Request already accepted")
+
+        first, last = plan["stops"][0], plan["stops"][-1]
+        cursor.execute(
+            """
+            INSERT INTO active_routes
+            (shuttle_id, request_id, from_location, to_location, started_at)
+            VALUES (?, ?, ?, ?, ?)
+        """,
+            (
+                shuttle_id,
+                first["request_id"],
+                first["location"],
+                last["location"],
+                datetime.now().isoformat(),
+            ),
+        )
+        route_id = cursor.lastrowid
+        cursor.executemany(
+            """
+            INSERT INTO active_route_stops
+            (route_id, seq, location, action, request_id)
+            VALUES (?, ?, ?, ?, ?)
+        """,
+            [
+                (route_id, stop["seq"], stop["location"], stop["action"], stop["request_id"])
+                for stop in plan["stops"]
+            ],
+        )
+        route = dict(
+            cursor.execute("SELECT * FROM active_routes WHERE id = ?", (route_id,)).fetchone()
+        )
+        route["stops"] = [
+            dict(row)
+            for row in cursor.execute(
+                "SELECT * FROM active_route_stops WHERE route_id = ? ORDER BY seq",
+                (route_id,),
+            )
+        ]
+        conn.commit()
+        route_requests_version.load(conn)
+
+    fleet.set_active_route(shuttle_id, route)
+    return route
+
+
+def advance_route_stop(shuttle_id: int) -> dict:
+    """
+    Tandai stop berikutnya di rute multi-stop sebagai selesai
+    Returns: {"stop": stop yang selesai, "route_completed": bool}
+    """
+    route = fleet.active_route(shuttle_id)
+    if not route or not route.get("stops"):
+        raise HTTPException(404, "No multi-stop route")
+
+    pending = [stop for stop in route["stops"] if stop["status"] == "pending"]
+    stop = pending[0]
+    arrived_at = datetime.now().isoformat()
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            UPDATE active_route_stops
+            SET status = 'done', arrived_at = ?
+            WHERE id = ?
+        """,
+            (arrived_at, stop["id"]),
+        )
+        if stop["action"] == "dropoff":
+            cursor.execute(
+                "UPDATE route_requests SET status = 'completed' WHERE id = ?",
+                (stop["request_id"],),
+            )
+        if len(pending) == 1:
+            cursor.execute(
+                "UPDATE active_routes SET status = 'completed' WHERE id = ?",
+                (route["id"],),
+            )
+        conn.commit()
+        route_requests_version.load(conn)
+
+    stop = dict(stop, status="done", arrived_at=arrived_at)
+    if len(pending) == 1:
+        fleet.set_active_route(shuttle_id, None)
+    else:
+        route["stops"] = [stop if s["id"] == stop["id"] else s for s in route["stops"]]
+        fleet.set_active_route(shuttle_id, route)
+    return {"stop": stop, "route_completed": len(pending) == 1}
+
+
+# ==================== LIVE STATE PUSH ====================
+#
+# Client WebSocket tidak perlu polling /api/shuttle/distance &
+# /api/route/active: server push distance_update & active_route_update
+# setiap ada GPS fix / event trip / event rute (lewat broadcast scheduler),
+# dan kirim snapshot lengkap saat connect.
+
+
+def public_locations() -> List[dict]:
+    """Lokasi kampus dalam format /api/locations"""
+    return [
+        {
+            "location_name": location["location_name"],
+            "latitude": location["latitude"],
+            "longitude": location["longitude"],
+        }
+        for location in gazetteer.locations
+    ]
+
+
+def active_route_status(shuttle_id: int) -> dict:
+    """Rute aktif shuttle + ETA (dari state fleet, tanpa SQL)"""
+    route = fleet.active_route(shuttle_id)
+    if not route:
+        return {"active": False, "message": "No active route"}
+
+    response = {
+        "active": True,
+        "from": route["from_location"],
+        "to": route["to_location"],
+        "started_at": route["started_at"],
+    }
+
+    # Rute multi-stop: ETA ke stop berikutnya
+    destination = route["to_location"]
+    if route.get("stops"):
+        next_stop = next(
+            (stop for stop in route["stops"] if stop["status"] == "pending"), None
+        )
+        response["stops"] = route["stops"]
+        response["next_stop"] = next_stop
+        if next_stop:
+            destination = next_stop["location"]
+
+    # Get current location & koordinat tujuan (keduanya dari memory)
+    current = position_cache.get(shuttle_id)
+    dest_coords = find_location_coords(destination)
+
+    # Calculate ETA
+    if current and dest_coords:
+        avg_speed = get_average_speed(shuttle_id)
+        response["eta_minutes"] = calculate_eta(
+            current["latitude"],
+            current["longitude"],
+            dest_coords[0],
+            dest_coords[1],
+            avg_speed,
+            shuttle_id,
+        )
+        response["current_location"] = {
+            "lat": current["latitude"],
+            "lng": current["longitude"],
+        }
+
+    return response
+
+
+def shuttle_state_messages(shuttle_id: int) -> List[tuple]:
+    """(type, topic, data) state shuttle yang di-push ke client"""
+    route = active_route_status(shuttle_id)
+    # Posisi sudah dikirim lewat location_update
+    route.pop("current_location", None)
+    return [
+        (
+            "distance_update",
+            shuttle_topic(shuttle_id),
+            {"shuttle_id": shuttle_id, **fleet.distance_stats(shuttle_id)},
+        ),
+        ("active_route_update", "routes", {"shuttle_id": shuttle_id, **route}),
+    ]
+
+
+def client_snapshot() -> dict:
+    """Pesan snapshot untuk client WebSocket yang baru connect"""
+    shuttles = []
+    for state in fleet.states():
+        shuttle_id = state.shuttle_id
+        shuttles.append(
+            {
+                "shuttle_id": shuttle_id,
+                "location": position_cache.get(shuttle_id),
+                "distance": fleet.distance_stats(shuttle_id),
+                "active_route": active_route_status(shuttle_id),
+            }
+        )
+    return {
+        "type": "snapshot",
+        "data": {"locations": public_locations(), "shuttles": shuttles},
+    }
+
+
+# ==================== HTTP CACHING ====================
+#
+# Endpoint read yang sering di-poll pakai ETag dari versi resource, jadi
+# request dengan If-None-Match yang masih cocok dijawab 304 tanpa query
+# SQLite / tanpa serialisasi ulang. Versi tidak pakai counter per proses:
+# semua worker (mode multi-worker) harus menghasilkan ETag yang sama
+# untuk isi yang sama, jadi versi diambil dari data yang dipakai bersama:
+#
+# Resource:
+# - locations         : versi tabel routes (cache_versions, trigger)
+# - route_requests    : versi tabel route_requests (cache_versions, trigger),
+#                       disimpan di memory (route_requests_version) dan
+#                       di-relay ke worker lain setiap ada write
+# - position:<id>     : hash isi posisi terakhir shuttle <id>
+# - route:<id>        : hash rute aktif + ETA shuttle <id> yang sudah dihitung
+#
+# ETAG_TOKEN ikut di ETag supaya ETag dari database lain (reset) tidak
+# pernah dianggap cocok. main() membuat satu token untuk semua worker.
+
+# Cache-Control per endpoint (detik). Lokasi kampus jarang berubah
+LOCATIONS_CACHE_MAX_AGE = int(os.getenv("LOCATIONS_CACHE_MAX_AGE", "300"))
+# Data live: browser / reverse proxy boleh pakai ulang sebentar,
+# setelah itu revalidate (murah, biasanya 304)
+LIVE_CACHE_MAX_AGE = int(os.getenv("LIVE_CACHE_MAX_AGE", "1"))
+ETAG_TOKEN = os.getenv("ETAG_TOKEN") or secrets.token_hex(4)
+
+
+def content_version(value) -> str:
+    """Versi dari isi data: sama di semua worker selama isinya sama"""
+    data = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def make_etag(*versions) -> str:
+    return '"{}"'.format("-".join([ETAG_TOKEN] + [str(version) for version in versions]))
+
+
+def cache_headers(etag: str, max_age: int) -> dict:
+    return {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}, must-revalidate",
+    }
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match cocok dengan ETag sekarang (termasuk weak W/ dan *)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def not_modified(etag: str, max_age: int) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag, max_age))
+
+
+def cached_json(content, etag: str, max_age: int) -> JSONResponse:
+    return JSONResponse(content, headers=cache_headers(etag, max_age))
+
+
+# ==================== CLUSTER ====================
+#
+# Mode multi-worker (python main.py <ip> <port> --workers 4): setiap worker
+# punya client WebSocket/SSE & state in-memory sendiri. Event di-relay
+# lewat bus (backend/cluster_bus.py) supaya semua worker tetap sinkron:
+# - broadcast    : pesan WebSocket/SSE -> dikirim ke client worker lain
+# - fixes        : GPS fix (posisi, jarak, speed, stop terakhir)
+# - trip         : trip start / end
+# - active_route : rute aktif berubah
+# - version      : versi resource untuk ETag (route_requests)
+#
+# Job background singleton (arsip, simplifikasi, dispatcher) hanya jalan
+# di worker yang memegang LEADER_LOCK_FILE. Kalau worker itu mati, worker
+# lain mengambil alih dalam LEADER_RETRY_INTERVAL detik.
+
+WORKERS = int(os.getenv("WORKERS", "1"))
+BROADCAST_BACKEND = os.getenv("BROADCAST_BACKEND", "local")
+BUS_SOCKET_DIR = os.getenv(
+    "BUS_SOCKET_DIR", os.path.join(PROJECT_ROOT, "backend", "bus")
+)
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+BUS_CHANNEL = os.getenv("BUS_CHANNEL", "uisi-shuttle")
+LEADER_LOCK_FILE = os.getenv(
+    "LEADER_LOCK_FILE", os.path.join(PROJECT_ROOT, "backend", "leader.lock")
+)
+LEADER_RETRY_INTERVAL = float(os.getenv("LEADER_RETRY_INTERVAL", "5"))
+# Ukuran potongan event fixes (jauh di bawah MAX_EVENT_BYTES cluster_bus)
+RELAY_RECORDS_PER_EVENT = 100
+RELAY_SAMPLES_PER_EVENT = 400
+
+cluster_bus = create_bus(BROADCAST_BACKEND, BUS_SOCKET_DIR, REDIS_URL, BUS_CHANNEL)
+leader_lock = LeaderLock(LEADER_LOCK_FILE)
+
 
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+def relay_event(kind: str, **payload):
+    """Kirim event ke worker lain (no-op kalau satu proses)"""
+    if cluster_bus.relays:
+        cluster_bus.publish({"kind": kind, **payload})
 
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        print(f"✅ WebSocket connected. Total: {len(self.active_connections)}")
 
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-        print(f"❌ WebSocket disconnected. Total: {len(self.active_connections)}")
+def relay_fixes(records: List[dict], increments: Dict[int, float], samples: List[tuple]):
+    """
+    Relay hasil ingest_fixes. Batch besar dipecah jadi beberapa event
+    (urutan tetap) supaya tiap event di bawah batas ukuran bus; event yang
+    kebesaran di-drop dan worker lain akan salah state sampai restart
+    """
+    if not cluster_bus.relays:
+        return
+    for start in range(0, len(records), RELAY_RECORDS_PER_EVENT):
+        relay_event(
+            "fixes",
+            records=records[start:start + RELAY_RECORDS_PER_EVENT],
+            increments={},
+            samples=[],
+        )
+    relay_event("fixes", records=[], increments=increments, samples=[])
+    for start in range(0, len(samples), RELAY_SAMPLES_PER_EVENT):
+        relay_event(
+            "fixes",
+            records=[],
+            increments={},
+            samples=samples[start:start + RELAY_SAMPLES_PER_EVENT],
+        )
 
-    async def broadcast(self, message: dict):
-        """Broadcast message ke semua connected clients"""
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except Exception as e:
-                print(f"❌ Broadcast error: {e}")
-                dead_connections.append(connection)
 
-        # Remove dead connections
-        for conn in dead_connections:
-            self.active_connections.remove(conn)
+def apply_remote_fixes(event: dict):
+    """Sama seperti ingest_fixes, tanpa database & broadcast (sudah di worker asal)"""
+    for record in event["records"]:
+        position_cache.update(record)
+    for shuttle_id, distance_increment in event["increments"].items():
+        fleet.add_distance(int(shuttle_id), distance_increment)
+    for shuttle_id, speed, latitude, longitude, fix_time in event["samples"]:
+        speed_estimator.add(shuttle_id, speed, fix_time)
+        travel_model.observe(shuttle_id, latitude, longitude, fix_time)
+
+
+def handle_cluster_event(event: dict):
+    """Event dari worker lain (dipanggil di event loop)"""
+    kind = event.get("kind")
+    if kind == "broadcast":
+        manager.broadcast_local(event["message"], event["topic"])
+    elif kind == "fixes":
+        apply_remote_fixes(event)
+    elif kind == "trip":
+        fleet.set_trip(event["shuttle_id"], event["trip"], relay=False)
+    elif kind == "active_route":
+        fleet.set_active_route(event["shuttle_id"], event["route"], relay=False)
+    elif kind == "version" and event["name"] == route_requests_version.name:
+        route_requests_version.advance(event["version"])
+
+
+async def leader_loop():
+    """Tunggu jadi leader, lalu jalankan job background singleton"""
+    while not leader_lock.try_acquire():
+        await asyncio.sleep(LEADER_RETRY_INTERVAL)
+    if WORKERS > 1:
+        print(f"👑 Worker {os.getpid()} is leader (background jobs)")
+
+    tasks = []
+    if LOCATION_ARCHIVE:
+        tasks.append(asyncio.create_task(archive_loop()))
+    if TRAJECTORY_SIMPLIFY:
+        tasks.append(asyncio.create_task(simplify_loop()))
+    if AUTO_DISPATCH:
+        tasks.append(asyncio.create_task(dispatch_loop()))
+        print("🚐 Auto dispatcher enabled")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for task in tasks:
+            task.cancel()
+        leader_lock.release()
 
 
-manager = ConnectionManager()
+def prepare_database():
+    """
+    Dijalankan sekali oleh proses utama sebelum worker dibuat:
+    migration & replay log write-behind tidak boleh jalan bersamaan
+    """
+    with get_db() as conn:
+        run_migrations(conn)
+    location_buffer.replay()
+
 
 # ==================== ENDPOINTS ====================
 
@@ -287,14 +3094,21 @@ async def api_info():
         "endpoints": {
             "tracking": {
                 "POST /api/location": "Submit GPS location",
+                "POST /api/location/batch": "Submit buffered GPS locations",
                 "GET /api/shuttle/current": "Get current location",
+                "GET /api/shuttle/eta": "Get ETA to every stop",
+                "GET /api/fleet": "Get every shuttle's state",
+                "GET /api/shuttle/history": "Get GPS history (incl. archive)",
                 "GET /api/shuttle/distance": "Get distance stats",
             },
             "routing": {
                 "POST /api/route/request": "Create route request",
                 "GET /api/route/requests": "Get all requests",
                 "POST /api/route/accept/{id}": "Accept request",
+                "POST /api/dispatch/run": "Assign pending requests to shuttles",
                 "GET /api/route/active": "Get active route",
+                "POST /api/route/plan": "Plan multi-stop route from pending requests",
+                "POST /api/route/stop/next": "Mark next stop reached",
                 "POST /api/route/complete": "Complete route",
             },
             "trip": {
@@ -302,7 +3116,10 @@ async def api_info():
                 "POST /api/trip/end": "End trip",
             },
             "locations": {"GET /api/locations": "Get all locations"},
-            "websocket": {"WS /ws/tracking": "WebSocket for real-time updates"},
+            "websocket": {
+                "WS /ws/tracking": "WebSocket for real-time updates",
+                "GET /api/tracking/stream": "Server-Sent Events fallback",
+            },
         },
         "docs": "/docs",
     }
@@ -320,91 +3137,48 @@ async def submit_location(data: LocationData):
     - Hitung jarak increment otomatis
     """
     try:
-        with get_db() as conn:
-            cursor = conn.cursor()
-
-            # Get last location untuk hitung jarak
-            cursor.execute(
-                """
-                SELECT latitude, longitude FROM location_history
-                WHERE shuttle_id = ?
-                ORDER BY timestamp DESC LIMIT 1
-            """,
-                (data.shuttle_id,),
-            )
-
-            last_location = cursor.fetchone()
-            distance_increment = 0.0
-
-            if last_location:
-                distance_increment = haversine_distance(
-                    last_location["latitude"],
-                    last_location["longitude"],
-                    data.latitude,
-                    data.longitude,
-                )
+        ingest = await ingest_fixes([data])
 
-            # Insert new location
-            timestamp = data.timestamp if data.timestamp else datetime.now().isoformat()
-            cursor.execute(
-                """
-                INSERT INTO location_history
-                (shuttle_id, latitude, longitude, speed, heading, accuracy, timestamp)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """,
-                (
-                    data.shuttle_id,
-                    data.latitude,
-                    data.longitude,
-                    data.speed,
-                    data.heading,
-                    data.accuracy,
-                    timestamp,
-                ),
-            )
+        return {
+            "success": True,
+            "message": "Location updated",
+            "distance_increment": round(ingest["increments"][data.shuttle_id], 3),
+        }
 
-            # Update shuttle status
-            cursor.execute(
-                """
-                UPDATE shuttles
-                SET status = 'active',
-                    total_distance = total_distance + ?
-                WHERE id = ?
-            """,
-                (distance_increment, data.shuttle_id),
-            )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-            # Update trip distance
-            cursor.execute(
-                """
-                UPDATE trips
-                SET distance = distance + ?
-                WHERE shuttle_id = ? AND status = 'ongoing'
-            """,
-                (distance_increment, data.shuttle_id),
-            )
 
-            conn.commit()
+@app.post("/api/location/batch")
+async def submit_location_batch(fixes: List[LocationData]):
+    """
+    Submit banyak GPS fix sekaligus (buffer dari HP driver)
 
-        # Broadcast ke semua client
-        await manager.broadcast(
-            {
-                "type": "location_update",
-                "data": {
-                    "shuttle_id": data.shuttle_id,
-                    "latitude": data.latitude,
-                    "longitude": data.longitude,
-                    "speed": data.speed,
-                    "heading": data.heading,
-                    "timestamp": timestamp,
-                },
-            }
+    CARA PAKAI:
+    - HP driver yang sempat kehilangan sinyal kirim semua fix yang
+      di-buffer dalam satu array, urut dari yang paling lama
+    - Jarak dihitung kumulatif di memory, insert pakai satu executemany
+      dalam satu transaksi
+    - Broadcast hanya posisi terbaru tiap shuttle
+    - Maksimal LOCATION_BATCH_MAX fix per request (413 kalau lebih), buffer
+      yang lebih panjang dikirim dalam beberapa request
+    """
+    if not fixes:
+        raise HTTPException(status_code=400, detail="Batch is empty")
+    if len(fixes) > LOCATION_BATCH_MAX:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(fixes)} fixes (max {LOCATION_BATCH_MAX})",
         )
 
+    try:
+        ingest = await ingest_fixes(fixes)
+
         return {
             "success": True,
-            "message": "Location updated",
-            "distance_increment": round(distance_increment, 3),
+            "message": f"{len(fixes)} locations stored",
+            "count": len(fixes),
+            "distance_increment": round(sum(ingest["increments"].values()), 3),
         }
 
     except Exception as e:
@@ -422,32 +3196,12 @@ async def create_route_request(request: RouteRequest):
     - Driver akan lihat di dashboard
     """
     try:
-        with get_db() as conn:
-            cursor = conn.cursor()
-
-            request_time = (
-                request.request_time
-                if request.request_time
-                else datetime.now().isoformat()
-            )
-
-            cursor.execute(
-                """
-                INSERT INTO route_requests
-                (from_location, to_location, requested_by, request_time, status, note)
-                VALUES (?, ?, ?, ?, 'pending', ?)
-            """,
-                (
-                    request.from_location,
-                    request.to_location,
-                    request.requested_by,
-                    request_time,
-                    request.note,
-                ),
-            )
-
-            request_id = cursor.lastrowid
-            conn.commit()
+        request_time = (
+            request.request_time
+            if request.request_time
+            else datetime.now().isoformat()
+        )
+        request_id = await db_write(insert_route_request, request, request_time)
 
         # Broadcast ke driver
         await manager.broadcast(
@@ -460,7 +3214,8 @@ async def create_route_request(request: RouteRequest):
                     "requested_by": request.requested_by,
                     "time": request_time,
                 },
-            }
+            },
+            "requests",
         )
 
         return {
@@ -474,203 +3229,159 @@ async def create_route_request(request: RouteRequest):
 
 
 @app.get("/api/route/requests")
-async def get_route_requests(status: str = "pending", limit: int = 20):
+async def get_route_requests(
+    request: Request, status: str = "pending", limit: int = 20
+):
     """
     Get route requests
 
     Parameters:
     - status: pending, accepted, completed, all
     - limit: max records
-    """
-    with get_db() as conn:
-        cursor = conn.cursor()
-
-        if status == "all":
-            cursor.execute(
-                """
-                SELECT * FROM route_requests
-                ORDER BY request_time DESC
-                LIMIT ?
-            """,
-                (limit,),
-            )
-        else:
-            cursor.execute(
-                """
-                SELECT * FROM route_requests
-                WHERE status = ?
-                ORDER BY request_time DESC
-                LIMIT ?
-            """,
-                (status, limit),
-            )
 
-        requests = cursor.fetchall()
-        return [dict(row) for row in requests]
+    Kirim If-None-Match: <ETag sebelumnya> -> 304 kalau tidak ada perubahan
+    """
+    # Versi dari memory (tanpa SQL), diambil SEBELUM query: write di
+    # antaranya -> ETag lama, aman
+    etag = make_etag(route_requests_version.value)
+    if etag_matches(request, etag):
+        return not_modified(etag, LIVE_CACHE_MAX_AGE)
+    requests = await db_read(fetch_route_requests, status, limit)
+    return cached_json(requests, etag, LIVE_CACHE_MAX_AGE)
 
 
 @app.post("/api/route/accept/{request_id}")
-async def accept_route_request(request_id: int):
+async def accept_route_request(request_id: int, shuttle_id: int = 1):
     """
     Driver accept route request
 
     CARA PAKAI:
     - Driver lihat pending requests
-    - Klik accept
-    - Route otomatis jadi active
+    - Klik accept (shuttle_id = shuttle si driver)
+    - Route otomatis jadi active untuk shuttle tersebut
     """
-    try:
-        with get_db() as conn:
-            cursor = conn.cursor()
-
-            # Get request details
-            cursor.execute(
-                """
-                SELECT * FROM route_requests WHERE id = ?
-            """,
-                (request_id,),
-            )
-            request = cursor.fetchone()
-
-            if not request:
-                raise HTTPException(status_code=404, detail="Request not found")
-
-            # Update request status
-            # cursor.execute("""
-            #     UPDATE route_requests
-            #     SET status = 'accepted'
-            #     WHERE id = ?
-            # """, (request_id,))
-            cursor.execute("BEGIN IMMEDIATE")  # Lock database
-            cursor.execute(
-                "SELECT status FROM route_requests WHERE id = ?", (request_id,)
-            )
-            current_status = cursor.fetchone()
-
-            if current_status["status"] != "pending":
-                raise HTTPException(400, "Request already accepted")
-
-            # Clear old active routes
-            cursor.execute("""
-                UPDATE active_routes
-                SET status = 'completed'
-                WHERE shuttle_id = 1 AND status = 'active'
-            """)
+    if fleet.get(shuttle_id) is None:
+        raise HTTPException(status_code=404, detail="Shuttle not found")
 
-            # Set as active route
-            cursor.execute(
-                """
-                INSERT INTO active_routes (from_location, to_location, started_at)
-                VALUES (?, ?, ?)
-            """,
-                (
-                    request["from_location"],
-                    request["to_location"],
-                    datetime.now().isoformat(),
-                ),
-            )
-
-            conn.commit()
+    try:
+        route = await db_write(activate_route_request, request_id, shuttle_id)
+        await announce_route_accepted(route)
 
         return {
             "success": True,
             "message": "Route accepted and set as active",
-            "from": request["from_location"],
-            "to": request["to_location"],
+            "shuttle_id": shuttle_id,
+            "from": route["from_location"],
+            "to": route["to_location"],
         }
 
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/dispatch/run")
+async def trigger_dispatch():
+    """
+    Jalankan dispatcher sekarang (tanpa menunggu tick berikutnya)
+
+    CARA PAKAI:
+    - Admin klik "dispatch" untuk assign semua request pending ke shuttle
+      terdekat yang sedang free
+    - Dengan AUTO_DISPATCH=1 ini jalan otomatis setiap DISPATCH_INTERVAL detik
+    """
+    try:
+        assigned = await run_dispatch()
+        return {"success": True, "assigned": assigned, "count": len(assigned)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/route/active")
-async def get_active_route(shuttle_id: int = 1):
-    """Get current active route dengan ETA"""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            SELECT * FROM active_routes
-            WHERE shuttle_id = ? AND status = 'active'
-            ORDER BY started_at DESC
-            LIMIT 1
-        """,
-            (shuttle_id,),
-        )
+async def get_active_route(request: Request, shuttle_id: int = 1):
+    """Get current active route dengan ETA (dari state fleet, tanpa SQL, dengan ETag)"""
+    # ETag dari hasil yang sudah dihitung (ETA ikut berubah kalau posisi,
+    # kecepatan, road network, gazetteer atau model waktu tempuh berubah)
+    status = active_route_status(shuttle_id)
+    etag = make_etag(content_version(status))
+    if etag_matches(request, etag):
+        return not_modified(etag, LIVE_CACHE_MAX_AGE)
+    return cached_json(status, etag, LIVE_CACHE_MAX_AGE)
+
+
+@app.post("/api/route/plan")
+async def plan_multi_stop_route(shuttle_id: int = 1, dry_run: bool = False):
+    """
+    Gabungkan request pending jadi satu rute multi-stop untuk shuttle
 
-        route = cursor.fetchone()
-        if not route:
-            return {"active": False, "message": "No active route"}
+    CARA PAKAI:
+    - Admin / driver klik "plan" saat shuttle free
+    - Request yang searah digabung (maks PLANNER_MAX_REQUESTS), urutan
+      jemput & antar dihitung supaya total jarak minimum
+    - dry_run=true: hanya lihat rencana, belum disimpan
+    - Setiap sampai di stop, panggil POST /api/route/stop/next
+    """
+    if fleet.get(shuttle_id) is None:
+        raise HTTPException(status_code=404, detail="Shuttle not found")
 
-        # Get current location
-        cursor.execute(
-            """
-            SELECT latitude, longitude FROM location_history
-            WHERE shuttle_id = ?
-            ORDER BY timestamp DESC LIMIT 1
-        """,
-            (shuttle_id,),
-        )
+    try:
+        requests = await db_read(fetch_pending_requests, DISPATCH_BATCH_SIZE)
+        plan = plan_itinerary(shuttle_id, requests)
+        if not plan:
+            return {"success": False, "message": "No pending requests to plan"}
+        if dry_run:
+            return {"success": True, "plan": plan}
+
+        route = await db_write(activate_itinerary, plan)
+        await announce_route_accepted(route)
+        return {"success": True, "plan": plan, "route_id": route["id"]}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        current = cursor.fetchone()
 
-        # Calculate ETA
-        if current:
-            dest_coords = find_location_coords(route["to_location"])
-            if dest_coords:
-                avg_speed = get_average_speed(shuttle_id)
-                eta = calculate_eta(
-                    current["latitude"],
-                    current["longitude"],
-                    dest_coords[0],
-                    dest_coords[1],
-                    avg_speed,
-                )
+@app.post("/api/route/stop/next")
+async def arrive_at_next_stop(shuttle_id: int = 1):
+    """Driver sampai di stop berikutnya (rute multi-stop)"""
+    try:
+        result = await db_write(advance_route_stop, shuttle_id)
 
-                return {
-                    "active": True,
-                    "from": route["from_location"],
-                    "to": route["to_location"],
-                    "started_at": route["started_at"],
-                    "eta_minutes": eta,
-                    "current_location": {
-                        "lat": current["latitude"],
-                        "lng": current["longitude"],
-                    },
-                }
+        if result["route_completed"]:
+            await manager.broadcast(
+                {"type": "route_completed", "data": {"shuttle_id": shuttle_id}},
+                "routes",
+            )
+        else:
+            await manager.broadcast(
+                {
+                    "type": "route_stop_reached",
+                    "data": {"shuttle_id": shuttle_id, "stop": result["stop"]},
+                },
+                "routes",
+            )
+        await broadcast_scheduler.publish_state(shuttle_id)
+        return {"success": True, **result}
 
-        return {
-            "active": True,
-            "from": route["from_location"],
-            "to": route["to_location"],
-            "started_at": route["started_at"],
-        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/api/route/complete")
 async def complete_active_route(shuttle_id: int = 1):
     """Mark active route sebagai completed"""
     try:
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                UPDATE active_routes
-                SET status = 'completed'
-                WHERE shuttle_id = ? AND status = 'active'
-            """,
-                (shuttle_id,),
-            )
+        await db_write(complete_route, shuttle_id)
 
-            # Update corresponding request
-            cursor.execute("""
-                UPDATE route_requests
-                SET status = 'completed'
-                WHERE status = 'accepted'
-                LIMIT 1
-            """)
-
-            conn.commit()
+        await manager.broadcast(
+            {"type": "route_completed", "data": {"shuttle_id": shuttle_id}},
+            "routes",
+        )
+        await broadcast_scheduler.publish_state(shuttle_id)
 
         return {"success": True, "message": "Route completed"}
     except Exception as e:
@@ -678,100 +3389,99 @@ async def complete_active_route(shuttle_id: int = 1):
 
 
 @app.get("/api/locations")
-async def get_all_locations():
-    """Get semua lokasi kampus UISI"""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT DISTINCT location_name, latitude, longitude
-            FROM routes
-            ORDER BY point_order
-        """)
-        locations = cursor.fetchall()
-        return [dict(row) for row in locations]
+async def get_all_locations(request: Request):
+    """Get semua lokasi kampus UISI (dari gazetteer, dengan ETag)"""
+    etag = make_etag(gazetteer.version)
+    if etag_matches(request, etag):
+        return not_modified(etag, LOCATIONS_CACHE_MAX_AGE)
+    return cached_json(public_locations(), etag, LOCATIONS_CACHE_MAX_AGE)
 
 
 @app.get("/api/shuttle/current")
-async def get_current_location(shuttle_id: int = 1):
-    """Get current shuttle location"""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            SELECT * FROM location_history
-            WHERE shuttle_id = ?
-            ORDER BY timestamp DESC LIMIT 1
-        """,
-            (shuttle_id,),
-        )
-        location = cursor.fetchone()
-        if not location:
-            raise HTTPException(status_code=404, detail="No location data")
-        return dict(location)
+async def get_current_location(request: Request, shuttle_id: int = 1):
+    """Get current shuttle location (dengan ETag)"""
+    location = position_cache.get(shuttle_id)
+    if not location:
+        raise HTTPException(status_code=404, detail="No location data")
+    etag = make_etag(content_version(location))
+    if etag_matches(request, etag):
+        return not_modified(etag, LIVE_CACHE_MAX_AGE)
+    return cached_json(location, etag, LIVE_CACHE_MAX_AGE)
+
+
+@app.get("/api/fleet")
+async def get_fleet():
+    """
+    Snapshot semua shuttle dalam satu response (dari memory, tanpa SQL)
 
+    Isi per shuttle: posisi terakhir, status, trip ongoing, rute aktif,
+    kecepatan rata-rata
+    """
+    shuttles = fleet.snapshot()
+    for shuttle in shuttles:
+        shuttle["avg_speed"] = round(get_average_speed(shuttle["shuttle_id"]), 1)
+    return {"count": len(shuttles), "shuttles": shuttles}
 
-@app.get("/api/shuttle/distance")
-async def get_distance(shuttle_id: int = 1):
-    """Get distance statistics"""
-    with get_db() as conn:
-        cursor = conn.cursor()
 
-        # Today's distance
-        today = datetime.now().date().isoformat()
-        cursor.execute(
-            """
-            SELECT SUM(distance) as total
-            FROM trips
-            WHERE shuttle_id = ? AND DATE(start_time) = ?
-        """,
-            (shuttle_id, today),
-        )
-        today_result = cursor.fetchone()
-        today_distance = today_result["total"] if today_result["total"] else 0.0
+@app.get("/api/shuttle/eta")
+async def get_stop_etas(shuttle_id: int = 1):
+    """
+    ETA & jarak dari posisi shuttle ke semua stop (satu request)
 
-        # Current trip
-        cursor.execute(
-            """
-            SELECT distance FROM trips
-            WHERE shuttle_id = ? AND status = 'ongoing'
-            ORDER BY start_time DESC LIMIT 1
-        """,
-            (shuttle_id,),
-        )
-        trip_result = cursor.fetchone()
-        trip_distance = trip_result["distance"] if trip_result else 0.0
+    CARA PAKAI:
+    - Halaman mahasiswa panggil sekali setelah ada update posisi,
+      isi ETA semua stop di daftar rute
+    - Hasil di-cache sampai GPS fix berikutnya masuk
+    """
+    etas = stop_eta_cache.get(shuttle_id)
+    if not etas:
+        raise HTTPException(status_code=404, detail="No location data")
+    return etas
+
+
+@app.get("/api/shuttle/history")
+async def get_location_history(
+    shuttle_id: int = 1,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    limit: int = 5000,
+):
+    """
+    Riwayat GPS shuttle (untuk replay / analisis)
 
-        # Total distance
-        cursor.execute(
-            """
-            SELECT total_distance FROM shuttles WHERE id = ?
-        """,
-            (shuttle_id,),
-        )
-        total_result = cursor.fetchone()
-        total_distance = total_result["total_distance"] if total_result else 0.0
+    Parameters:
+    - start, end: timestamp ISO (default: 24 jam terakhir)
+    - limit: max records
+
+    Data lama otomatis diambil dari arsip bulanan juga (maksimal 9 bulan
+    arsip per request, lebih dari itu 400).
+    """
+    end = end or datetime.now().isoformat()
+    start = start or (datetime.fromisoformat(end) - timedelta(days=1)).isoformat()
+    try:
+        points = await db_read(fetch_location_history, shuttle_id, start, end, limit)
+        return {"shuttle_id": shuttle_id, "count": len(points), "points": points}
+    except ArchiveRangeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-    return {
-        "today_distance": round(today_distance, 2),
-        "current_trip_distance": round(trip_distance, 2),
-        "total_distance": round(total_distance, 2),
-    }
+
+@app.get("/api/shuttle/distance")
+async def get_distance(shuttle_id: int = 1):
+    """Get distance statistics (dari memory, tanpa query database)"""
+    return fleet.distance_stats(shuttle_id)
 
 
 @app.post("/api/trip/start")
 async def start_trip(shuttle_id: int = 1):
     """Start new trip"""
     try:
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                INSERT INTO trips (shuttle_id, start_time, status)
-                VALUES (?, ?, 'ongoing')
-            """,
-                (shuttle_id, datetime.now().isoformat()),
-            )
-            conn.commit()
+        if LOCATION_WRITE_BEHIND:
+            # Jarak dari fix yang masih di buffer milik trip lama, bukan trip baru
+            await location_buffer.flush()
+        await db_write(insert_trip, shuttle_id)
+        await broadcast_scheduler.publish_state(shuttle_id)
         return {"success": True, "message": "Trip started"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -781,49 +3491,82 @@ async def start_trip(shuttle_id: int = 1):
 async def end_trip(shuttle_id: int = 1):
     """End current trip"""
     try:
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                UPDATE trips
-                SET end_time = ?, status = 'completed'
-                WHERE shuttle_id = ? AND status = 'ongoing'
-            """,
-                (datetime.now().isoformat(), shuttle_id),
-            )
-
-            cursor.execute(
-                """
-                UPDATE shuttles SET status = 'inactive' WHERE id = ?
-            """,
-                (shuttle_id,),
-            )
-            conn.commit()
+        if LOCATION_WRITE_BEHIND:
+            # Jarak dari fix yang masih di buffer harus masuk trip ini sebelum ditutup
+            await location_buffer.flush()
+        await db_write(finish_trip, shuttle_id)
+        await broadcast_scheduler.publish_state(shuttle_id)
         return {"success": True, "message": "Trip ended"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.websocket("/ws/tracking")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(websocket: WebSocket, encoding: str = "json"):
     """
     WebSocket untuk real-time updates
 
     CARA PAKAI:
     - Frontend connect ke ws://localhost:8000/ws/tracking
     - Akan terima update setiap ada location/request baru
+    - Pesan pertama: snapshot (lokasi kampus + posisi, jarak & rute aktif
+      semua shuttle), setelah itu distance_update & active_route_update
+      dikirim setiap berubah, jadi tidak perlu polling REST
+    - Pilih topic yang dibutuhkan saja, contoh:
+      {"action": "subscribe", "topics": ["shuttle:1", "routes"]}
+      {"action": "unsubscribe", "topics": ["routes"]}
+    - Opsional: ws://.../ws/tracking?encoding=binary untuk location_update
+      dalam format binary ringkas (lihat COMPACT BINARY PROTOCOL)
     """
-    await manager.connect(websocket)
+    encoding = "binary" if encoding == "binary" else "json"
+    await manager.connect(websocket, encoding)
+    manager.send(websocket, client_snapshot())
     try:
         while True:
-            # Keep connection alive
-            data = await websocket.receive_text()
-            # Echo back (optional)
-            # await websocket.send_text(f"Received: {data}")
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes") is not None:
+                manager.handle_ack(websocket, message["bytes"])
+            elif message.get("text") is not None:
+                await manager.handle_message(websocket, message["text"])
     except WebSocketDisconnect:
         manager.disconnect(websocket)
 
 
+@app.get("/api/tracking/stream")
+async def tracking_stream(topics: str = ""):
+    """
+    Server-Sent Events untuk real-time updates (fallback WebSocket)
+
+    CARA PAKAI:
+    - Dipakai frontend kalau WebSocket diblok proxy / jaringan kampus:
+      new EventSource("/api/tracking/stream?topics=shuttle:1,routes")
+    - Event sama dengan /ws/tracking (snapshot, location_update,
+      distance_update, active_route_update, ...), data = pesan JSON lengkap
+    - topics dipisah koma, kosong = semua topic; topic tidak dikenal -> 400
+    """
+    selected = {topic.strip() for topic in topics.split(",") if topic.strip()}
+    unknown = sorted(topic for topic in selected if not is_valid_topic(topic))
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown topic(s): {', '.join(unknown)}"
+        )
+
+    async def stream():
+        # Client baru didaftarkan saat stream mulai dibaca
+        client = manager.open_event_stream(selected)
+        manager.send(client.key, client_snapshot())
+        async for chunk in client.events():
+            yield chunk
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # ==================== RUN SERVER ====================
 
 '''
@@ -876,34 +3619,74 @@ Press CTRL+C to stop server
     )
 '''
 import uvicorn
-import asyncio
 
-####### Tulis confisg.json ############
-if len(sys.argv) < 3:
-    raise ValueError("Butuh 2 argumen: ip dan port")
-
-HOST = sys.argv[1]
-PORT = int(sys.argv[2])
-
-config = {
-    "HOST": HOST,
-    "PORT": PORT 
-}
-
-# with open("config.json", "w") as f:
-#     json.dump(config, f, indent=2)
+####### Host & port (juga dipakai frontend lewat /config) ############
+# Diisi dari argumen command line di __main__ (lewat env, supaya worker
+# dan proses reload dapat nilai yang sama)
+HOST = os.getenv("SERVER_HOST", "localhost")
+PORT = int(os.getenv("SERVER_PORT", "8000"))
+# Auto-reload saat code berubah (development, hanya kalau 1 worker)
+RELOAD = os.getenv("RELOAD", "1") == "1"
 
 @app.get("/config")
 def get_config():
     return {"HOST": HOST, "PORT": PORT}
 #######################################
 
-async def main():
-    config = uvicorn.Config(
-            "main:app", host=HOST, port=PORT, reload=True, log_level="info"
-            )
-    server = uvicorn.Server(config)
-    await server.serve()
+def main():
+    """
+    CARA PAKAI:
+    python main.py <ip> <port>                 # development (1 proses, auto-reload)
+    python main.py <ip> <port> --workers 4     # production (4 worker)
+
+    Dengan --workers > 1, BROADCAST_BACKEND default jadi "unix" (relay
+    event antar worker lewat Unix socket). Set BROADCAST_BACKEND=redis
+    dan REDIS_URL untuk pakai Redis.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description="UISI Shuttle Tracking server")
+    parser.add_argument("host", nargs="?", default=HOST)
+    parser.add_argument("port", nargs="?", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    args = parser.parse_args()
+
+    os.environ["SERVER_HOST"] = args.host
+    os.environ["SERVER_PORT"] = str(args.port)
+    os.environ["WORKERS"] = str(args.workers)
+
+    if args.workers <= 1:
+        uvicorn.run(
+            "main:app", host=args.host, port=args.port, reload=RELOAD, log_level="info"
+        )
+        return
+
+    if BROADCAST_BACKEND == "local":
+        os.environ["BROADCAST_BACKEND"] = "unix"
+    # ETag dari worker mana pun harus cocok di worker lain
+    os.environ["ETAG_TOKEN"] = ETAG_TOKEN
+    if LOCATION_WRITE_BEHIND:
+        # Log write-behind per proses tidak aman dipakai beberapa worker
+        print("⚠️  LOCATION_WRITE_BEHIND dimatikan (tidak didukung multi-worker)")
+        os.environ["LOCATION_WRITE_BEHIND"] = "0"
+    if os.path.exists(DATABASE):
+        try:
+            prepare_database()
+        except sqlite3.OperationalError as e:
+            print(f"⚠️  WARNING: Database belum di-setup ({e})")
+            print("   Run: python setup_database.py")
+
+    print(
+        f"🚀 Starting {args.workers} workers "
+        f"(broadcast: {os.environ['BROADCAST_BACKEND']})"
+    )
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level="info",
+    )
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -11,10 +11,12 @@ python backup_database.py
 """
 
 import shutil
+import sqlite3
 import os
 from datetime import datetime
 
 DATABASE = os.path.join(os.path.dirname(__file__), '..', 'backend', 'shuttle.db')
+ARCHIVE_DIR = os.path.join(os.path.dirname(__file__), '..', 'backend', 'archive')
 BACKUP_DIR = os.path.join(os.path.dirname(__file__), '..', 'backups')
 
 def main():
@@ -31,11 +33,24 @@ def main():
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     backup_file = os.path.join(BACKUP_DIR, f"shuttle_backup_{timestamp}.db")
     
-    # Copy database
-    shutil.copy2(DATABASE, backup_file)
+    # Online backup API: ikut menyalin halaman yang masih di shuttle.db-wal
+    # (shutil.copy2 hanya menyalin file utama)
+    src = sqlite3.connect(DATABASE)
+    dst = sqlite3.connect(backup_file)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
     
     print(f"✅ Backup created: {backup_file}")
     print(f"   Size: {os.path.getsize(backup_file)} bytes")
+    
+    # Arsip location_history per bulan (kalau ada)
+    if os.path.isdir(ARCHIVE_DIR):
+        archive_backup = os.path.join(BACKUP_DIR, f"archive_{timestamp}")
+        shutil.copytree(ARCHIVE_DIR, archive_backup)
+        print(f"✅ Archive copied: {archive_backup}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -17,10 +17,12 @@ python reset_database.py
 
 import sqlite3
 import os
+import shutil
 import sys
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
 DATABASE = os.path.join(os.path.dirname(__file__), '..', 'backend', 'shuttle.db')
+ARCHIVE_DIR = os.path.join(os.path.dirname(__file__), '..', 'backend', 'archive')
 
 def main():
     print("""
@@ -46,9 +48,18 @@ def main():
         return
     
     try:
-        # Delete database file
+        # Delete database file (+ file WAL/SHM supaya database baru tidak
+        # membaca WAL sisa database lama)
         os.remove(DATABASE)
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(DATABASE + suffix):
+                os.remove(DATABASE + suffix)
         print("\n✅ Database deleted successfully!")
+        
+        # Arsip location_history per bulan ikut dihapus
+        if os.path.isdir(ARCHIVE_DIR):
+            shutil.rmtree(ARCHIVE_DIR)
+            print("✅ Location archive deleted")
         print("\nNext steps:")
         print("1. Run: cd ../backend && python setup_database.py")
         print("2. Run: python main.py")
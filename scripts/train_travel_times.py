@@ -0,0 +1,258 @@
+"""
+Train Travel Times
+==================
+
+INSTRUKSI:
+Script ini mempelajari waktu tempuh antar stop dari data GPS yang sudah
+tercatat (location_history + trips), per hari & jam. Hasilnya dipakai
+backend untuk ETA (lebih akurat daripada jarak / kecepatan rata-rata).
+
+CARA PAKAI:
+python train_travel_times.py           # proses data baru sejak run terakhir
+python train_travel_times.py --reset   # hapus model & training ulang dari awal
+
+CATATAN:
+- Incremental: hanya location_history dengan id > id terakhir yang
+  diproses, jadi aman dijalankan rutin (misal cron tiap malam)
+- Data yang sudah dipindah ke arsip bulanan (backend/archive/) ikut dibaca
+- Segment yang melewati batas trip (trip selesai / trip baru) tidak dihitung
+- Backend yang sedang jalan otomatis pakai model baru (tidak perlu restart)
+"""
+
+import bisect
+import sqlite3
+import sys
+import os
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+from location_archive import history_tables  # noqa: E402
+from setup_database import run_migrations  # noqa: E402
+from travel_times import StopVisitTracker, stop_name, time_bucket  # noqa: E402
+
+DATABASE = os.path.join(os.path.dirname(__file__), '..', 'backend', 'shuttle.db')
+
+# Jumlah baris location_history yang dibaca per batch
+BATCH_SIZE = 5000
+
+
+def parse_timestamp(value):
+    """Timestamp ISO 8601 -> epoch detik (None kalau tidak valid)"""
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def load_stops(conn):
+    """[(nama pendek, lat, lon), ...] dari tabel routes"""
+    cursor = conn.execute("""
+        SELECT location_name, latitude, longitude
+        FROM routes
+        ORDER BY point_order
+    """)
+    return [(stop_name(row[0]), row[1], row[2]) for row in cursor.fetchall()]
+
+
+class TripLookup:
+    """Cari trip id untuk satu timestamp (binary search per shuttle)"""
+
+    def __init__(self, conn, shuttle_id):
+        self.trips = []
+        for trip_id, start_time, end_time in conn.execute("""
+            SELECT id, start_time, end_time FROM trips
+            WHERE shuttle_id = ?
+            ORDER BY start_time
+        """, (shuttle_id,)):
+            start = parse_timestamp(start_time)
+            if start is None:
+                continue
+            end = parse_timestamp(end_time) if end_time else float("inf")
+            self.trips.append((start, end, trip_id))
+        self.starts = [trip[0] for trip in self.trips]
+
+    def trip_at(self, timestamp):
+        index = bisect.bisect_right(self.starts, timestamp) - 1
+        if index >= 0 and timestamp <= self.trips[index][1]:
+            return self.trips[index][2]
+        return None
+
+
+def read_new_rows(conn, table, shuttle_id, last_id):
+    """Baca location_history (id > last_id) per batch dari satu partisi"""
+    while True:
+        rows = conn.execute(f"""
+            SELECT id, latitude, longitude, timestamp
+            FROM {table}
+            WHERE shuttle_id = ? AND id > ?
+            ORDER BY id
+            LIMIT ?
+        """, (shuttle_id, last_id, BATCH_SIZE)).fetchall()
+        if not rows:
+            return
+        yield from rows
+        last_id = rows[-1][0]
+
+
+def train_shuttle(conn, shuttle_id, stops):
+    """
+    Proses location_history baru untuk satu shuttle
+    Returns: (jumlah fix diproses, {(from, to, weekday, hour): [samples, detik]},
+              state baru untuk travel_time_state)
+    """
+    state = conn.execute("""
+        SELECT last_history_id, trip_id, stop, departed_at, last_timestamp
+        FROM travel_time_state WHERE shuttle_id = ?
+    """, (shuttle_id,)).fetchone()
+
+    tracker = StopVisitTracker(stops)
+    last_id, trip_id = 0, None
+    if state:
+        last_id, trip_id = state[0], state[1]
+        tracker.restore(state[2], state[3], state[4])
+
+    trips = TripLookup(conn, shuttle_id)
+    segments = {}
+    processed = 0
+
+    # Arsip bulanan dulu (data lama), baru tabel utama
+    for table in history_tables(conn):
+        for row_id, lat, lon, timestamp in read_new_rows(conn, table, shuttle_id, last_id):
+            last_id = row_id
+            moment = parse_timestamp(timestamp)
+            if moment is None:
+                continue
+            processed += 1
+
+            current_trip = trips.trip_at(moment)
+            if current_trip != trip_id:
+                tracker.reset()
+                trip_id = current_trip
+
+            segment = tracker.observe(lat, lon, moment)
+            if segment:
+                from_stop, to_stop, departed_at, seconds = segment
+                weekday, hour = time_bucket(departed_at)
+                bucket = segments.setdefault((from_stop, to_stop, weekday, hour), [0, 0.0])
+                bucket[0] += 1
+                bucket[1] += seconds
+
+    state = (shuttle_id, last_id, trip_id, *tracker.state())
+    return processed, segments, state
+
+
+def save_states(conn, states):
+    """Simpan posisi training terakhir per shuttle"""
+    conn.executemany("""
+        INSERT INTO travel_time_state
+        (shuttle_id, last_history_id, trip_id, stop, departed_at, last_timestamp)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(shuttle_id) DO UPDATE SET
+            last_history_id = excluded.last_history_id,
+            trip_id = excluded.trip_id,
+            stop = excluded.stop,
+            departed_at = excluded.departed_at,
+            last_timestamp = excluded.last_timestamp
+    """, states)
+
+
+def save_segments(conn, segments):
+    """Tambahkan sample baru ke tabel model (upsert per bucket)"""
+    conn.executemany("""
+        INSERT INTO segment_travel_times
+        (from_stop, to_stop, weekday, hour, samples, total_seconds)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(from_stop, to_stop, weekday, hour) DO UPDATE SET
+            samples = samples + excluded.samples,
+            total_seconds = total_seconds + excluded.total_seconds
+    """, [(*key, samples, seconds) for key, (samples, seconds) in segments.items()])
+
+
+def show_model(conn):
+    """Ringkasan rata-rata waktu tempuh per segment (semua jam)"""
+    cursor = conn.execute("""
+        SELECT from_stop, to_stop, SUM(samples), SUM(total_seconds) / SUM(samples)
+        FROM segment_travel_times
+        GROUP BY from_stop, to_stop
+        ORDER BY from_stop, to_stop
+    """)
+    rows = cursor.fetchall()
+
+    print("\n" + "="*70)
+    print("MODEL WAKTU TEMPUH (rata-rata semua jam):")
+    print("="*70)
+    if not rows:
+        print("  (belum ada segment)")
+    for from_stop, to_stop, samples, seconds in rows:
+        print(f"{from_stop:12} → {to_stop:12} : {seconds / 60:5.1f} menit  ({samples} sample)")
+    print("="*70)
+
+
+def main():
+    """Main function"""
+
+    print("""
+╔════════════════════════════════════════════════════════════╗
+║                                                            ║
+║       ⏱️  TRAIN TRAVEL TIMES - UISI SHUTTLE ⏱️              ║
+║                                                            ║
+╚════════════════════════════════════════════════════════════╝
+""")
+
+    if not os.path.exists(DATABASE):
+        print(f"❌ Database not found: {DATABASE}")
+        print("   Please run setup_database.py first!")
+        return False
+
+    try:
+        print(f"🔌 Connecting to database: {DATABASE}")
+        conn = sqlite3.connect(DATABASE)
+        run_migrations(conn)
+
+        if "--reset" in sys.argv:
+            conn.execute("DELETE FROM segment_travel_times")
+            conn.execute("DELETE FROM travel_time_state")
+            conn.commit()
+            print("🗑️  Model lama dihapus, training ulang dari awal")
+
+        stops = load_stops(conn)
+        shuttle_ids = [row[0] for row in conn.execute(
+            "SELECT id FROM shuttles UNION SELECT DISTINCT shuttle_id FROM location_history"
+        )]
+
+        total_processed = 0
+        segments = {}
+        states = []
+        for shuttle_id in shuttle_ids:
+            processed, shuttle_segments, state = train_shuttle(conn, shuttle_id, stops)
+            total_processed += processed
+            states.append(state)
+            for key, (samples, seconds) in shuttle_segments.items():
+                bucket = segments.setdefault(key, [0, 0.0])
+                bucket[0] += samples
+                bucket[1] += seconds
+            print(f"  ✅ Shuttle {shuttle_id}: {processed} fix baru diproses")
+
+        # Model & posisi training disimpan dalam satu transaksi
+        save_segments(conn, segments)
+        save_states(conn, states)
+        # Backend reload model kalau versi ini berubah
+        conn.execute("""
+            UPDATE cache_versions SET version = version + 1
+            WHERE name = 'travel_times'
+        """)
+        conn.commit()
+
+        new_samples = sum(samples for samples, _ in segments.values())
+        print(f"\n✅ {total_processed} fix diproses, {new_samples} segment baru")
+        show_model(conn)
+        conn.close()
+        return True
+
+    except Exception as e:
+        print(f"\n❌ ERROR: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
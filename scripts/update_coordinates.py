@@ -152,7 +152,8 @@ def main():
             
             print("\n🎉 UPDATE COMPLETED!")
             print("\nNext steps:")
-            print("1. Restart backend: python main.py")
+            print("1. Backend yang sedang jalan akan pakai koordinat baru")
+            print("   dalam beberapa detik (tidak perlu restart)")
             print("2. Test di frontend untuk verify posisi")
         else:
             print("\n⚠️  No locations were updated")
@@ -0,0 +1,61 @@
+"""
+Setup pytest: unit test mengimpor main.py langsung (tanpa server)
+
+CARA JALANKAN (dari root project):
+python -m pytest tests -q
+
+tests/test_api.py adalah script untuk server yang sedang jalan
+(python test_api.py), tidak ikut dikumpulkan pytest.
+"""
+
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import main  # noqa: E402
+from cluster_bus import LeaderLock  # noqa: E402
+from setup_database import (  # noqa: E402
+    create_tables,
+    insert_locations,
+    insert_shuttle_info,
+    run_migrations,
+)
+
+collect_ignore = ["test_api.py"]
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch, capsys):
+    """Database sementara (schema + lokasi kampus), dipakai lewat main.get_db()"""
+    path = str(tmp_path / "shuttle.db")
+    conn = sqlite3.connect(path)
+    create_tables(conn.cursor())
+    insert_shuttle_info(conn.cursor())
+    insert_locations(conn.cursor())
+    conn.commit()
+    run_migrations(conn)
+    conn.close()
+    capsys.readouterr()
+
+    pool = main.ConnectionPool(path)
+    monkeypatch.setattr(main, "DATABASE", path)
+    monkeypatch.setattr(main, "db_pool", pool)
+    yield path
+    pool.close_all()
+
+
+@pytest.fixture
+def client(database, tmp_path, monkeypatch):
+    """TestClient FastAPI di atas database sementara (tanpa job background)"""
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(main, "LOCATION_ARCHIVE", False)
+    monkeypatch.setattr(main, "TRAJECTORY_SIMPLIFY", False)
+    monkeypatch.setattr(main, "AUTO_DISPATCH", False)
+    monkeypatch.setattr(main, "leader_lock", LeaderLock(str(tmp_path / "leader.lock")))
+    with TestClient(main.app) as test_client:
+        yield test_client
@@ -0,0 +1,216 @@
+"""
+Test relay antar worker: dua RedisBus(MemoryRedis) di satu hub berperan
+sebagai dua worker dalam satu proses, plus relay_fixes & LeaderLock
+"""
+
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+import cluster_bus
+import main
+from cluster_bus import LeaderLock, MemoryRedis, RedisBus
+
+CHANNEL = "test-shuttle"
+
+
+async def wait_for(condition, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("event tidak sampai")
+        await asyncio.sleep(0.01)
+
+
+async def settle():
+    """Beri waktu sender & listener memproses antrian"""
+    for _ in range(20):
+        await asyncio.sleep(0)
+    await asyncio.sleep(0.05)
+
+
+def run_pair(scenario, handler_b=None):
+    """Jalankan scenario(bus_a, bus_b, received_a, received_b) dengan dua bus"""
+
+    async def main_coroutine():
+        hub = {}
+        bus_a = RedisBus(MemoryRedis(hub), CHANNEL)
+        bus_b = RedisBus(MemoryRedis(hub), CHANNEL)
+        received_a, received_b = [], []
+
+        def on_b(event):
+            received_b.append(event)
+            if handler_b:
+                handler_b(event)
+
+        await bus_a.start(received_a.append)
+        await bus_b.start(on_b)
+        try:
+            await scenario(bus_a, bus_b, received_a, received_b)
+        finally:
+            await bus_a.stop()
+            await bus_b.stop()
+
+    asyncio.run(main_coroutine())
+
+
+@pytest.fixture
+def worker_state(monkeypatch):
+    """State in-memory worker penerima: fleet baru, broadcast dicatat"""
+    monkeypatch.setattr(main, "fleet", main.FleetRegistry())
+    broadcasts = []
+    monkeypatch.setattr(
+        main.manager, "broadcast_local", lambda message, topic: broadcasts.append((topic, message))
+    )
+    observed = []
+    monkeypatch.setattr(main.travel_model, "observe", lambda *args: observed.append(args))
+    return broadcasts, observed
+
+
+def record(index: int, shuttle_id: int = 3) -> dict:
+    return {
+        "id": index,
+        "shuttle_id": shuttle_id,
+        "latitude": -7.16 + index * 1e-5,
+        "longitude": 112.63,
+        "speed": 20.0,
+        "heading": 90.0,
+        "accuracy": 5.0,
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
+def test_fixes_and_broadcast_reach_other_worker(worker_state):
+    broadcasts, observed = worker_state
+    fix = record(1)
+    message = {"type": "location_update", "data": fix}
+
+    async def scenario(bus_a, bus_b, received_a, received_b):
+        bus_a.publish(
+            {
+                "kind": "fixes",
+                "records": [fix],
+                "increments": {"3": 0.25},
+                "samples": [[3, 20.0, fix["latitude"], fix["longitude"], time.time()]],
+            }
+        )
+        bus_a.publish({"kind": "broadcast", "message": message, "topic": "shuttle:3"})
+        await wait_for(lambda: len(received_b) == 2)
+        await settle()
+        # Pengirim tidak meng-handle event-nya sendiri
+        assert received_a == []
+
+    run_pair(scenario, handler_b=main.handle_cluster_event)
+
+    assert main.position_cache.get(3)["latitude"] == fix["latitude"]
+    assert main.fleet.get(3).total_distance == pytest.approx(0.25)
+    assert main.speed_estimator.average(3) == pytest.approx(20.0)
+    assert len(observed) == 1
+    assert broadcasts == [("shuttle:3", message)]
+
+
+def test_oversized_event_is_dropped_and_order_kept():
+    async def scenario(bus_a, bus_b, received_a, received_b):
+        bus_a.publish({"kind": "broadcast", "seq": 1})
+        bus_a.publish({"kind": "broadcast", "padding": "x" * cluster_bus.MAX_EVENT_BYTES})
+        bus_a.publish({"kind": "broadcast", "seq": 2})
+        await wait_for(lambda: len(received_b) == 2)
+        await settle()
+        assert [event["seq"] for event in received_b] == [1, 2]
+        assert bus_a.dropped == 1
+
+    run_pair(scenario)
+
+
+def test_relay_event_is_noop_for_local_bus(monkeypatch):
+    sent = []
+    bus = cluster_bus.LocalBus()
+    monkeypatch.setattr(bus, "_enqueue", sent.append)
+    monkeypatch.setattr(main, "cluster_bus", bus)
+
+    main.relay_event("trip", shuttle_id=1, trip=None)
+    main.relay_fixes([record(1)], {1: 0.1}, [])
+    assert sent == []
+
+
+class CaptureBus:
+    relays = True
+
+    def __init__(self):
+        self.events = []
+
+    def publish(self, event):
+        self.events.append(event)
+
+
+def test_relay_fixes_chunks_under_event_limit(monkeypatch):
+    bus = CaptureBus()
+    monkeypatch.setattr(main, "cluster_bus", bus)
+    records = [record(index) for index in range(250)]
+    samples = [(3, 20.0, -7.16, 112.63, 1700000000.0 + index) for index in range(900)]
+
+    main.relay_fixes(records, {3: 1.5}, samples)
+
+    kinds = {event["kind"] for event in bus.events}
+    assert kinds == {"fixes"}
+    assert [len(event["records"]) for event in bus.events] == [100, 100, 50, 0, 0, 0, 0]
+    assert [len(event["samples"]) for event in bus.events] == [0, 0, 0, 0, 400, 400, 100]
+    assert [event["increments"] for event in bus.events if event["increments"]] == [{3: 1.5}]
+    # Urutan record tetap, dan tiap event muat di bus
+    assert [r["id"] for event in bus.events for r in event["records"]] == list(range(250))
+    for event in bus.events:
+        assert len(json.dumps(event).encode()) < cluster_bus.MAX_EVENT_BYTES
+
+
+def test_relayed_batch_rebuilds_state_on_other_worker(monkeypatch, worker_state):
+    records = [record(index) for index in range(250)]
+
+    async def scenario(bus_a, bus_b, received_a, received_b):
+        monkeypatch.setattr(main, "cluster_bus", bus_a)
+        main.relay_fixes(records, {3: 2.0}, [])
+        await wait_for(lambda: len(received_b) == 4)
+
+    run_pair(scenario, handler_b=main.handle_cluster_event)
+
+    assert main.position_cache.get(3)["id"] == 249
+    assert main.fleet.get(3).total_distance == pytest.approx(2.0)
+
+
+def test_handle_trip_and_active_route_without_relaying_back(monkeypatch, worker_state):
+    bus = CaptureBus()
+    monkeypatch.setattr(main, "cluster_bus", bus)
+    trip = {"id": 9, "start_time": datetime.now().isoformat(), "distance": 0.0}
+    route = {"id": 4, "from_location": "Ged 1 A", "to_location": "Wiragraha"}
+
+    main.handle_cluster_event({"kind": "trip", "shuttle_id": 2, "trip": trip})
+    main.handle_cluster_event({"kind": "active_route", "shuttle_id": 2, "route": route})
+    main.handle_cluster_event({"kind": "unknown"})
+
+    assert main.fleet.get(2).trip == trip
+    assert main.fleet.active_route(2) == route
+    # Event dari worker lain tidak di-relay ulang (tidak ada ping-pong)
+    assert bus.events == []
+
+    main.handle_cluster_event({"kind": "active_route", "shuttle_id": 2, "route": None})
+    assert main.fleet.active_route(2) is None
+
+
+def test_leader_lock_is_exclusive(tmp_path):
+    path = str(tmp_path / "leader.lock")
+    first, second = LeaderLock(path), LeaderLock(path)
+
+    assert first.try_acquire()
+    assert first.try_acquire()  # sudah pegang: tetap True
+    assert not second.try_acquire()
+    assert not second.held
+    with open(path) as f:
+        assert f.read() == str(os.getpid())
+
+    first.release()
+    assert not first.held
+    assert second.try_acquire()
+    second.release()
@@ -0,0 +1,119 @@
+"""
+Test CompactEncoder (encoding=binary di /ws/tracking)
+
+Frame di-decode seperti client (frontend/static/script.js): key frame
+berisi posisi penuh, delta frame relatif ke frame yang sudah di-ack
+"""
+
+import main
+from main import DELTA_FRAME, FRAME_DELTA, FRAME_KEY, KEY_FRAME, CompactEncoder
+
+
+class Decoder:
+    """Rekonstruksi posisi dari frame, sama seperti decodeCompactFrame()"""
+
+    def __init__(self):
+        self.frames = {}  # (shuttle_id, seq) -> (lat_e6, lng_e6, timestamp_ms)
+
+    def decode(self, frame: bytes) -> dict:
+        if frame[0] == FRAME_KEY:
+            _, _, shuttle_id, seq, lat, lng, speed, heading, seconds, millis = (
+                KEY_FRAME.unpack(frame)
+            )
+            timestamp_ms = seconds * 1000 + millis
+        else:
+            assert frame[0] == FRAME_DELTA
+            _, _, shuttle_id, seq, base_seq, dlat, dlng, speed, heading, dt = (
+                DELTA_FRAME.unpack(frame)
+            )
+            base_lat, base_lng, base_ms = self.frames[(shuttle_id, base_seq)]
+            lat, lng, timestamp_ms = base_lat + dlat, base_lng + dlng, base_ms + dt * 100
+        self.frames[(shuttle_id, seq)] = (lat, lng, timestamp_ms)
+        return {
+            "shuttle_id": shuttle_id,
+            "seq": seq,
+            "latitude": lat / 1e6,
+            "longitude": lng / 1e6,
+            "speed": speed / 10,
+            "heading": heading / 100,
+            "timestamp_ms": timestamp_ms,
+        }
+
+
+def fix(latitude, longitude, timestamp, shuttle_id=1):
+    return {
+        "shuttle_id": shuttle_id,
+        "latitude": latitude,
+        "longitude": longitude,
+        "speed": 23.4,
+        "heading": 181.5,
+        "timestamp": timestamp,
+    }
+
+
+def assert_close(decoded: dict, data: dict):
+    assert decoded["shuttle_id"] == data["shuttle_id"]
+    assert abs(decoded["latitude"] - data["latitude"]) < 1e-6
+    assert abs(decoded["longitude"] - data["longitude"]) < 1e-6
+    assert decoded["speed"] == data["speed"]
+    assert decoded["heading"] == data["heading"]
+
+
+def test_first_frame_is_key_frame():
+    encoder, decoder = CompactEncoder(), Decoder()
+    data = fix(-7.1633, 112.628, "2024-05-01T08:00:00+07:00")
+    frame = encoder.encode(data)
+
+    assert frame[0] == FRAME_KEY
+    decoded = decoder.decode(frame)
+    assert_close(decoded, data)
+    assert decoded["timestamp_ms"] == int(main.parse_timestamp(data["timestamp"]) * 1000)
+
+
+def test_delta_after_ack_round_trips():
+    encoder, decoder = CompactEncoder(), Decoder()
+    first = fix(-7.1633, 112.628, "2024-05-01T08:00:00+07:00")
+    decoded = decoder.decode(encoder.encode(first))
+    encoder.ack(1, decoded["seq"])
+
+    track = [
+        fix(-7.1633 + i * 0.0001, 112.628 - i * 0.00005, f"2024-05-01T08:00:{i * 3:02d}+07:00")
+        for i in range(1, 10)
+    ]
+    for data in track:
+        frame = encoder.encode(data)
+        assert frame[0] == FRAME_DELTA
+        assert len(frame) == DELTA_FRAME.size < KEY_FRAME.size
+        decoded = decoder.decode(frame)
+        assert_close(decoded, data)
+        assert decoded["timestamp_ms"] == int(main.parse_timestamp(data["timestamp"]) * 1000)
+
+
+def test_without_ack_sends_key_frames():
+    encoder = CompactEncoder()
+    for second in range(3):
+        frame = encoder.encode(fix(-7.1633, 112.628, f"2024-05-01T08:00:0{second}+07:00"))
+        assert frame[0] == FRAME_KEY
+
+
+def test_large_jump_falls_back_to_key_frame():
+    encoder, decoder = CompactEncoder(), Decoder()
+    decoded = decoder.decode(encoder.encode(fix(-7.1633, 112.628, "2024-05-01T08:00:00+07:00")))
+    encoder.ack(1, decoded["seq"])
+
+    # > 32767 mikro-derajat dari frame yang di-ack -> tidak muat di delta
+    far = fix(-7.1233, 112.628, "2024-05-01T08:00:05+07:00")
+    frame = encoder.encode(far)
+    assert frame[0] == FRAME_KEY
+    assert_close(decoder.decode(frame), far)
+
+
+def test_shuttles_are_encoded_independently():
+    encoder, decoder = CompactEncoder(), Decoder()
+    one = decoder.decode(encoder.encode(fix(-7.1633, 112.628, "2024-05-01T08:00:00+07:00", 1)))
+    encoder.ack(1, one["seq"])
+
+    other = fix(-7.1640, 112.629, "2024-05-01T08:00:01+07:00", 2)
+    frame = encoder.encode(other)
+    assert frame[0] == FRAME_KEY
+    assert_close(decoder.decode(frame), other)
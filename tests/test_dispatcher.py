@@ -0,0 +1,136 @@
+"""
+Test Hungarian assignment dispatcher (dibandingkan dengan brute force)
+"""
+
+import itertools
+import random
+from datetime import datetime
+
+import main
+from dispatcher import UNASSIGNABLE, assign_pairs, hungarian
+from main import FleetRegistry
+
+
+def brute_force(cost):
+    rows, cols = len(cost), len(cost[0])
+    return min(
+        sum(cost[row][col] for row, col in enumerate(columns))
+        for columns in itertools.permutations(range(cols), rows)
+    )
+
+
+def total(cost, assignment):
+    return sum(cost[row][col] for row, col in enumerate(assignment))
+
+
+def test_square_matrix():
+    cost = [
+        [4, 1, 3],
+        [2, 0, 5],
+        [3, 2, 2],
+    ]
+    assignment = hungarian(cost)
+    assert sorted(assignment) == [0, 1, 2]
+    assert total(cost, assignment) == 5
+
+
+def test_beats_greedy():
+    # Greedy (request 0 ambil shuttle terdekat dulu) total 1 + 10 = 11,
+    # optimal 2 + 2 = 4
+    cost = [
+        [1, 2],
+        [2, 10],
+    ]
+    assert hungarian(cost) == [1, 0]
+
+
+def test_more_columns_than_rows():
+    cost = [
+        [7, 3, 9, 1],
+        [2, 8, 4, 6],
+    ]
+    assignment = hungarian(cost)
+    assert len(set(assignment)) == 2
+    assert total(cost, assignment) == 3
+
+
+def test_random_matrices_match_brute_force():
+    rng = random.Random(17)
+    for _ in range(300):
+        rows = rng.randint(1, 5)
+        cols = rng.randint(rows, 6)
+        cost = [[rng.uniform(0, 30) for _ in range(cols)] for _ in range(rows)]
+        assignment = hungarian(cost)
+        assert len(set(assignment)) == rows
+        assert abs(total(cost, assignment) - brute_force(cost)) < 1e-9
+
+
+def test_unassignable_pairs_avoided_when_possible():
+    cost = [
+        [UNASSIGNABLE, 4.0, UNASSIGNABLE],
+        [1.0, 2.0, UNASSIGNABLE],
+        [UNASSIGNABLE, UNASSIGNABLE, 6.0],
+    ]
+    assert hungarian(cost) == [1, 0, 2]
+
+
+def test_empty():
+    assert hungarian([]) == []
+
+
+def test_assign_pairs_more_rows_than_columns():
+    # 3 request, 2 shuttle: request 0 tidak kebagian
+    cost = [
+        [9, 9],
+        [1, 5],
+        [4, 2],
+    ]
+    assert assign_pairs(cost) == [(1, 0), (2, 1)]
+
+
+def test_assign_pairs_drops_unassignable():
+    cost = [
+        [UNASSIGNABLE, UNASSIGNABLE],
+        [3.0, UNASSIGNABLE],
+    ]
+    assert assign_pairs(cost) == [(1, 0)]
+    assert assign_pairs([]) == []
+
+
+def place_shuttles(monkeypatch, positions):
+    fleet = FleetRegistry()
+    monkeypatch.setattr(main, "fleet", fleet)
+    now = datetime.now().isoformat()
+    for shuttle_id, (lat, lon) in positions.items():
+        fleet.ensure(shuttle_id).position = {
+            "shuttle_id": shuttle_id,
+            "latitude": lat,
+            "longitude": lon,
+            "timestamp": now,
+        }
+    return fleet
+
+
+def test_busy_shuttles_are_not_candidates(monkeypatch):
+    fleet = place_shuttles(monkeypatch, {1: (-7.1645, 112.6276), 2: (-7.1645, 112.6276)})
+    fleet.set_active_route(1, {"id": 1, "to_location": "K3"}, relay=False)
+
+    assert [candidate["shuttle_id"] for candidate in main.dispatch_candidates()] == [2]
+
+
+def test_pickup_cost_uses_route_eta_model(monkeypatch):
+    pickup = (-7.1633, 112.6280)
+    place_shuttles(monkeypatch, {1: (-7.1700, 112.6350), 2: (-7.1640, 112.6285)})
+    monkeypatch.setattr(main, "find_location_coords", lambda name: pickup)
+    monkeypatch.setattr(main, "get_average_speed", lambda shuttle_id: 20.0)
+    # Model historis: segment shuttle 2 (lebih dekat) sedang macet 10 menit
+    monkeypatch.setattr(
+        main.travel_model,
+        "remaining_seconds",
+        lambda shuttle_id, distance, lat, lon: 600 if shuttle_id == 2 else None,
+    )
+
+    [(request, candidate, minutes)] = main.plan_dispatch([{"id": 7, "from_location": "Ged 1 A"}])
+
+    assert candidate["shuttle_id"] == 1
+    assert minutes == main.calculate_eta(-7.1700, 112.6350, *pickup, 20.0, 1) < 10
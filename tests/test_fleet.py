@@ -0,0 +1,84 @@
+"""
+Test FleetRegistry: state per shuttle tidak saling bocor
+"""
+
+from datetime import datetime
+
+from main import FleetRegistry
+
+
+def start_trip(fleet: FleetRegistry, shuttle_id: int, trip_id: int):
+    fleet.set_trip(
+        shuttle_id,
+        {"id": trip_id, "start_time": datetime.now().isoformat(), "distance": 0.0},
+        relay=False,
+    )
+
+
+def test_distance_only_counts_for_its_shuttle():
+    fleet = FleetRegistry()
+    start_trip(fleet, 1, 10)
+    start_trip(fleet, 2, 20)
+
+    fleet.add_distance(1, 1.5)
+    fleet.add_distance(2, 0.25)
+    fleet.add_distance(1, 0.5)
+
+    assert fleet.distance_stats(1) == {
+        "today_distance": 2.0,
+        "current_trip_distance": 2.0,
+        "total_distance": 2.0,
+    }
+    assert fleet.distance_stats(2)["current_trip_distance"] == 0.25
+
+
+def test_distance_without_trip_only_adds_total():
+    fleet = FleetRegistry()
+    fleet.add_distance(3, 1.0)
+
+    assert fleet.distance_stats(3) == {
+        "today_distance": 0.0,
+        "current_trip_distance": 0.0,
+        "total_distance": 1.0,
+    }
+    assert fleet.get(3).status == "active"
+
+
+def test_distance_stats_refresh_after_new_fix_and_trip_end():
+    fleet = FleetRegistry()
+    start_trip(fleet, 1, 10)
+    fleet.add_distance(1, 1.0)
+    assert fleet.distance_stats(1)["current_trip_distance"] == 1.0
+
+    fleet.add_distance(1, 1.0)
+    assert fleet.distance_stats(1)["current_trip_distance"] == 2.0
+
+    fleet.set_trip(1, None, relay=False)
+    stats = fleet.distance_stats(1)
+    assert stats["current_trip_distance"] == 0.0
+    assert stats["total_distance"] == 2.0
+    assert fleet.get(1).status == "inactive"
+
+
+def test_unknown_shuttle_has_empty_stats():
+    assert FleetRegistry().distance_stats(99) == {
+        "today_distance": 0.0,
+        "current_trip_distance": 0.0,
+        "total_distance": 0.0,
+    }
+
+
+def test_active_route_per_shuttle():
+    fleet = FleetRegistry()
+    route = {"id": 5, "shuttle_id": 2, "from_location": "PPS", "to_location": "K3"}
+    fleet.set_active_route(2, route, relay=False)
+
+    assert fleet.active_route(1) is None
+    assert fleet.active_route(2) == route
+    # Salinan: caller tidak bisa mengubah state fleet
+    fleet.active_route(2)["to_location"] = "POTK"
+    assert fleet.active_route(2)["to_location"] == "K3"
+
+    fleet.set_active_route(2, None, relay=False)
+    assert fleet.active_route(2) is None
+    assert [state.shuttle_id for state in fleet.states()] == [2]
@@ -0,0 +1,86 @@
+"""
+Test ETag / 304 endpoint yang sering di-poll (TestClient, database sementara)
+"""
+
+from datetime import datetime
+
+import pytest
+
+import main
+
+
+def no_database():
+    raise AssertionError("304 tidak boleh menyentuh SQLite")
+
+
+def revalidate(client, url, etag, **params):
+    return client.get(url, params=params, headers={"If-None-Match": etag})
+
+
+def test_route_requests_304_without_sqlite(client, monkeypatch):
+    first = client.get("/api/route/requests")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    monkeypatch.setattr(main, "get_db", no_database)
+    assert revalidate(client, "/api/route/requests", etag).status_code == 304
+
+
+def test_route_requests_etag_changes_after_write(client):
+    etag = client.get("/api/route/requests").headers["ETag"]
+
+    created = client.post(
+        "/api/route/request", json={"from_location": "Ged 1 A", "to_location": "Wiragraha"}
+    )
+    assert created.status_code == 200
+
+    response = revalidate(client, "/api/route/requests", etag)
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert [request["from_location"] for request in response.json()] == ["Ged 1 A"]
+
+
+def test_route_requests_version_from_other_worker(client):
+    etag = client.get("/api/route/requests").headers["ETag"]
+    version = main.route_requests_version.value
+
+    main.handle_cluster_event({"kind": "version", "name": "route_requests", "version": version + 3})
+    assert revalidate(client, "/api/route/requests", etag).status_code == 200
+
+    # Event lama yang datang telat tidak menurunkan versi
+    main.handle_cluster_event({"kind": "version", "name": "route_requests", "version": version + 1})
+    assert main.route_requests_version.value == version + 3
+
+
+@pytest.fixture
+def active_route(client):
+    main.fleet.set_active_route(
+        1,
+        {
+            "id": 1,
+            "from_location": "Ged 1 A",
+            "to_location": "Wiragraha",
+            "started_at": datetime.now().isoformat(),
+        },
+        relay=False,
+    )
+    client.post("/api/location", json={"latitude": -7.1700, "longitude": 112.6350, "speed": 20.0})
+    yield
+    main.fleet.set_active_route(1, None, relay=False)
+
+
+def test_active_route_etag_follows_computed_eta(client, active_route, monkeypatch):
+    first = client.get("/api/route/active")
+    assert first.status_code == 200
+    assert "eta_minutes" in first.json()
+    etag = first.headers["ETag"]
+    assert revalidate(client, "/api/route/active", etag).status_code == 304
+
+    # Posisi & rute sama, tapi model ETA berubah -> ETag harus ikut berubah
+    monkeypatch.setattr(
+        main.travel_model, "remaining_seconds", lambda *args: first.json()["eta_minutes"] * 60 + 600
+    )
+    response = revalidate(client, "/api/route/active", etag)
+    assert response.status_code == 200
+    assert response.json()["eta_minutes"] == first.json()["eta_minutes"] + 10
+    assert response.headers["ETag"] != etag
@@ -0,0 +1,158 @@
+"""
+Test arsip bulanan location_history (backend/location_archive.py)
+
+Database sementara dari fixture `database`, arsip di tmp_path/archive
+"""
+
+import os
+import sqlite3
+
+import pytest
+
+import location_archive
+from location_archive import (
+    ArchiveRangeError,
+    archive_batch,
+    attach_history,
+    attached_partitions,
+    history_tables,
+)
+
+# (id, shuttle_id, timestamp)
+FIXES = [
+    (1, 1, "2024-01-10T08:00:00"),
+    (2, 2, "2024-01-20T08:00:00"),
+    (3, 1, "2024-02-05T08:00:00"),
+    (4, 1, "2024-03-01T08:00:00"),
+    (5, 2, "2024-03-02T08:00:00"),  # posisi terakhir shuttle 2
+    (6, 1, "2024-04-15T08:00:00"),  # posisi terakhir shuttle 1
+]
+
+
+@pytest.fixture
+def archive_dir(tmp_path, monkeypatch):
+    path = tmp_path / "archive"
+    monkeypatch.setattr(location_archive, "ARCHIVE_DIR", str(path))
+    return path
+
+
+@pytest.fixture
+def conn(database, archive_dir):
+    conn = sqlite3.connect(database)
+    conn.executemany(
+        "INSERT INTO location_history (id, shuttle_id, latitude, longitude, timestamp) "
+        "VALUES (?, ?, -7.16, 112.63, ?)",
+        FIXES,
+    )
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def main_ids(conn):
+    return [row[0] for row in conn.execute("SELECT id FROM location_history ORDER BY id")]
+
+
+def attached_archives(conn):
+    return [
+        row[1] for row in conn.execute("PRAGMA database_list") if row[1].startswith("archive_")
+    ]
+
+
+def test_archive_batch_moves_old_rows_by_month(conn, archive_dir):
+    moved = archive_batch(conn, "2024-03-10", batch_size=100)
+
+    # Posisi terakhir tiap shuttle (5, 6) tetap di tabel utama
+    assert moved == 4
+    assert main_ids(conn) == [5, 6]
+    assert sorted(os.listdir(archive_dir)) == [
+        "location_history_2024_01.db",
+        "location_history_2024_02.db",
+        "location_history_2024_03.db",
+    ]
+    january = sqlite3.connect(archive_dir / "location_history_2024_01.db")
+    assert [row[0] for row in january.execute("SELECT id FROM location_history")] == [1, 2]
+    january.close()
+    assert attached_archives(conn) == []
+
+    # Sudah tidak ada yang perlu dipindah
+    assert archive_batch(conn, "2024-03-10", batch_size=100) == 0
+
+
+def test_archive_batch_respects_batch_size(conn):
+    assert archive_batch(conn, "2024-03-10", batch_size=3) == 3
+    assert main_ids(conn) == [4, 5, 6]
+    assert archive_batch(conn, "2024-03-10", batch_size=3) == 1
+    assert main_ids(conn) == [5, 6]
+
+
+def test_attach_history_reads_main_and_archive(conn):
+    archive_batch(conn, "2024-03-10", batch_size=100)
+
+    with attach_history(conn, "2024-01-15", "2024-03-31") as history:
+        ids = [
+            row[0]
+            for row in conn.execute(
+                f"SELECT id FROM {history} WHERE timestamp BETWEEN ? AND ? ORDER BY id",
+                ("2024-01-15", "2024-03-31"),
+            )
+        ]
+    assert ids == [2, 3, 4, 5]
+    assert attached_archives(conn) == []
+
+
+def test_attached_partitions_only_attaches_overlapping_months(conn):
+    archive_batch(conn, "2024-03-10", batch_size=100)
+
+    with attached_partitions(conn, "2024-02-01", "2024-02-28") as schemas:
+        assert schemas == ["main", "archive_2024_02"]
+
+
+def test_attached_partitions_refuses_more_than_max_attached(conn, monkeypatch):
+    archive_batch(conn, "2024-03-10", batch_size=100)
+    monkeypatch.setattr(location_archive, "MAX_ATTACHED", 2)
+
+    with pytest.raises(ArchiveRangeError):
+        with attached_partitions(conn, "2024-01-01", "2024-03-31"):
+            pass
+    assert attached_archives(conn) == []
+
+    with attached_partitions(conn, "2024-02-01", "2024-03-31") as schemas:
+        assert schemas == ["main", "archive_2024_02", "archive_2024_03"]
+
+
+def test_history_tables_oldest_archive_first_then_main(conn):
+    archive_batch(conn, "2024-03-10", batch_size=100)
+
+    seen = []
+    for table in history_tables(conn):
+        ids = [row[0] for row in conn.execute(f"SELECT id FROM {table} ORDER BY id")]
+        seen.append((table, ids))
+        # Hanya satu arsip ter-ATTACH per waktu
+        assert len(attached_archives(conn)) <= 1
+
+    assert seen == [
+        ("archive_2024_01.location_history", [1, 2]),
+        ("archive_2024_02.location_history", [3]),
+        ("archive_2024_03.location_history", [4]),
+        ("main.location_history", [5, 6]),
+    ]
+    assert attached_archives(conn) == []
+
+
+def test_history_endpoint_rejects_too_many_archive_months(client, conn, monkeypatch):
+    archive_batch(conn, "2024-03-10", batch_size=100)
+    monkeypatch.setattr(location_archive, "MAX_ATTACHED", 2)
+
+    response = client.get(
+        "/api/shuttle/history",
+        params={"shuttle_id": 1, "start": "2024-01-01T00:00:00", "end": "2024-04-30T00:00:00"},
+    )
+    assert response.status_code == 400
+
+    response = client.get(
+        "/api/shuttle/history",
+        params={"shuttle_id": 1, "start": "2024-02-01T00:00:00", "end": "2024-04-30T00:00:00"},
+    )
+    assert response.status_code == 200
+    assert [point["id"] for point in response.json()["points"]] == [3, 4, 6]
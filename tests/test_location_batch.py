@@ -0,0 +1,48 @@
+"""
+Test POST /api/location/batch (TestClient, database sementara)
+"""
+
+import sqlite3
+
+import main
+
+FIXES = [
+    {"latitude": -7.1633, "longitude": 112.6280, "speed": 20.0},
+    {"latitude": -7.1640, "longitude": 112.6285, "speed": 22.0},
+    {"latitude": -7.1655, "longitude": 112.6290, "speed": 18.0},
+]
+
+
+def test_batch_is_stored_and_latest_fix_is_current(client, database):
+    response = client.post("/api/location/batch", json=FIXES)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["success"] is True
+    assert result["count"] == len(FIXES)
+    assert result["distance_increment"] > 0
+
+    current = client.get("/api/shuttle/current").json()
+    assert (current["latitude"], current["longitude"]) == (-7.1655, 112.6290)
+
+    conn = sqlite3.connect(database)
+    rows = conn.execute(
+        "SELECT latitude FROM location_history ORDER BY id"
+    ).fetchall()
+    conn.close()
+    assert [row[0] for row in rows] == [fix["latitude"] for fix in FIXES]
+
+
+def test_empty_batch_is_rejected(client):
+    assert client.post("/api/location/batch", json=[]).status_code == 400
+
+
+def test_batch_over_limit_is_rejected(client, database, monkeypatch):
+    monkeypatch.setattr(main, "LOCATION_BATCH_MAX", 2)
+
+    response = client.post("/api/location/batch", json=FIXES)
+    assert response.status_code == 413
+
+    conn = sqlite3.connect(database)
+    count = conn.execute("SELECT COUNT(*) FROM location_history").fetchone()[0]
+    conn.close()
+    assert count == 0
@@ -0,0 +1,90 @@
+"""
+Test LocationIndex (gazetteer): exact match, alias, prefix trie & rebuild
+saat tabel routes berubah. Database sementara dari fixture `database`
+"""
+
+import sqlite3
+
+import pytest
+
+import main
+
+LOCATIONS = [
+    ("Ged 1 A - Gedung Kuliah 1 Sayap A", -7.1630, 112.6280),
+    ("Ged 1 B - Gedung Kuliah 1 Sayap B", -7.1632, 112.6284),
+    ("Wiragraha - Asrama Mahasiswa", -7.1650, 112.6300),
+    ("Ged. 2-C - Laboratorium Teknik", -7.1660, 112.6310),
+]
+
+
+def connect(database) -> sqlite3.Connection:
+    conn = sqlite3.connect(database)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def replace_routes(database, locations):
+    conn = connect(database)
+    conn.execute("DELETE FROM routes")
+    conn.executemany(
+        "INSERT INTO routes (shuttle_id, point_order, latitude, longitude, location_name) "
+        "VALUES (1, ?, ?, ?, ?)",
+        [(order, lat, lon, name) for order, (name, lat, lon) in enumerate(locations, 1)],
+    )
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def index(database):
+    replace_routes(database, LOCATIONS)
+    index = main.LocationIndex()
+    conn = connect(database)
+    index.build(conn)
+    conn.close()
+    return index
+
+
+def found(index, name):
+    location = index.lookup(name)
+    return location["name"] if location else None
+
+
+def test_normalize_location_name():
+    assert main.normalize_location_name("  Ged. 1-A ") == "ged 1 a"
+
+
+def test_exact_names_and_aliases(index):
+    assert found(index, "Ged 1 A") == "Ged 1 A"
+    assert found(index, "ged 1 a") == "Ged 1 A"
+    assert found(index, "GED1A") == "Ged 1 A"
+    assert found(index, "ged 2 c") == "Ged. 2-C"
+    assert found(index, "Wiragraha - Asrama Mahasiswa") == "Wiragraha"
+
+
+def test_unique_prefix_resolves_through_trie(index):
+    assert found(index, "wira") == "Wiragraha"
+    assert found(index, "Ged 2") == "Ged. 2-C"
+
+
+def test_ambiguous_or_unknown_prefix_returns_none(index):
+    assert index.lookup("Ged 1") is None
+    assert index.lookup("Ged") is None
+    assert index.lookup("Perpustakaan") is None
+    assert index.lookup(" -- ") is None
+
+
+def test_routes_change_bumps_version_and_rebuilds(database, monkeypatch):
+    replace_routes(database, LOCATIONS)
+    monkeypatch.setattr(main, "gazetteer", main.LocationIndex())
+
+    assert main.refresh_gazetteer() is True
+    assert main.refresh_gazetteer() is False
+    first_version = main.gazetteer.version
+    assert main.gazetteer.lookup("Perpustakaan") is None
+
+    replace_routes(database, LOCATIONS + [("Perpustakaan - Perpustakaan Pusat", -7.1670, 112.6320)])
+
+    assert main.refresh_gazetteer() is True
+    assert main.gazetteer.version > first_version
+    assert main.gazetteer.lookup("perpus")["name"] == "Perpustakaan"
@@ -0,0 +1,139 @@
+"""
+Test RoadNetwork dengan extract OSM kecil buatan sendiri:
+
+    A ---- B ---- C        jalan dua arah (residential)
+                  |
+                  v        C -> D satu arah (oneway=yes)
+                  D
+    A ---- E               footway (tidak bisa dilewati shuttle)
+"""
+
+import math
+
+import pytest
+
+from road_network import RoadNetwork, distance_km
+
+NODES = {
+    "1": ("A", -7.1600, 112.6300),
+    "2": ("B", -7.1600, 112.6310),
+    "3": ("C", -7.1600, 112.6320),
+    "4": ("D", -7.1610, 112.6320),
+    "5": ("E", -7.1590, 112.6300),
+}
+
+OSM = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+{nodes}
+  <way id="10">
+    <nd ref="1"/><nd ref="2"/><nd ref="3"/>
+    <tag k="highway" v="residential"/>
+  </way>
+  <way id="11">
+    <nd ref="3"/><nd ref="4"/>
+    <tag k="highway" v="service"/>
+    <tag k="oneway" v="yes"/>
+  </way>
+  <way id="12">
+    <nd ref="1"/><nd ref="5"/>
+    <tag k="highway" v="footway"/>
+  </way>
+</osm>
+"""
+
+
+def coords(name):
+    for node_name, lat, lon in NODES.values():
+        if node_name == name:
+            return lat, lon
+
+
+def leg(a, b):
+    return distance_km(*coords(a), *coords(b))
+
+
+STOPS = [
+    {"name": name, "latitude": coords(name)[0], "longitude": coords(name)[1]}
+    for name in ("A", "C", "D")
+]
+
+
+@pytest.fixture
+def network(tmp_path):
+    path = tmp_path / "campus_roads.osm"
+    nodes = "\n".join(
+        f'  <node id="{node_id}" lat="{lat}" lon="{lon}"/>'
+        for node_id, (_, lat, lon) in NODES.items()
+    )
+    path.write_text(OSM.format(nodes=nodes), encoding="utf-8")
+
+    network = RoadNetwork(snap_max_m=50)
+    assert network.load_osm(str(path))
+    network.set_stops(STOPS)
+    return network
+
+
+def test_missing_file_is_not_loaded(tmp_path):
+    network = RoadNetwork()
+    assert network.load_osm(str(tmp_path / "missing.osm")) is False
+    assert not network.loaded
+
+
+def test_only_drivable_ways_and_oneway_direction(network):
+    # Footway A-E dibuang, jadi node E tidak ada di graph
+    assert len(network.node_coords) == 4
+    # A-B & B-C dua arah (4 edge) + C->D satu arah (1 edge)
+    assert len(network.edges) == 5
+
+
+def test_snap_to_nearest_edge(network):
+    # 11 meter di utara titik tengah A-B
+    lat, lon = -7.1599, 112.6305
+    candidates = network.snap(lat, lon)
+
+    assert len(candidates) == 2  # A->B dan B->A
+    for off_road, edge_index, t in candidates:
+        u, v, _ = network.edges[edge_index]
+        assert {network.node_coords[u], network.node_coords[v]} == {coords("A"), coords("B")}
+        assert t == pytest.approx(0.5, abs=0.01)
+        assert off_road == pytest.approx(0.011, abs=0.001)
+
+
+def test_position_far_from_road_is_not_snapped(network):
+    assert network.snap(-7.1700, 112.6400) == []
+    assert network.distance_to_stop(-7.1700, 112.6400, *coords("C")) is None
+    assert network.distances_to_stops(-7.1700, 112.6400, STOPS) is None
+
+
+def test_partial_edge_distance_to_stop(network):
+    lat, lon = -7.1599, 112.6305
+    off_road = 0.011
+
+    # Ke C: lewat sisa setengah A-B lalu B-C
+    expected_c = off_road + leg("A", "B") / 2 + leg("B", "C")
+    assert network.distance_to_stop(lat, lon, *coords("C")) == pytest.approx(expected_c, abs=0.002)
+    # Ke A: arah sebaliknya, setengah edge saja
+    expected_a = off_road + leg("A", "B") / 2
+    assert network.distance_to_stop(lat, lon, *coords("A")) == pytest.approx(expected_a, abs=0.002)
+
+    distances = network.distances_to_stops(lat, lon, STOPS)
+    assert distances == pytest.approx(
+        [expected_a, expected_c, expected_c + leg("C", "D")], abs=0.002
+    )
+
+
+def test_stop_to_stop_table(network):
+    matrix = network.stop_matrix
+    assert matrix["A"]["A"] == 0
+    assert matrix["A"]["C"] == pytest.approx(leg("A", "B") + leg("B", "C"))
+    assert matrix["C"]["A"] == pytest.approx(matrix["A"]["C"])
+    assert matrix["A"]["D"] == pytest.approx(matrix["A"]["C"] + leg("C", "D"))
+    # C -> D satu arah: tidak ada jalan balik dari D
+    assert math.isinf(matrix["D"]["A"])
+    assert network.stop_locations is STOPS
+
+
+def test_unknown_stop_or_stale_locations(network):
+    assert network.distance_to_stop(-7.1599, 112.6305, -7.0, 112.0) is None
+    # Tabel di-build untuk STOPS, list lain tidak boleh dipakai dengan tabel lama
+    assert network.distances_to_stops(-7.1599, 112.6305, list(STOPS)) is None
@@ -0,0 +1,206 @@
+"""
+Test solver pickup-and-delivery route planner & aktivasi rute multi-stop
+
+Stop diletakkan di satu garis lurus (jarak = selisih posisi, km) supaya
+hasil bisa dihitung manual / brute force
+"""
+
+import itertools
+import random
+import sqlite3
+
+import pytest
+from fastapi import HTTPException
+
+import main
+from route_planner import solve_pickup_delivery
+
+POSITIONS = {"A": 0.0, "B": 1.0, "C": 2.0, "D": 3.0, "E": 4.5, "F": 6.0}
+
+
+def line_distance(a, b):
+    return abs(POSITIONS[a] - POSITIONS[b])
+
+
+def solve(requests, distance=line_distance):
+    return solve_pickup_delivery(requests, distance, max_detour=1.5, slack_km=0.3)
+
+
+def detour_limit(pickup, dropoff):
+    direct = abs(POSITIONS[pickup] - POSITIONS[dropoff])
+    return max(direct * 1.5, direct + 0.3)
+
+
+def check_plan(requests, stops):
+    """Setiap request: pickup sekali, dropoff sekali setelahnya, dalam batas detour"""
+    assert len(stops) == 2 * len(requests)
+    travelled, current = 0.0, None
+    boarded = {}
+    for stop, action, request_id in stops:
+        if current is not None:
+            travelled += abs(POSITIONS[current] - POSITIONS[stop])
+        current = stop
+        _, pickup, dropoff = next(r for r in requests if r[0] == request_id)
+        if action == "pickup":
+            assert stop == pickup
+            assert request_id not in boarded
+            boarded[request_id] = travelled
+        else:
+            assert action == "dropoff" and stop == dropoff
+            assert request_id in boarded, "dropoff sebelum pickup"
+            assert travelled - boarded[request_id] <= detour_limit(pickup, dropoff) + 1e-9
+    return travelled
+
+
+def brute_force(requests):
+    events = [(r[1], "pickup", r[0]) for r in requests] + [
+        (r[2], "dropoff", r[0]) for r in requests
+    ]
+    best = None
+    for order in itertools.permutations(events):
+        picked = set()
+        valid = True
+        for _, action, request_id in order:
+            if action == "pickup":
+                picked.add(request_id)
+            elif request_id not in picked:
+                valid = False
+                break
+        if not valid:
+            continue
+        try:
+            distance = check_plan(requests, list(order))
+        except AssertionError:
+            continue
+        if best is None or distance < best:
+            best = distance
+    return best
+
+
+def test_single_request():
+    distance, stops = solve([(1, "B", "D")])
+    assert stops == [("B", "pickup", 1), ("D", "dropoff", 1)]
+    assert distance == pytest.approx(2.0)
+
+
+def test_same_direction_requests_are_interleaved():
+    requests = [(1, "A", "C"), (2, "B", "D")]
+    distance, stops = solve(requests)
+    assert [stop for stop, _, _ in stops] == ["A", "B", "C", "D"]
+    assert distance == pytest.approx(3.0)
+    check_plan(requests, stops)
+
+
+def test_dropoff_never_before_pickup():
+    # Arah berlawanan: solver tidak boleh "drop" request 2 di A sebelum pickup di D
+    requests = [(1, "A", "D"), (2, "D", "A")]
+    result = solve(requests)
+    assert result is not None
+    check_plan(requests, result[1])
+
+
+def test_detour_limit_blocks_shorter_interleaving():
+    # Tanpa batas detour X, Z, Y, W (2.1 km) paling pendek, tapi penumpang
+    # X -> Y (1 km langsung) jadi menempuh 2 km > 1.5 km
+    table = {
+        frozenset("XY"): 1.0,
+        frozenset("XZ"): 1.0,
+        frozenset("XW"): 1.0,
+        frozenset("YZ"): 1.0,
+        frozenset("YW"): 0.1,
+        frozenset("ZW"): 1.0,
+    }
+    distance, stops = solve(
+        [(1, "X", "Y"), (2, "Z", "W")], lambda a, b: table[frozenset((a, b))]
+    )
+    assert distance == pytest.approx(3.0)
+    assert [action for _, action, _ in stops] == ["pickup", "dropoff", "pickup", "dropoff"]
+
+
+def test_random_requests_match_brute_force():
+    rng = random.Random(18)
+    names = list(POSITIONS)
+    for _ in range(60):
+        requests = []
+        for request_id in range(1, rng.randint(1, 3) + 1):
+            pickup, dropoff = rng.sample(names, 2)
+            requests.append((request_id, pickup, dropoff))
+
+        result = solve(requests)
+        expected = brute_force(requests)
+        if expected is None:
+            assert result is None
+            continue
+        distance, stops = result
+        assert check_plan(requests, stops) == pytest.approx(distance)
+        assert distance == pytest.approx(expected)
+
+
+def test_start_distances_pick_nearest_first_pickup():
+    # Shuttle sudah di dekat D: ambil request 2 dulu walaupun id-nya belakangan
+    requests = [(1, "A", "B"), (2, "D", "E")]
+    distance, stops = solve_pickup_delivery(
+        requests, line_distance, {"A": 3.0, "D": 0.2}, max_detour=1.5, slack_km=0.3
+    )
+    assert [stop for stop, _, _ in stops] == ["D", "E", "A", "B"]
+    assert distance == pytest.approx(0.2 + 1.5 + 4.5 + 1.0)
+
+
+# ---------- accept manual vs rute multi-stop (database sementara) ----------
+
+
+def request_statuses(database):
+    conn = sqlite3.connect(database)
+    rows = conn.execute("SELECT id, status FROM route_requests ORDER BY id").fetchall()
+    conn.close()
+    return dict(rows)
+
+
+@pytest.fixture
+def itinerary(database, monkeypatch):
+    monkeypatch.setattr(main, "fleet", main.FleetRegistry())
+    main.fleet.ensure(1)
+    conn = sqlite3.connect(database)
+    conn.executemany(
+        "INSERT INTO route_requests (id, from_location, to_location) VALUES (?, ?, ?)",
+        [(1, "A", "C"), (2, "B", "D"), (3, "E", "F")],
+    )
+    conn.commit()
+    conn.close()
+
+    stops = [("A", "pickup", 1), ("B", "pickup", 2), ("C", "dropoff", 1), ("D", "dropoff", 2)]
+    return main.activate_itinerary(
+        {
+            "shuttle_id": 1,
+            "requests": [1, 2],
+            "stops": [
+                {"seq": seq, "location": stop, "action": action, "request_id": request_id}
+                for seq, (stop, action, request_id) in enumerate(stops, 1)
+            ],
+        }
+    )
+
+
+def test_manual_accept_rejected_while_itinerary_has_pending_stops(database, itinerary):
+    with pytest.raises(HTTPException) as error:
+        main.activate_route_request(3, 1)
+    assert error.value.status_code == 409
+
+    # Tidak ada yang berubah: rute lama tetap aktif, request 3 tetap pending
+    assert request_statuses(database) == {1: "accepted", 2: "accepted", 3: "pending"}
+    assert main.fleet.active_route(1)["id"] == itinerary["id"]
+    conn = sqlite3.connect(database)
+    assert conn.execute(
+        "SELECT COUNT(*) FROM active_route_stops WHERE status = 'pending'"
+    ).fetchone()[0] == 4
+    conn.close()
+
+
+def test_manual_accept_allowed_after_itinerary_finishes(database, itinerary):
+    for _ in itinerary["stops"]:
+        main.advance_route_stop(1)
+    assert request_statuses(database) == {1: "completed", 2: "completed", 3: "pending"}
+
+    route = main.activate_route_request(3, 1)
+    assert route["request_id"] == 3
+    assert request_statuses(database)[3] == "accepted"
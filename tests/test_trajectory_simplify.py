@@ -0,0 +1,154 @@
+"""
+Test Douglas-Peucker & simplifikasi GPS trip lama (database sementara)
+"""
+
+import math
+import random
+import sqlite3
+
+import pytest
+
+import main
+from main import douglas_peucker
+from travel_times import STOP_RADIUS_M, distance_m
+
+
+def line_distance(point, a, b):
+    """Jarak tegak lurus ke garis a-b (ukuran yang dipakai douglas_peucker)"""
+    (px, py), (ax, ay), (bx, by) = point, a, b
+    length = math.hypot(bx - ax, by - ay)
+    if length == 0:
+        return math.hypot(px - ax, py - ay)
+    return abs((by - ay) * (px - ax) - (bx - ax) * (py - ay)) / length
+
+
+def test_short_inputs_are_kept():
+    assert douglas_peucker([], 5) == []
+    assert douglas_peucker([(0, 0)], 5) == [0]
+    assert douglas_peucker([(0, 0), (10, 10)], 5) == [0, 1]
+
+
+def test_straight_line_keeps_only_endpoints():
+    points = [(x, 0.5 * x) for x in range(50)]
+    assert douglas_peucker(points, 1) == [0, 49]
+
+
+def test_corner_is_kept():
+    points = [(x, 0) for x in range(10)] + [(9, y) for y in range(1, 10)]
+    assert douglas_peucker(points, 1) == [0, 9, 18]
+
+
+def test_noise_below_tolerance_is_dropped():
+    points = [(x, 0.4 if x % 2 else -0.4) for x in range(20)]
+    assert douglas_peucker(points, 1) == [0, 19]
+
+
+def test_closed_loop_keeps_endpoints():
+    # Trip balik ke titik awal: first == last, jarak diukur ke titik itu
+    points = [(0, 0), (10, 0), (10, 10), (0, 10), (0, 0)]
+    kept = douglas_peucker(points, 1)
+    assert kept[0] == 0 and kept[-1] == 4
+    assert 2 in kept
+
+
+def test_random_tracks_stay_within_tolerance():
+    rng = random.Random(20)
+    for _ in range(50):
+        x = y = 0.0
+        heading = 0.0
+        points = []
+        for _ in range(rng.randint(3, 200)):
+            heading += rng.uniform(-0.5, 0.5)
+            x += 8 * math.cos(heading) + rng.uniform(-2, 2)
+            y += 8 * math.sin(heading) + rng.uniform(-2, 2)
+            points.append((x, y))
+        tolerance = rng.uniform(1, 10)
+
+        kept = douglas_peucker(points, tolerance)
+        assert kept[0] == 0 and kept[-1] == len(points) - 1
+        assert kept == sorted(set(kept))
+        # Setiap titik yang dibuang dekat dengan garis hasil simplifikasi
+        for first, last in zip(kept, kept[1:]):
+            for index in range(first + 1, last):
+                assert (
+                    line_distance(points[index], points[first], points[last])
+                    <= tolerance + 1e-9
+                )
+
+
+# ---------- simplify_trips_batch ----------
+
+# Trip lurus ke timur, 21 fix tiap ~11 meter; stop di tengah (fix 10)
+TRACK = [(-7.1600, 112.6300 + index * 0.0001) for index in range(21)]
+STOP = {"name": "Halte", "location_name": "Halte - Tengah", "latitude": -7.1600, "longitude": 112.6310}
+
+
+@pytest.fixture
+def old_trip(database, monkeypatch):
+    monkeypatch.setattr(main.gazetteer, "locations", [STOP])
+    conn = sqlite3.connect(database)
+    conn.execute(
+        "INSERT INTO trips (id, shuttle_id, start_time, end_time, status) "
+        "VALUES (1, 1, '2024-05-01T08:00:00', '2024-05-01T09:00:00', 'completed')"
+    )
+    conn.executemany(
+        "INSERT INTO location_history (id, shuttle_id, latitude, longitude, timestamp) "
+        "VALUES (?, 1, ?, ?, ?)",
+        [
+            (index + 1, lat, lon, f"2024-05-01T08:{index:02d}:00")
+            for index, (lat, lon) in enumerate(TRACK)
+        ],
+    )
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def set_trained(conn, last_history_id):
+    conn.execute(
+        "INSERT OR REPLACE INTO travel_time_state (shuttle_id, last_history_id) VALUES (1, ?)",
+        (last_history_id,),
+    )
+    conn.commit()
+
+
+def remaining_ids(conn):
+    return [row[0] for row in conn.execute("SELECT id FROM location_history ORDER BY id")]
+
+
+def simplified_at(conn):
+    return conn.execute("SELECT simplified_at FROM trips WHERE id = 1").fetchone()[0]
+
+
+def test_points_near_stops_are_kept(old_trip):
+    set_trained(old_trip, len(TRACK))
+
+    assert main.simplify_trips_batch() == (1, 21 - len(remaining_ids(old_trip)))
+
+    # Ujung trip + semua fix dalam STOP_RADIUS_M (40 m) dari halte
+    near_stop = [
+        index + 1
+        for index, (lat, lon) in enumerate(TRACK)
+        if distance_m(lat, lon, STOP["latitude"], STOP["longitude"]) <= STOP_RADIUS_M
+    ]
+    assert near_stop == [8, 9, 10, 11, 12, 13, 14]
+    assert remaining_ids(old_trip) == [1] + near_stop + [21]
+    assert simplified_at(old_trip) is not None
+
+
+def test_untrained_shuttle_is_not_simplified(old_trip):
+    assert main.simplify_trips_batch() == (0, 0)
+    assert len(remaining_ids(old_trip)) == 21
+    assert simplified_at(old_trip) is None
+
+
+def test_trip_waits_until_all_points_are_trained(old_trip):
+    set_trained(old_trip, 15)
+    assert main.simplify_trips_batch() == (0, 0)
+    assert len(remaining_ids(old_trip)) == 21
+    assert simplified_at(old_trip) is None
+
+    set_trained(old_trip, 21)
+    trips, removed = main.simplify_trips_batch()
+    assert (trips, removed) == (1, 21 - len(remaining_ids(old_trip)))
+    assert removed > 0
@@ -0,0 +1,171 @@
+"""
+Test buffer write-behind (LOCATION_WRITE_BEHIND=1): replay log ke
+database sementara di tmp_path & flush dengan store palsu
+"""
+
+import asyncio
+import json
+import sqlite3
+
+import pytest
+
+import main
+from write_behind import LocationWriteBuffer
+
+
+def make_buffer(tmp_path) -> LocationWriteBuffer:
+    return LocationWriteBuffer(
+        str(tmp_path / "buffer.log"),
+        store=main.store_buffered_locations,
+        load_last_seq=main.fetch_write_behind_seq,
+        run_write=main.db_write,
+    )
+
+
+def log_entry(seq: int, km: float = 0.1) -> str:
+    row = [1, -7.16 + seq * 0.001, 112.63, 20.0, 0.0, 5.0, f"2024-05-01T08:00:{seq:02d}"]
+    return json.dumps({"seq": seq, "row": row, "km": km})
+
+
+def write_log(path, seqs):
+    with open(path, "w", encoding="utf-8") as f:
+        for seq in seqs:
+            f.write(log_entry(seq) + "\n")
+
+
+def stored_timestamps(database):
+    conn = sqlite3.connect(database)
+    try:
+        return [
+            row[0]
+            for row in conn.execute("SELECT timestamp FROM location_history ORDER BY id")
+        ]
+    finally:
+        conn.close()
+
+
+def set_last_seq(database, seq: int):
+    conn = sqlite3.connect(database)
+    conn.execute("UPDATE write_behind_state SET last_seq = ? WHERE id = 1", (seq,))
+    conn.commit()
+    conn.close()
+
+
+def test_replay_skips_entries_already_committed(database, tmp_path):
+    buffer = make_buffer(tmp_path)
+    write_log(buffer.log_path, range(1, 6))
+    set_last_seq(database, 3)
+
+    buffer.replay()
+
+    assert stored_timestamps(database) == ["2024-05-01T08:00:04", "2024-05-01T08:00:05"]
+    conn = sqlite3.connect(database)
+    assert conn.execute("SELECT last_seq FROM write_behind_state").fetchone()[0] == 5
+    distance = conn.execute("SELECT total_distance FROM shuttles WHERE id = 1").fetchone()[0]
+    conn.close()
+    assert distance == pytest.approx(0.2)
+
+
+def test_replay_merges_flushing_log_and_removes_logs(database, tmp_path):
+    buffer = make_buffer(tmp_path)
+    # Crash di tengah flush: .flushing belum dihapus, log baru sudah terisi
+    write_log(buffer.flushing_path, [1, 2, 3])
+    write_log(buffer.log_path, [4])
+    set_last_seq(database, 1)
+
+    buffer.replay()
+
+    assert stored_timestamps(database) == [
+        "2024-05-01T08:00:02",
+        "2024-05-01T08:00:03",
+        "2024-05-01T08:00:04",
+    ]
+    assert not (tmp_path / "buffer.log").exists()
+    assert not (tmp_path / "buffer.log.flushing").exists()
+
+
+def test_replay_nothing_pending_keeps_sequence(database, tmp_path):
+    buffer = make_buffer(tmp_path)
+    write_log(buffer.log_path, [1, 2])
+    set_last_seq(database, 2)
+
+    buffer.replay()
+
+    assert stored_timestamps(database) == []
+    # seq berikutnya lanjut setelah log, tidak mengulang seq yang sudah ada
+    assert buffer._seq == 2
+
+
+def test_replay_ignores_truncated_last_line(database, tmp_path):
+    buffer = make_buffer(tmp_path)
+    write_log(buffer.log_path, [1, 2])
+    with open(buffer.log_path, "a", encoding="utf-8") as f:
+        f.write(log_entry(3)[:20])  # crash saat append
+
+    buffer.replay()
+
+    assert stored_timestamps(database) == ["2024-05-01T08:00:01", "2024-05-01T08:00:02"]
+
+
+class FakeStore:
+    """Pengganti store_buffered_locations: catat batch, id mulai dari 1"""
+
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.fail = fail
+
+    def __call__(self, entries):
+        if self.fail:
+            raise sqlite3.OperationalError("database is locked")
+        self.batches.append([entry[0] for entry in entries])
+        return sum(len(batch) for batch in self.batches)
+
+
+async def run_inline(fn, *args):
+    return fn(*args)
+
+
+def fake_buffer(tmp_path, store) -> LocationWriteBuffer:
+    return LocationWriteBuffer(
+        str(tmp_path / "buffer.log"),
+        store=store,
+        load_last_seq=lambda: 0,
+        run_write=run_inline,
+    )
+
+
+def test_flush_stores_batch_and_assigns_record_ids(tmp_path):
+    store = FakeStore()
+    buffer = fake_buffer(tmp_path, store)
+    records = [{}, {}]
+
+    async def scenario():
+        buffer.append([(1,), (1,)], [0.1, 0.2], records)
+        await buffer.flush()
+        await buffer.stop()
+
+    asyncio.run(scenario())
+
+    assert store.batches == [[1, 2]]
+    assert [record["id"] for record in records] == [1, 2]
+    assert not (tmp_path / "buffer.log").exists()
+    assert not (tmp_path / "buffer.log.flushing").exists()
+
+
+def test_failed_flush_keeps_entries_and_log_for_retry(tmp_path):
+    store = FakeStore(fail=True)
+    buffer = fake_buffer(tmp_path, store)
+
+    async def scenario():
+        buffer.append([(1,)], [0.1], [None])
+        with pytest.raises(sqlite3.OperationalError):
+            await buffer.flush()
+        buffer.append([(1,)], [0.2], [None])
+        store.fail = False
+        await buffer.flush()
+
+    asyncio.run(scenario())
+
+    # Fix yang gagal di-flush ikut batch berikutnya, urutan seq tetap
+    assert store.batches == [[1, 2]]
+    assert not (tmp_path / "buffer.log.flushing").exists()